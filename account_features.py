@@ -0,0 +1,303 @@
+"""Per-account behavioral features from a bounded, array-backed state store.
+
+The models only see four columns of each transaction. ``AccountFeatureStore``
+keeps a little state per account (``nameOrig`` and ``nameDest``) so every
+transaction can also be described by what the accounts did before it:
+
+* ``orig_count_<w>`` / ``orig_amount_<w>``: transactions sent by the origin
+  account earlier in the same ``w``-step window (``step // w``)
+* ``dest_count_<w>`` / ``dest_amount_<w>``: transactions received by the
+  destination account earlier in the same window
+* ``orig_steps_since_last``: steps since the origin account was last seen
+  (-1 for a new account)
+* ``orig_balance_gap``: ``oldbalanceOrg`` minus the balance the account was
+  left with last time (0 for a new account)
+* ``orig_balance_mismatch`` / ``dest_balance_mismatch``: how far the
+  transaction's own balance columns are from ``old -/+ amount == new``
+
+Features are computed from the state *before* the transaction, then the
+state is updated, each in O(1). Offline (``transform``) and online
+(``observe``) go through the same code, so a model trained on ``transform``
+output sees identical features when scoring a live stream in the same order.
+
+State lives in one packed NumPy record array (68 bytes per account with the
+default windows) indexed by an open-addressing hash table on a 63-bit
+account key. When the table reaches ``MAX_LOAD`` of its capacity it evicts
+accounts idle for more than ``ttl_steps`` (or, failing that, the least
+recently active quarter) and rehashes in place. An evicted account starts
+over as new.
+
+Usage:
+    python account_features.py "credit card.csv" account_features.csv
+"""
+import argparse
+import hashlib
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_WINDOWS = (1, 24)  # steps are hours in the PaySim-style data
+DEFAULT_CAPACITY = 1 << 20
+DEFAULT_TTL_STEPS = 24 * 30
+MAX_LOAD = 0.75
+EMPTY = -1
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+SOURCE_COLUMNS = ["step", "amount", "nameOrig", "oldbalanceOrg", "newbalanceOrig",
+                  "nameDest", "oldbalanceDest", "newbalanceDest"]
+
+
+def account_key(name):
+    """63-bit integer key for an account id such as ``C1231006815``."""
+    name = str(name)
+    digits = name[1:]
+    if len(name) > 1 and digits.isdigit() and len(digits) <= 12:
+        return (ord(name[0]) << 40) | int(digits)
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "little") >> 1 | 1 << 62
+
+
+def feature_names(windows=DEFAULT_WINDOWS):
+    names = []
+    for w in windows:
+        names += [f"orig_count_{w}", f"orig_amount_{w}"]
+    names += ["orig_steps_since_last", "orig_balance_gap", "orig_balance_mismatch"]
+    for w in windows:
+        names += [f"dest_count_{w}", f"dest_amount_{w}"]
+    names.append("dest_balance_mismatch")
+    return names
+
+
+def state_dtype(windows=DEFAULT_WINDOWS):
+    """Packed per-account record: last activity plus counters per window."""
+    fields = [("last_step", "<i4"), ("last_balance", "<f8")]
+    for w in windows:
+        fields += [(f"window_{w}", "<i4"), (f"out_count_{w}", "<i4"), (f"out_sum_{w}", "<f8"),
+                   (f"in_count_{w}", "<i4"), (f"in_sum_{w}", "<f8")]
+    return np.dtype(fields)
+
+
+class AccountFeatureStore:
+    """Bounded per-account state with O(1) feature extraction and update.
+
+    Each account's record is read and written back in one call
+    (``item()``/tuple assignment), which keeps the per-transaction cost to
+    a handful of NumPy calls.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, windows=DEFAULT_WINDOWS, ttl_steps=DEFAULT_TTL_STEPS):
+        if capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self.capacity = capacity
+        self.windows = tuple(windows)
+        self.ttl_steps = ttl_steps
+        self.feature_names = feature_names(self.windows)
+        self._shift = 64 - capacity.bit_length() + 1
+        self._mask = capacity - 1
+        self._max_size = int(capacity * MAX_LOAD)
+        self.size = 0
+        self.evictions = 0
+        self.rehashes = 0
+        self.max_step = 0
+        self.keys = np.full(capacity, EMPTY, dtype=np.int64)
+        self.state = np.zeros(capacity, dtype=state_dtype(self.windows))
+        self._new = (-1, 0.0) + (-1, 0, 0.0, 0, 0.0) * len(self.windows)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.state.nbytes
+
+    def stats(self):
+        return {
+            "accounts": self.size,
+            "capacity": self.capacity,
+            "load": self.size / self.capacity,
+            "nbytes": self.nbytes,
+            "evictions": self.evictions,
+            "rehashes": self.rehashes,
+        }
+
+    def _home(self, key):
+        return ((key * _GOLDEN) & _MASK64) >> self._shift
+
+    def _find(self, key):
+        """Slot holding ``key``, or -1."""
+        keys = self.keys
+        slot = self._home(key)
+        while True:
+            found = keys.item(slot)
+            if found == key:
+                return slot
+            if found == EMPTY:
+                return -1
+            slot = (slot + 1) & self._mask
+
+    def _slot(self, key):
+        """Slot for ``key``, inserting a fresh account if needed."""
+        slot = self._find(key)
+        if slot >= 0:
+            return slot
+        if self.size >= self._max_size:
+            self._evict()
+        keys = self.keys
+        slot = self._home(key)
+        while keys.item(slot) != EMPTY:
+            slot = (slot + 1) & self._mask
+        keys[slot] = key
+        self.state[slot] = self._new
+        self.size += 1
+        return slot
+
+    def _evict(self):
+        used = np.flatnonzero(self.keys != EMPTY)
+        last_step = self.state["last_step"][used]
+        idle = last_step < self.max_step - self.ttl_steps
+        if idle.sum() < len(used) // 4:
+            # Not enough stale accounts: drop the least recently active quarter
+            idle = np.zeros(len(used), dtype=bool)
+            idle[np.argsort(last_step, kind="stable")[:len(used) // 4]] = True
+        self.evictions += int(idle.sum())
+        self._rehash(used[~idle])
+
+    def _rehash(self, keep):
+        """Re-insert the accounts in slots ``keep`` into a cleared table."""
+        keys = self.keys[keep]
+        records = self.state[keep]
+        self.keys.fill(EMPTY)
+        slots = ((keys.astype(np.uint64) * np.uint64(_GOLDEN)) >> np.uint64(self._shift)).astype(np.int64)
+        remaining = np.arange(len(keys))
+        # Vectorized linear probing: each round the first claimant of every
+        # free slot wins, everyone else moves one slot on
+        while remaining.size:
+            positions = slots[remaining]
+            free = self.keys[positions] == EMPTY
+            _, first = np.unique(positions[free], return_index=True)
+            winners = remaining[free][first]
+            self.keys[slots[winners]] = keys[winners]
+            won = np.zeros(len(keys), dtype=bool)
+            won[winners] = True
+            remaining = remaining[~won[remaining]]
+            slots[remaining] = (slots[remaining] + 1) & self._mask
+        self.state[slots] = records
+        self.size = len(keys)
+        self.rehashes += 1
+
+    def observe(self, step, amount, name_orig, old_orig, new_orig, name_dest=None, old_dest=0.0, new_dest=0.0):
+        """Features for one transaction, then fold it into the state."""
+        return np.array(self._observe(step, amount, name_orig, old_orig, new_orig, name_dest, old_dest, new_dest),
+                        dtype=np.float64)
+
+    def _observe(self, step, amount, name_orig, old_orig, new_orig, name_dest, old_dest, new_dest):
+        step = int(step)
+        amount = float(amount)
+        old_orig = float(old_orig)
+        new_orig = float(new_orig)
+        old_dest = float(old_dest)
+        new_dest = float(new_dest)
+        if step > self.max_step:
+            self.max_step = step
+        features = []
+
+        orig = self._slot(account_key(name_orig))
+        record = list(self.state[orig].item())
+        for i, w in enumerate(self.windows):
+            base = 2 + 5 * i
+            if record[base] != step // w:
+                record[base:base + 5] = [step // w, 0, 0.0, 0, 0.0]
+            features += record[base + 1:base + 3]
+            record[base + 1] += 1
+            record[base + 2] += amount
+        last_step, last_balance = record[0], record[1]
+        features += [
+            step - last_step if last_step >= 0 else -1,
+            old_orig - last_balance if last_step >= 0 else 0.0,
+            old_orig - amount - new_orig,
+        ]
+        record[0], record[1] = step, new_orig
+        self.state[orig] = tuple(record)
+
+        if name_dest is None:
+            features += [0] * (2 * len(self.windows))
+        else:
+            dest = self._slot(account_key(name_dest))
+            record = list(self.state[dest].item())
+            for i, w in enumerate(self.windows):
+                base = 2 + 5 * i
+                if record[base] != step // w:
+                    record[base:base + 5] = [step // w, 0, 0.0, 0, 0.0]
+                features += record[base + 3:base + 5]
+                record[base + 3] += 1
+                record[base + 4] += amount
+            record[0], record[1] = max(record[0], step), new_dest
+            self.state[dest] = tuple(record)
+        features.append(old_dest + amount - new_dest)
+        return features
+
+    def observe_record(self, record):
+        """``observe`` for a dict in the ``credit card.csv`` schema."""
+        return self.observe(record["step"], record["amount"], record["nameOrig"], record["oldbalanceOrg"],
+                            record["newbalanceOrig"], record.get("nameDest"), record.get("oldbalanceDest", 0.0),
+                            record.get("newbalanceDest", 0.0))
+
+    def transform(self, frame):
+        """Features for every row of ``frame`` in order (rows must be in step order)."""
+        n = len(frame)
+        columns = []
+        for name in SOURCE_COLUMNS:
+            if name in frame.columns:
+                columns.append(frame[name].tolist())
+            else:
+                columns.append([None if name == "nameDest" else 0.0] * n)
+        values = np.empty((n, len(self.feature_names)), dtype=np.float64)
+        observe = self._observe
+        for i, row in enumerate(zip(*columns)):
+            values[i] = observe(*row)
+        return pd.DataFrame(values, columns=self.feature_names, index=frame.index)
+
+    def save(self, path):
+        np.savez(path, keys=self.keys, state=self.state, windows=np.asarray(self.windows),
+                 meta=np.asarray([self.size, self.evictions, self.rehashes, self.max_step, self.ttl_steps]))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            size, evictions, rehashes, max_step, ttl_steps = (int(v) for v in data["meta"])
+            store = cls(len(data["keys"]), tuple(int(w) for w in data["windows"]), ttl_steps)
+            store.keys[...] = data["keys"]
+            store.state[...] = data["state"]
+        store.size, store.evictions, store.rehashes, store.max_step = size, evictions, rehashes, max_step
+        return store
+
+
+def transform_csv(source, destination, store=None, chunksize=100_000):
+    """Stream ``source`` through ``store`` and write the feature table."""
+    store = store or AccountFeatureStore()
+    start = time.perf_counter()
+    rows = 0
+    for chunk in pd.read_csv(source, usecols=SOURCE_COLUMNS, chunksize=chunksize):
+        features = store.transform(chunk)
+        features.insert(0, "row", range(rows, rows + len(chunk)))
+        features.to_csv(destination, mode="w" if rows == 0 else "a", header=rows == 0, index=False)
+        rows += len(chunk)
+    return {"rows": rows, "seconds": time.perf_counter() - start, **store.stats()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute per-account behavioral features for a transaction CSV.")
+    parser.add_argument("input", help="CSV in the credit card.csv schema, in step order")
+    parser.add_argument("output", help="Destination CSV (one feature row per input row)")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY, help="Hash table slots (power of two)")
+    parser.add_argument("--windows", type=int, nargs="+", default=list(DEFAULT_WINDOWS), help="Window sizes in steps")
+    parser.add_argument("--ttl-steps", type=int, default=DEFAULT_TTL_STEPS)
+    args = parser.parse_args(argv)
+
+    store = AccountFeatureStore(args.capacity, args.windows, args.ttl_steps)
+    summary = transform_csv(args.input, args.output, store)
+    print(f"{summary['rows']:,} rows in {summary['seconds']:.2f}s "
+          f"({summary['rows'] / summary['seconds']:,.0f} rows/s), {summary['accounts']:,} accounts, "
+          f"{summary['nbytes'] / 2**20:,.1f} MiB state, {summary['evictions']:,} evicted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+"""Append-only audit log of scoring decisions, with an indexed reader.
+
+Every decision the app, the HTTP service and the stream scorer make is
+recorded with its features, model name and version, fraud probability,
+decision threshold, label and latency. Nothing is written on the scoring
+path itself. ``record`` appends a reference to the caller's block (plus a
+copy of its features) to an in-memory list. A background thread swaps that
+list out every ``FLUSH_SECONDS``, or sooner once ``FLUSH_ROWS`` rows are
+waiting, and appends it to the current segment.
+
+The log lives in ``audit_log/`` (or ``$FRAUDGUARD_AUDIT_DIR``). A segment is
+a directory in the ``columnar_store`` layout: one raw binary file per
+column plus a ``meta.json``. The meta is rewritten atomically after each
+flush and holds:
+
+* the row count, for readers of a segment that is still being written;
+* the time range and whether timestamps are in order;
+* the dictionaries for the source, model and model-version codes;
+* row counts per model and per transaction type.
+
+A writer starts a new segment after ``SEGMENT_ROWS`` rows or
+``SEGMENT_SECONDS``, and each process writes its own segments.
+``AuditReader`` uses the meta to skip segments that cannot match a query.
+It scans the remaining ones as memory-mapped columns, with a binary search
+on time when the timestamps are in order.
+
+If the writer falls ``MAX_PENDING_ROWS`` behind, new decisions are dropped
+and counted in ``fraudguard_audit_dropped_total`` rather than slowing the
+scoring path. A flush that fails is logged, its rows are counted there too,
+and the writer carries on in a new segment. ``FRAUDGUARD_AUDIT=0`` turns the
+log off.
+
+Usage:
+    python audit_log.py --since 2026-10-01 --type TRANSFER --fraud-only --output flagged.csv
+    python audit_log.py --segments
+"""
+import argparse
+import atexit
+import datetime
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import UNKNOWN_TYPE
+from features import FEATURE_COLUMNS, FRAUD_LABEL, LEGIT_LABEL, TRANSACTION_TYPES
+from metrics import counter
+from model_registry import model_version
+from telemetry import logger
+from thresholds import DEFAULT_THRESHOLD
+
+AUDIT_DIR = os.environ.get("FRAUDGUARD_AUDIT_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "audit_log"))
+ENABLED = os.environ.get("FRAUDGUARD_AUDIT", "1") != "0"
+META_NAME = "meta.json"
+FORMAT_VERSION = 1
+FLUSH_SECONDS = 1.0
+FLUSH_ROWS = 50_000
+SEGMENT_ROWS = 5_000_000
+SEGMENT_SECONDS = 3600
+MAX_PENDING_ROWS = 1_000_000
+
+# Stored columns and their on-disk dtypes; source/model/model_version are
+# codes into the segment's dictionaries, label is 1 for "Fraud"; type is
+# the ``TYPE_MAPPING`` code, or ``UNKNOWN_TYPE`` for anything else
+COLUMN_DTYPES = {
+    "ts": "float64",
+    "source": "int8",
+    "model": "int8",
+    "model_version": "int16",
+    "type": "int8",
+    "amount": "float64",
+    "oldbalanceOrg": "float64",
+    "newbalanceOrig": "float64",
+    "fraud_probability": "float64",
+    "threshold": "float32",
+    "label": "int8",
+    "latency_ms": "float32",
+}
+DICTIONARIES = {"source": "sources", "model": "models", "model_version": "versions"}
+
+ROWS = counter("fraudguard_audit_rows_total", "Decisions written to the audit log")
+DROPPED = counter("fraudguard_audit_dropped_total",
+                  "Decisions dropped because the audit writer fell behind or failed to write them")
+
+
+def _write_meta(directory, meta):
+    path = os.path.join(directory, META_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+class _Segment:
+    """The segment a writer is appending to."""
+
+    def __init__(self, directory, sequence):
+        now = time.time()
+        stamp = datetime.datetime.fromtimestamp(now, datetime.timezone.utc).strftime("%Y%m%dT%H%M%S")
+        self.directory = os.path.join(directory, f"segment-{stamp}-{os.getpid()}-{sequence:04d}")
+        os.makedirs(self.directory)
+        self.opened_at = now
+        self.files = {name: open(os.path.join(self.directory, name + ".bin"), "ab") for name in COLUMN_DTYPES}
+        self.codes = {name: {} for name in DICTIONARIES}
+        self.meta = {
+            "format_version": FORMAT_VERSION,
+            "pid": os.getpid(),
+            "rows": 0,
+            "sealed": False,
+            "min_ts": None,
+            "max_ts": None,
+            "sorted": True,
+            "columns": COLUMN_DTYPES,
+            "type_categories": list(TRANSACTION_TYPES),
+            **{key: [] for key in DICTIONARIES.values()},
+            "model_rows": {},
+            "type_rows": {},
+        }
+
+    def code(self, column, value):
+        codes = self.codes[column]
+        if value not in codes:
+            codes[value] = len(codes)
+            self.meta[DICTIONARIES[column]].append(value)
+        return codes[value]
+
+    def append(self, columns):
+        for name, values in columns.items():
+            self.files[name].write(np.ascontiguousarray(values, dtype=COLUMN_DTYPES[name]).tobytes())
+        for f in self.files.values():
+            f.flush()
+            os.fsync(f.fileno())
+
+        ts, meta = columns["ts"], self.meta
+        if meta["max_ts"] is not None and ts[0] < meta["max_ts"] or np.any(np.diff(ts) < 0):
+            meta["sorted"] = False
+        meta["min_ts"] = float(ts.min()) if meta["min_ts"] is None else min(meta["min_ts"], float(ts.min()))
+        meta["max_ts"] = float(ts.max()) if meta["max_ts"] is None else max(meta["max_ts"], float(ts.max()))
+        for key, column, names in (("model_rows", "model", meta["models"]),
+                                   ("type_rows", "type", [None, *TRANSACTION_TYPES])):
+            for code, count in zip(*np.unique(columns[column], return_counts=True)):
+                name = names[code] if 0 <= code < len(names) and names[code] else "UNKNOWN"
+                meta[key][name] = meta[key].get(name, 0) + int(count)
+        meta["rows"] += len(ts)
+        _write_meta(self.directory, meta)
+
+    def seal(self):
+        for f in self.files.values():
+            f.close()
+        self.meta["sealed"] = True
+        _write_meta(self.directory, self.meta)
+
+
+class AuditWriter:
+    """Buffered, append-only writer; one background thread per process."""
+
+    def __init__(self, directory=AUDIT_DIR, flush_seconds=FLUSH_SECONDS, flush_rows=FLUSH_ROWS,
+                 segment_rows=SEGMENT_ROWS, segment_seconds=SEGMENT_SECONDS, max_pending_rows=MAX_PENDING_ROWS):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self.flush_rows = flush_rows
+        self.segment_rows = segment_rows
+        self.segment_seconds = segment_seconds
+        self.max_pending_rows = max_pending_rows
+        self._pending = []
+        self._pending_rows = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+        self._segment = None
+        self._sequence = 0
+
+    def record(self, source, model_name, features, fraud_probability, threshold=DEFAULT_THRESHOLD, latency_ms=0.0):
+        """Queue one decision per row of ``features`` (``(n, 4)``); never blocks on I/O.
+
+        ``fraud_probability`` must not be modified afterwards (the scoring
+        helpers return fresh arrays); ``features`` is copied, since it may be
+        a reused encoder buffer. Returns ``False`` if the rows were dropped.
+        """
+        if type(features) is np.ndarray:
+            features = features.astype(np.float64)
+        else:
+            features = features[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        n = len(features)
+        entry = (time.time(), source, model_name, model_version(model_name) or "", features,
+                 fraud_probability, threshold, latency_ms)
+        self._lock.acquire()
+        if self._pending_rows + n > self.max_pending_rows or self._closed:
+            self._lock.release()
+            DROPPED.inc(n)
+            return False
+        self._pending.append(entry)
+        self._pending_rows += n
+        wake = self._pending_rows >= self.flush_rows
+        if self._thread is None:
+            self._start()
+        self._lock.release()
+        if wake:
+            self._wake.set()
+        return True
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep auditing: the failed rows are counted as dropped
+                logger.exception(json.dumps({"event": "audit_flush_failed", "ts": time.time(), "pid": os.getpid()}))
+
+    def flush(self):
+        """Write everything queued so far; returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                blocks, self._pending, self._pending_rows = self._pending, [], 0
+            if not blocks:
+                return 0
+            try:
+                segment = self._current_segment()
+                columns = self._columns(segment, blocks)
+                segment.append(columns)
+            except Exception:
+                DROPPED.inc(sum(len(block[4]) for block in blocks))
+                self._abandon_segment()
+                raise
+            ROWS.inc(len(columns["ts"]))
+            return len(columns["ts"])
+
+    def _abandon_segment(self):
+        # A failed append may have written some columns and not others, so
+        # later rows go to a fresh segment; the meta still covers what was
+        # complete
+        segment, self._segment = self._segment, None
+        if segment is not None:
+            try:
+                segment.seal()
+            except OSError:
+                pass
+
+    def _current_segment(self):
+        segment = self._segment
+        if segment is not None and (segment.meta["rows"] >= self.segment_rows
+                                    or time.time() - segment.opened_at >= self.segment_seconds):
+            segment.seal()
+            segment = None
+        if segment is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._sequence += 1
+            segment = self._segment = _Segment(self.directory, self._sequence)
+        return segment
+
+    def _columns(self, segment, blocks):
+        counts = [len(block[4]) for block in blocks]
+        repeat = lambda values, dtype: np.repeat(np.asarray(values, dtype=dtype), counts)
+        features = np.concatenate([block[4] for block in blocks])
+        probability = np.concatenate([np.asarray(block[5], dtype=np.float64) for block in blocks])
+        threshold = repeat([block[6] for block in blocks], np.float64)
+        types = features[:, FEATURE_COLUMNS.index("type")]
+        known = np.isin(types, np.arange(1, len(TRANSACTION_TYPES) + 1))
+        return {
+            "ts": repeat([block[0] for block in blocks], np.float64),
+            "source": repeat([segment.code("source", block[1]) for block in blocks], np.int64),
+            "model": repeat([segment.code("model", block[2]) for block in blocks], np.int64),
+            "model_version": repeat([segment.code("model_version", block[3]) for block in blocks], np.int64),
+            **{name: features[:, i] for i, name in enumerate(FEATURE_COLUMNS)},
+            "type": np.where(known, types, UNKNOWN_TYPE).astype(np.int8),
+            "fraud_probability": probability,
+            "threshold": threshold,
+            "label": probability >= threshold,
+            "latency_ms": repeat([block[7] for block in blocks], np.float64),
+        }
+
+    def close(self):
+        """Flush what is queued and seal the current segment."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10)
+        self.flush()
+        with self._flush_lock:
+            if self._segment is not None:
+                self._segment.seal()
+                self._segment = None
+
+
+class AuditReader:
+    """Queries over every segment in an audit directory."""
+
+    def __init__(self, directory=AUDIT_DIR):
+        self.directory = directory
+
+    def segments(self):
+        """``(path, meta)`` of each segment, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        segments = []
+        for name in sorted(os.listdir(self.directory)):
+            try:
+                with open(os.path.join(self.directory, name, META_NAME)) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if meta.get("format_version") == FORMAT_VERSION and meta["rows"]:
+                segments.append((os.path.join(self.directory, name), meta))
+        return sorted(segments, key=lambda segment: segment[1]["min_ts"])
+
+    def iter_query(self, start=None, end=None, types=None, models=None, sources=None, label=None):
+        """Yield one DataFrame of matching decisions per segment.
+
+        ``start``/``end`` are epoch seconds (``end`` exclusive); ``types``,
+        ``models`` and ``sources`` are collections of names; ``label`` is
+        ``"Fraud"`` or ``"No Fraud"``.
+        """
+        for path, meta in self.segments():
+            if start is not None and meta["max_ts"] < start or end is not None and meta["min_ts"] >= end:
+                continue
+            if models is not None and not any(meta["model_rows"].get(name) for name in models):
+                continue
+            if types is not None and not any(meta["type_rows"].get(name) for name in types):
+                continue
+            if sources is not None and not set(sources) & set(meta["sources"]):
+                continue
+            frame = self._query_segment(path, meta, start, end, types, models, sources, label)
+            if len(frame):
+                yield frame
+
+    def query(self, **filters):
+        """Matching decisions from every segment as one DataFrame (see ``iter_query``)."""
+        frames = list(self.iter_query(**filters))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(COLUMN_DTYPES))
+
+    def _query_segment(self, path, meta, start, end, types, models, sources, label):
+        rows = meta["rows"]
+        columns = {name: np.memmap(os.path.join(path, name + ".bin"), dtype=dtype, mode="r", shape=(rows,))
+                   for name, dtype in meta["columns"].items()}
+        lo, hi = 0, rows
+        ts = columns["ts"]
+        if meta["sorted"]:
+            # Time-ordered: the window is a contiguous row range
+            if start is not None:
+                lo = int(np.searchsorted(ts, start, side="left"))
+            if end is not None:
+                hi = int(np.searchsorted(ts, end, side="left"))
+            mask = None
+        else:
+            mask = np.ones(rows, dtype=bool)
+            if start is not None:
+                mask &= ts >= start
+            if end is not None:
+                mask &= ts < end
+        conditions = []
+        if types is not None:
+            conditions.append(("type", [TRANSACTION_TYPES.index(name) + 1 for name in types]))
+        for column, names in (("model", models), ("source", sources)):
+            if names is not None:
+                dictionary = meta[DICTIONARIES[column]]
+                conditions.append((column, [dictionary.index(name) for name in names if name in dictionary]))
+        if label is not None:
+            conditions.append(("label", [int(label == FRAUD_LABEL)]))
+        selected = slice(lo, hi) if mask is None else mask
+        keep = None
+        for column, codes in conditions:
+            match = np.isin(columns[column][selected], codes)
+            keep = match if keep is None else keep & match
+        rows_index = np.arange(lo, hi) if mask is None else np.flatnonzero(mask)
+        if keep is not None:
+            rows_index = rows_index[keep]
+        return _decode(columns, meta, rows_index)
+
+
+def _decode(columns, meta, rows_index):
+    """DataFrame of the selected rows with codes turned back into names."""
+    data = {}
+    for name in COLUMN_DTYPES:
+        values = np.asarray(columns[name][rows_index])
+        if name in DICTIONARIES:
+            values = _categorical(values.astype(np.int64), meta[DICTIONARIES[name]])
+        elif name == "type":
+            values = _categorical(values.astype(np.int64) - 1, meta["type_categories"])
+        elif name == "label":
+            values = pd.Categorical.from_codes(1 - values.astype(np.int64), categories=[FRAUD_LABEL, LEGIT_LABEL])
+        data[name] = values
+    return pd.DataFrame(data)
+
+
+def _categorical(codes, categories):
+    # Codes outside the dictionary (unknown types) decode as missing
+    return pd.Categorical.from_codes(np.where((codes >= 0) & (codes < len(categories)), codes, -1),
+                                     categories=categories)
+
+
+writer = AuditWriter() if ENABLED else None
+
+
+def record(source, model_name, features, fraud_probability, threshold=DEFAULT_THRESHOLD, latency_ms=0.0):
+    """Queue decisions on the process-wide writer, if there is one (see ``AuditWriter.record``)."""
+    if writer is not None:
+        writer.record(source, model_name, features, fraud_probability, threshold, latency_ms)
+
+
+def close():
+    """Flush and seal the process-wide writer (also run at interpreter exit)."""
+    if writer is not None:
+        writer.close()
+
+
+def _timestamp(text):
+    moment = datetime.datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the decision audit log.")
+    parser.add_argument("--dir", default=AUDIT_DIR)
+    parser.add_argument("--since", type=_timestamp, help="ISO date/time (UTC unless an offset is given)")
+    parser.add_argument("--until", type=_timestamp, help="ISO date/time, exclusive")
+    parser.add_argument("--type", nargs="+", choices=TRANSACTION_TYPES, dest="types")
+    parser.add_argument("--model", nargs="+", dest="models")
+    parser.add_argument("--source", nargs="+", dest="sources", help="app, http, stream or bulk")
+    parser.add_argument("--fraud-only", action="store_true")
+    parser.add_argument("--output", help="Write the matching decisions to this CSV")
+    parser.add_argument("--segments", action="store_true", help="List the segments and exit")
+    args = parser.parse_args(argv)
+
+    reader = AuditReader(args.dir)
+    if args.segments:
+        for path, meta in reader.segments():
+            span = "-".join(datetime.datetime.fromtimestamp(meta[key], datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                            for key in ("min_ts", "max_ts"))
+            print(f"{os.path.basename(path)}  {meta['rows']:>10,} rows  {span}  "
+                  f"{'sealed' if meta['sealed'] else 'open'}")
+        return
+
+    start = time.perf_counter()
+    frame = reader.query(start=args.since, end=args.until, types=args.types, models=args.models,
+                         sources=args.sources, label=FRAUD_LABEL if args.fraud_only else None)
+    elapsed = time.perf_counter() - start
+    print(f"{len(frame):,} matching decisions in {elapsed:.3f}s", flush=True)
+    frame["ts"] = pd.to_datetime(frame["ts"], unit="s", utc=True)
+    if args.output:
+        frame.to_csv(args.output, index=False)
+        print(f"Wrote {args.output}")
+    elif len(frame):
+        print(frame.tail(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
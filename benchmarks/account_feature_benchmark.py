@@ -0,0 +1,102 @@
+"""Throughput, memory and parity checks for ``AccountFeatureStore``.
+
+* parity: ``transform`` on ``credit card.csv`` vs ``observe_record`` on the
+  same rows round-tripped through JSON (the online path) must be identical
+* scale: synthetic transactions over millions of accounts, reporting
+  per-transaction throughput, state size and evictions when the table is
+  smaller than the account population
+
+Usage:
+    python -m benchmarks.account_feature_benchmark [--accounts 1000000 4000000] [--transactions 1000000]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from account_features import SOURCE_COLUMNS, AccountFeatureStore
+from benchmarks.model_benchmark import percentiles
+from dataset import DATA_PATH
+
+
+def check_parity(path=DATA_PATH):
+    frame = pd.read_csv(path, usecols=SOURCE_COLUMNS)
+    offline = AccountFeatureStore(1 << 14).transform(frame).to_numpy()
+    online_store = AccountFeatureStore(1 << 14)
+    records = [json.loads(line) for line in frame.to_json(orient="records", lines=True).splitlines()]
+    online = np.vstack([online_store.observe_record(record) for record in records])
+    return np.array_equal(offline, online), len(frame)
+
+
+def synthetic_transactions(n_transactions, n_accounts, rng, steps=744):
+    """Step-ordered transactions; a fifth of them come from a hot 1% of accounts."""
+    orig = rng.integers(0, n_accounts, n_transactions)
+    hot = rng.random(n_transactions) < 0.2
+    orig[hot] = rng.integers(0, max(n_accounts // 100, 1), int(hot.sum()))
+    dest = rng.integers(0, n_accounts, n_transactions)
+    amount = rng.lognormal(8, 2, n_transactions).round(2)
+    old = rng.lognormal(9, 2, n_transactions).round(2)
+    return pd.DataFrame({
+        "step": np.sort(rng.integers(1, steps, n_transactions)),
+        "amount": amount,
+        "nameOrig": [f"C{i}" for i in orig],
+        "oldbalanceOrg": old,
+        "newbalanceOrig": np.maximum(old - amount, 0.0),
+        "nameDest": [f"C{i}" for i in dest],
+        "oldbalanceDest": 0.0,
+        "newbalanceDest": amount,
+    })
+
+
+def measure(frame, capacity, ttl_steps):
+    store = AccountFeatureStore(capacity, ttl_steps=ttl_steps)
+    start = time.perf_counter()
+    store.transform(frame)
+    return store.stats(), time.perf_counter() - start
+
+
+def online_latency(store, records, repeats=20_000):
+    samples = []
+    for record in records[:repeats]:
+        start = time.perf_counter()
+        store.observe_record(record)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the per-account feature store.")
+    parser.add_argument("--accounts", type=int, nargs="+", default=[1_000_000, 4_000_000])
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--ttl-steps", type=int, default=24 * 7)
+    args = parser.parse_args(argv)
+
+    identical, rows = check_parity()
+    print(f"offline/online parity on {rows:,} rows: {'identical' if identical else 'MISMATCH'}")
+    if not identical:
+        raise SystemExit(1)
+
+    rng = np.random.default_rng(42)
+    for n_accounts in args.accounts:
+        frame = synthetic_transactions(args.transactions, n_accounts, rng)
+        active = len(pd.unique(pd.concat([frame["nameOrig"], frame["nameDest"]])))
+        # Room for every active account, then a table at a quarter of that
+        roomy = 1 << int(np.ceil(np.log2(active / 0.75)))
+        for capacity in (roomy, roomy // 4):
+            stats, elapsed = measure(frame, capacity, args.ttl_steps)
+            print(f"accounts={n_accounts:,} active={active:,} capacity={capacity:,}: "
+                  f"{len(frame) / elapsed:,.0f} txn/s ({elapsed / len(frame) * 1e6:.1f} us/txn) "
+                  f"state={stats['nbytes'] / 2**20:,.0f} MiB ({stats['nbytes'] / max(stats['accounts'], 1):.0f} B/account) "
+                  f"evictions={stats['evictions']:,} rehashes={stats['rehashes']}")
+
+        store = AccountFeatureStore(roomy, ttl_steps=args.ttl_steps)
+        store.transform(frame)
+        records = frame.tail(20_000).to_dict("records")
+        latency = online_latency(store, records)
+        print(f"  online observe_record: p50={latency['p50_ms'] * 1000:.1f}us p99={latency['p99_ms'] * 1000:.1f}us")
+
+
+if __name__ == "__main__":
+    main()
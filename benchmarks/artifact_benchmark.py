@@ -0,0 +1,135 @@
+"""Load time and memory of the model artifacts vs the joblib pickles.
+
+* load: median in-process load time per model over ``--repeats`` loads
+  (warm page cache), pickle via ``joblib.load`` vs ``load_model_artifact``
+  with checksum verification
+* processes: ``--workers`` fresh processes per backend each load every
+  model and score the holdout, then wait for each other so they are all
+  alive when memory is read from ``/proc/self/smaps_rollup``. RSS counts
+  shared pages in full in every process, PSS splits them between the
+  processes that map them, so memory-mapped artifacts show up as a lower
+  PSS/private total. The first-load time includes importing whatever the
+  backend needs (sklearn, for the pickles).
+
+Usage:
+    python -m benchmarks.artifact_benchmark [--workers 4] [--repeats 50]
+"""
+import argparse
+import multiprocessing
+import time
+
+import numpy as np
+
+from benchmarks.model_benchmark import percentiles
+from model_registry import MODEL_NAMES, model_path
+
+BACKENDS = ("pickle", "artifact")
+
+
+def memory_status(pid="self"):
+    """RSS/PSS/private bytes of a process (Linux), or ``None``."""
+    fields = {"Rss": "rss", "Pss": "pss", "Private_Clean": "private", "Private_Dirty": "private"}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    status = {"rss": 0, "pss": 0, "private": 0}
+    for line in lines:
+        key, _, value = line.partition(":")
+        if key in fields:
+            status[fields[key]] += int(value.split()[0]) * 1024
+    return status
+
+
+def load(backend, name):
+    if backend == "pickle":
+        import joblib
+
+        return joblib.load(model_path(name))
+    from model_artifacts import load_model_artifact
+
+    model = load_model_artifact(name, model_path(name))
+    if model is None:
+        raise SystemExit(f"{name}: no up-to-date artifact, run `python model_artifacts.py` first")
+    return model
+
+
+def _holdout():
+    from dataset import holdout_split, load_dataset
+
+    return holdout_split(load_dataset())[1]
+
+
+def _worker(backend, names, barrier, results):
+    x_test = _holdout()
+    before = memory_status()
+    first_load_ms = {}
+    models = {}
+    for name in names:
+        start = time.perf_counter()
+        models[name] = load(backend, name)
+        first_load_ms[name] = (time.perf_counter() - start) * 1000
+    for model in models.values():
+        model.predict_proba(x_test)
+    # Every worker is alive (and has touched its model pages) before measuring
+    barrier.wait()
+    after = memory_status()
+    results.put({"first_load_ms": first_load_ms,
+                 "delta": {key: after[key] - before[key] for key in after} if before else None})
+    barrier.wait()
+
+
+def measure_processes(backend, names, workers):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(backend, names, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return reports
+
+
+def measure_loads(backend, names, repeats):
+    timings = {}
+    for name in names:
+        load(backend, name)
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            load(backend, name)
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[name] = percentiles(samples)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare artifact and pickle load time and memory.")
+    parser.add_argument("--models", nargs="+", choices=MODEL_NAMES, default=list(MODEL_NAMES))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    print("Load time (warm, in-process, p50 ms):")
+    loads = {backend: measure_loads(backend, args.models, args.repeats) for backend in BACKENDS}
+    for name in args.models:
+        pickle_ms, artifact_ms = (loads[backend][name]["p50_ms"] for backend in BACKENDS)
+        print(f"  {name:<20} pickle={pickle_ms:7.2f}  artifact={artifact_ms:7.2f}  ({pickle_ms / artifact_ms:4.1f}x)")
+
+    print(f"\n{args.workers} worker processes, all models loaded and scored:")
+    for backend in BACKENDS:
+        reports = measure_processes(backend, args.models, args.workers)
+        first_load = sum(np.median([r["first_load_ms"][name] for r in reports]) for name in args.models)
+        line = f"  {backend:<9} first load (all models)={first_load:8.1f} ms"
+        if reports[0]["delta"] is not None:
+            total = {key: sum(r["delta"][key] for r in reports) for key in ("rss", "pss", "private")}
+            line += (f"  RSS +{total['rss'] / 2**20:6.1f} MiB  PSS +{total['pss'] / 2**20:6.1f} MiB"
+                     f"  private +{total['private'] / 2**20:6.1f} MiB (sum over workers)")
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Cost of the decision audit log on the scoring path, and reader speed.
+
+In a temporary directory:
+
+* times ``AuditWriter.record`` for single rows and ``--batch``-row blocks
+  while its background thread flushes;
+* times one service-style single-row score (``encode_records`` +
+  ``scoring.score``) with and without recording the decision;
+* records ``--rows`` resampled decisions across the five models (segments
+  of ``--segment-rows``) and reports write throughput and size on disk;
+* replays the whole log and runs filtered queries (a 10% time window, one
+  transaction type, one model, flagged rows only).
+
+Usage:
+    python -m benchmarks.audit_benchmark [--rows 5000000] [--batch 256]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from audit_log import AuditReader, AuditWriter
+from dataset import load_dataset
+from features import FEATURE_COLUMNS, FRAUD_LABEL, encode_records
+from model_registry import MODEL_NAMES, get_model
+from scoring import score
+
+RECORD = {"type": "TRANSFER", "amount": 181.0, "oldbalanceOrg": 181.0, "newbalanceOrig": 0.0}
+
+
+def per_call_us(func, repeats):
+    """Median over 5 runs of the mean cost of ``func()`` in microseconds."""
+    runs = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            func()
+        runs.append((time.perf_counter() - start) / repeats * 1e6)
+    return float(np.median(runs))
+
+
+def scoring_overhead(writer, model_name, repeats):
+    """``(audited_us, bare_us)`` for one single-record score."""
+    model = get_model(model_name)
+
+    def bare():
+        features = encode_records([RECORD])
+        return score(model, features, model_name)
+
+    def audited():
+        start = time.perf_counter()
+        features = encode_records([RECORD])
+        _, fraud_probability = score(model, features, model_name)
+        writer.record("bench", model_name, features, fraud_probability, latency_ms=(time.perf_counter() - start) * 1000)
+
+    samples = {audited: [], bare: []}
+    for _ in range(10):
+        for func in samples:
+            samples[func].append(per_call_us(func, repeats // 10 or 1))
+    return float(np.median(samples[audited])), float(np.median(samples[bare]))
+
+
+def directory_bytes(directory):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the audit log's write overhead and query speed.")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--segment-rows", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=20000)
+    parser.add_argument("--model", choices=MODEL_NAMES, default="Logistic Regression")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="audit-bench-")
+    try:
+        rng = np.random.default_rng(0)
+        data = load_dataset()[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        row, probability = data[:1], np.array([0.25])
+        block = data[rng.integers(0, len(data), args.batch)]
+        block_probability = rng.random(args.batch)
+
+        writer = AuditWriter(os.path.join(directory, "overhead"))
+        print("AuditWriter.record (µs per call):")
+        print(f"  single row        {per_call_us(lambda: writer.record('bench', args.model, row, probability), args.repeats):8.2f}")
+        batch_us = per_call_us(lambda: writer.record("bench", args.model, block, block_probability), args.repeats // 10)
+        print(f"  block of {args.batch:<8} {batch_us:8.2f}  ({batch_us / args.batch * 1000:.0f} ns per row)")
+        audited, bare = scoring_overhead(writer, args.model, max(args.repeats // 10, 100))
+        print(f"Single-record score, {args.model} (µs): audited {audited:.2f}  bare {bare:.2f}  "
+              f"overhead {audited - bare:.2f}")
+        writer.close()
+
+        log_dir = os.path.join(directory, "log")
+        writer = AuditWriter(log_dir, segment_rows=args.segment_rows)
+        blocks = args.rows // args.batch
+        start = time.perf_counter()
+        for i in range(blocks):
+            rows = rng.integers(0, len(data) - args.batch)
+            writer.record("bench", MODEL_NAMES[i % len(MODEL_NAMES)], data[rows:rows + args.batch],
+                          rng.random(args.batch), latency_ms=0.5)
+            if i % 256 == 0:
+                # Keep the producer within the writer's backlog limit
+                while writer._pending_rows > writer.max_pending_rows // 2:
+                    time.sleep(0.01)
+        queued = time.perf_counter() - start
+        writer.close()
+        written = time.perf_counter() - start
+        total = blocks * args.batch
+        print(f"\nRecorded {total:,} decisions: queued in {queued:.2f}s, on disk after {written:.2f}s "
+              f"({total / written:,.0f} rows/s), {directory_bytes(log_dir) / 2**20:,.1f} MiB")
+
+        reader = AuditReader(log_dir)
+        segments = reader.segments()
+        start = time.perf_counter()
+        replay = reader.query()
+        print(f"\nQueries over {len(segments)} segments:")
+        print(f"  {'full replay':<28} {len(replay):>10,} rows  {time.perf_counter() - start:7.3f}s")
+        # The middle tenth of the decisions by time
+        window = tuple(np.quantile(replay["ts"], [0.45, 0.55]))
+        del replay
+        queries = {
+            "10% time window": {"start": window[0], "end": window[1]},
+            "type TRANSFER": {"types": ["TRANSFER"]},
+            f"model {MODEL_NAMES[0]}": {"models": [MODEL_NAMES[0]]},
+            "flagged only": {"label": FRAUD_LABEL},
+        }
+        for name, filters in queries.items():
+            start = time.perf_counter()
+            frame = reader.query(**filters)
+            print(f"  {name:<28} {len(frame):>10,} rows  {time.perf_counter() - start:7.3f}s")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Per-transaction cost and sensitivity of the drift monitor.
+
+Feeds ``drift_monitor.DriftMonitor`` rows resampled from ``credit card.csv``
+with fraud probabilities from ``--model``:
+
+* cost per transaction of ``observe`` for single rows and for blocks of
+  ``--batch`` rows (a service micro-batch), flushes included;
+* the monitor's size before and after, which must not grow;
+* the report for unchanged traffic and for traffic with every amount
+  multiplied by ``--shift``, which should raise an ``amount`` alert.
+
+Usage:
+    python -m benchmarks.drift_benchmark [--model "Random Forest"] [--batch 256] [--shift 3]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from dataset import load_dataset
+from drift_monitor import BASELINE_PATH, load_monitor
+from features import FEATURE_COLUMNS, model_input
+from model_registry import MODEL_NAMES, get_model
+from scoring import fraud_column
+
+
+def monitor_bytes(monitor):
+    """Histogram arrays in bytes, and the rows waiting to be binned."""
+    arrays = [array for histogram in (*monitor.features.values(), *monitor.scores.values())
+              for array in (histogram.edges, histogram.expected, histogram.counts)]
+    pending = monitor._n_features + sum(monitor._n_scores.values())
+    return sum(array.nbytes for array in arrays), pending
+
+
+def per_row_ns(monitor, model_name, features, scores, batch):
+    """Mean cost of ``observe`` per row when fed ``batch`` rows at a time."""
+    blocks = [(features[i:i + batch], scores[i:i + batch]) for i in range(0, len(features) - batch + 1, batch)]
+    start = time.perf_counter_ns()
+    for block, block_scores in blocks:
+        monitor.observe(model_name, block, block_scores)
+    return (time.perf_counter_ns() - start) / (len(blocks) * batch)
+
+
+def fresh(window):
+    monitor = load_monitor(window=window)
+    if monitor is None:
+        raise SystemExit(f"No baseline at {BASELINE_PATH}: run python drift_monitor.py")
+    return monitor
+
+
+def describe(report, model_name):
+    for name, stats in (*report["features"].items(), ("fraud score", report["scores"][model_name])):
+        print(f"  {name:<16} {stats['status']:<8} PSI {stats['psi']:.4f}  KS {stats['ks']:.4f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the drift monitor's overhead and sensitivity.")
+    parser.add_argument("--model", choices=MODEL_NAMES, default="Random Forest")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--shift", type=float, default=3.0, help="Amount multiplier for the drifted traffic")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    data = load_dataset()[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    features = data[rng.integers(0, len(data), args.rows)]
+    model = get_model(args.model)
+    scores = model.predict_proba(model_input(model, features))[:, fraud_column(model)]
+
+    monitor = fresh(window=10000)
+    before = monitor_bytes(monitor)
+    print(f"observe() per transaction, {args.rows:,} rows (ns):")
+    for batch in (1, 16, args.batch):
+        print(f"  blocks of {batch:<5} {per_row_ns(monitor, args.model, features, scores, batch):8.0f}")
+    after = monitor_bytes(monitor)
+    print(f"Histograms: {before[0]:,} bytes before, {after[0]:,} after; {after[1]:,} rows pending "
+          f"(at most {monitor.flush_rows * (1 + len(monitor.scores)):,})")
+
+    print("\nUnchanged traffic:")
+    describe(monitor.report(), args.model)
+
+    drifted = features.copy()
+    drifted[:, FEATURE_COLUMNS.index("amount")] *= args.shift
+    monitor = fresh(window=10000)
+    per_row_ns(monitor, args.model, drifted[:20000], scores[:20000], args.batch)
+    print(f"\nAmounts x{args.shift:g}:")
+    report = monitor.report()
+    describe(report, args.model)
+    print("  alerts: " + (", ".join(name for _, name, _ in monitor.alerts(report)) or "none"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Cost and exactness of the tree models' feature attributions.
+
+For the Decision Tree and Random Forest, on rows from ``credit card.csv``:
+
+* cost per row of ``TreeExplainer.shap_values`` for single rows, blocks of
+  ``--batch`` rows and every row the model flags, next to the served
+  model's ``predict_proba`` on the same rows;
+* the slow per-row reference (every coalition, every tree walked in
+  Python) and a perturbation explainer (each coalition averaged over
+  ``--background`` rows through ``predict_proba``) for comparison;
+* the largest difference from the reference and the largest gap between
+  ``expected_value + sum(contributions)`` and the fraud probability.
+
+Usage:
+    python -m benchmarks.explainer_benchmark [--batch 256] [--background 100]
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+
+from dataset import load_dataset
+from features import FEATURE_COLUMNS, FRAUD_LABEL
+from model_registry import get_model, model_path
+from scoring import fraud_column
+from tree_compiler import TREE_MODELS
+from tree_explainer import _shapley_matrix, get_explainer, reference_shap_values, verify
+
+
+def per_row_us(func, X, batch, min_seconds=0.5):
+    """Mean cost per row of ``func`` over blocks of ``batch`` rows."""
+    blocks = [X[i:i + batch] for i in range(0, len(X) - batch + 1, batch)] or [X]
+    rows = calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds or not calls:
+        block = blocks[calls % len(blocks)]
+        func(block)
+        rows += len(block)
+        calls += 1
+    return (time.perf_counter() - start) / rows * 1e6
+
+
+def perturbation_shap_values(model, X, background):
+    """Interventional Shapley values: features outside a coalition are taken
+    from ``background`` rows and the probabilities averaged."""
+    n_features = X.shape[1]
+    column = fraud_column(model)
+    coalitions = np.array([[coalition >> j & 1 for j in range(n_features)] for coalition in range(1 << n_features)],
+                          dtype=bool)
+    result = np.empty_like(X)
+    for i, x in enumerate(X):
+        rows = np.where(coalitions[:, None, :], x, background[None, :, :]).reshape(-1, n_features)
+        expectations = model.predict_proba(rows)[:, column].reshape(len(coalitions), -1).mean(axis=1)
+        result[i] = expectations @ _shapley_matrix(n_features)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the tree attribution engine against slower explainers.")
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--background", type=int, default=100)
+    parser.add_argument("--reference-rows", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    data = load_dataset()[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    X = data[rng.permutation(len(data))]
+    background = X[:args.background]
+
+    for name in TREE_MODELS:
+        model = get_model(name)
+        estimator = joblib.load(model_path(name))
+        start = time.perf_counter()
+        explainer = get_explainer(name)
+        load_ms = (time.perf_counter() - start) * 1000
+        flagged = X[model.predict(X) == FRAUD_LABEL]
+        print(f"\n{name}: {explainer.n_leaves:,} leaves, tables loaded in {load_ms:.1f} ms")
+        print(f"  {'rows per call':<24} {'explain µs/row':>15} {'predict_proba µs/row':>21}")
+        for label, rows, batch in (("1", X, 1), (f"{args.batch}", X, args.batch),
+                                   (f"all {len(flagged):,} flagged", flagged, len(flagged))):
+            explain = per_row_us(explainer.shap_values, rows, batch)
+            predict = per_row_us(model.predict_proba, rows, batch)
+            print(f"  {label:<24} {explain:>15.1f} {predict:>21.1f}")
+
+        sample = X[:args.reference_rows]
+        reference_us = per_row_us(lambda block: reference_shap_values(estimator, block), sample, len(sample), 0)
+        perturbation_us = per_row_us(lambda block: perturbation_shap_values(model, block, background),
+                                     sample, len(sample), 0)
+        print(f"  reference (Python walk)  {reference_us:>15,.0f}")
+        print(f"  perturbation ({args.background} bg)  {perturbation_us:>15,.0f}")
+        error = np.abs(explainer.shap_values(sample) - reference_shap_values(estimator, sample)).max()
+        print(f"  max |Δ| vs reference {error:.2e}; max |sum - proba| {verify(estimator, explainer, X):.2e}")
+
+
+if __name__ == "__main__":
+    main()
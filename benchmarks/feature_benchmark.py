@@ -0,0 +1,100 @@
+"""Feature preparation cost: DataFrame construction vs the reusable buffer.
+
+Single rows (one app analysis):
+
+* dict -> ``pd.DataFrame`` -> column-reordered copy, as the app used to do
+* ``features.encode_transaction`` (one DataFrame in training order)
+* ``FeatureEncoder.transaction`` (lookup + write into a preallocated array)
+
+Batches (``--batch`` JSON records, one service micro-batch):
+
+* ``encode_records`` + ``pd.DataFrame`` wrap, as the service used to do
+* ``encode_records`` (fresh array per call)
+* ``FeatureEncoder.records`` (reused array)
+
+Each is also timed end to end with ``predict_proba`` of ``--model`` as
+served (NumPy evaluator) and as the sklearn pickle, which gets its feature
+names through ``model_input``.
+
+Usage:
+    python -m benchmarks.feature_benchmark [--model "Logistic Regression"] [--batch 256]
+"""
+import argparse
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, TYPE_MAPPING, FeatureEncoder, encode_records, encode_transaction, model_input
+from model_registry import MODEL_NAMES, get_model, model_path
+
+TRANSACTION = ("TRANSFER", 181.0, 181.0, 0.0)
+
+
+def per_call_us(func, repeats):
+    """Median over 7 runs of the mean cost of ``func()`` in microseconds."""
+    func()
+    runs = []
+    for _ in range(7):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            func()
+        runs.append((time.perf_counter() - start) / repeats * 1e6)
+    return float(np.median(runs))
+
+
+def legacy_transaction(type_transaction, amount, oldbalanceOrg, newbalanceOrig):
+    input_data = pd.DataFrame({
+        "type": [TYPE_MAPPING[type_transaction]],
+        "amount": [amount],
+        "oldbalanceOrg": [oldbalanceOrg],
+        "newbalanceOrig": [newbalanceOrig],
+    })
+    return input_data[["type", "amount", "oldbalanceOrg", "newbalanceOrig"]]
+
+
+def legacy_records(records):
+    return pd.DataFrame(encode_records(records), columns=FEATURE_COLUMNS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare feature preparation paths.")
+    parser.add_argument("--model", choices=MODEL_NAMES, default="Logistic Regression")
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--repeats", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    encoder = FeatureEncoder()
+    records = [dict(zip(FEATURE_COLUMNS, TRANSACTION), amount=float(i)) for i in range(args.batch)]
+    single = {
+        "DataFrame + reorder copy": lambda: legacy_transaction(*TRANSACTION),
+        "encode_transaction": lambda: encode_transaction(*TRANSACTION),
+        "FeatureEncoder.transaction": lambda: encoder.transaction(*TRANSACTION),
+    }
+    batch = {
+        "encode_records + DataFrame": lambda: legacy_records(records),
+        "encode_records": lambda: encode_records(records),
+        "FeatureEncoder.records": lambda: encoder.records(records),
+    }
+    np.testing.assert_array_equal(encoder.transaction(*TRANSACTION), legacy_transaction(*TRANSACTION).to_numpy())
+    np.testing.assert_array_equal(encoder.records(records), legacy_records(records).to_numpy())
+
+    served = get_model(args.model)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        pickled = joblib.load(model_path(args.model))
+
+    for title, paths in (("Single row", single), (f"Batch of {args.batch} records", batch)):
+        repeats = args.repeats if paths is single else max(args.repeats // 10, 50)
+        print(f"{title} (µs per call):")
+        print(f"  {'':<30} {'encode':>9}  {'+ served predict':>15}  {'+ sklearn predict':>16}")
+        for name, encode in paths.items():
+            print(f"  {name:<30} {per_call_us(encode, repeats):9.2f}"
+                  f"  {per_call_us(lambda: served.predict_proba(model_input(served, encode())), repeats):15.2f}"
+                  f"  {per_call_us(lambda: pickled.predict_proba(model_input(pickled, encode())), repeats):16.2f}")
+
+
+if __name__ == "__main__":
+    main()
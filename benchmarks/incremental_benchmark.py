@@ -0,0 +1,77 @@
+"""Incremental updates vs full retraining as the labeled history grows.
+
+Starts from the models fitted on the notebooks' training split, then feeds
+``--chunks`` chunks resampled from those rows (``--rows`` in total). After
+each chunk it compares, for Naive Bayes and logistic regression:
+
+* the time to fold the chunk in (``IncrementalModels.partial_fit``) with
+  the time to refit the notebooks' estimator on the whole history so far;
+* holdout accuracy of both, and the largest fraud-probability difference
+  between them on the holdout rows.
+
+Usage:
+    python -m benchmarks.incremental_benchmark [--rows 1000000] [--chunks 10]
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.exceptions import ConvergenceWarning
+
+from dataset import holdout_split, load_dataset
+from features import FEATURE_COLUMNS
+from incremental_training import INCREMENTAL_MODELS, IncrementalModels
+from train_pipeline import build_estimator
+
+
+def full_refit(name, x_history, y_history):
+    """``(estimator, seconds)`` for a from-scratch fit on the whole history."""
+    estimator = build_estimator(name)
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        estimator.fit(x_history, y_history)
+    return estimator, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare incremental updates with full retraining.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="New labeled rows streamed in")
+    parser.add_argument("--chunks", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    x_train, x_test, y_train, y_test = holdout_split(load_dataset())
+    y_test = y_test.to_numpy()
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(x_train), args.rows)
+    x_stream = x_train.to_numpy(dtype=np.float64)[picks]
+    y_stream = y_train.to_numpy()[picks]
+
+    models = IncrementalModels.from_history(x_train, y_train)
+    history_x, history_y = [x_train.to_numpy(dtype=np.float64)], [y_train.to_numpy()]
+    header = (f"{'history':>10}  {'model':<20} {'update s':>9} {'refit s':>9} {'speedup':>8}  "
+              f"{'acc inc':>7} {'acc full':>8} {'max |Δp|':>9}")
+    print(header)
+    print("-" * len(header))
+    for x_chunk, y_chunk in zip(np.array_split(x_stream, args.chunks), np.array_split(y_stream, args.chunks)):
+        chunk = pd.DataFrame(x_chunk, columns=FEATURE_COLUMNS)
+        seconds = models.partial_fit(chunk, y_chunk)
+        history_x.append(x_chunk)
+        history_y.append(y_chunk)
+        x_history = pd.DataFrame(np.concatenate(history_x), columns=FEATURE_COLUMNS)
+        y_history = np.concatenate(history_y)
+        incremental = models.estimators()
+        for name in INCREMENTAL_MODELS:
+            full, refit_seconds = full_refit(name, x_history, y_history)
+            column = list(full.classes_).index("Fraud")
+            gap = np.abs(incremental[name].predict_proba(x_test)[:, column] - full.predict_proba(x_test)[:, column]).max()
+            print(f"{len(x_history):>10,}  {name:<20} {seconds[name]:>9.4f} {refit_seconds:>9.4f} "
+                  f"{refit_seconds / seconds[name]:>7.0f}x  "
+                  f"{np.mean(incremental[name].predict(x_test) == y_test):>7.4f} "
+                  f"{np.mean(full.predict(x_test) == y_test):>8.4f} {gap:>9.2e}")
+
+
+if __name__ == "__main__":
+    main()
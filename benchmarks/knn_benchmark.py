@@ -0,0 +1,102 @@
+"""Scaled KD-tree index vs the current KNN model as the reference set grows.
+
+The reference set is grown by resampling the training rows with a small
+multiplicative jitter on the monetary columns. For every size this compares:
+
+* ``current``: ``KNeighborsClassifier`` on raw features, configured like the
+  shipped pickle
+* ``brute``: the same model forced to exhaustive search
+* ``index``: ``ScaledKNNIndex`` persisted and re-loaded memory-mapped
+
+and reports single-query latency, batch throughput, label agreement with the
+current model and fraud recall on the holdout split.
+
+Usage:
+    python -m benchmarks.knn_benchmark [--sizes 2199 100000 1000000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import recall_score
+
+from benchmarks.model_benchmark import percentiles
+from dataset import holdout_split, load_dataset
+from features import FEATURE_COLUMNS, FRAUD_LABEL
+from knn_index import MONETARY_COLUMNS, ScaledKNNIndex
+from model_registry import model_path
+
+
+def grow_reference(X, y, size, rng, jitter=0.05):
+    if size <= len(X):
+        return X[:size], y[:size]
+    picks = rng.integers(0, len(X), size=size)
+    grown = X[picks].copy()
+    grown[:, MONETARY_COLUMNS] *= rng.lognormal(0.0, jitter, size=(size, len(MONETARY_COLUMNS)))
+    grown[:len(X)] = X
+    labels = y[picks]
+    labels[:len(X)] = y
+    return grown, labels
+
+
+def query_latency(predict_proba, queries, repeats):
+    predict_proba(queries[:1])
+    samples = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        predict_proba(queries[i % len(queries)].reshape(1, -1))
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scaled KNN index against the current model.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2199, 100_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    current_model = joblib.load(model_path("K-Nearest Neighbors"))
+    base_X = np.asarray(current_model._fit_X, dtype=np.float64)
+    base_y = np.asarray(current_model._y)
+    classes = current_model.classes_
+
+    _, x_test, _, y_test = holdout_split(load_dataset())
+    queries = x_test[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(42)
+
+    for size in args.sizes:
+        X, y = grow_reference(base_X, base_y, size, rng)
+        current = clone(current_model).set_params(algorithm="auto").fit(X, classes[y])
+        brute = clone(current_model).set_params(algorithm="brute").fit(X, classes[y])
+
+        start = time.perf_counter()
+        index = ScaledKNNIndex.fit(X, y, classes, current_model.n_neighbors)
+        build_seconds = time.perf_counter() - start
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "knn_index.joblib")
+            index.save(path)
+            start = time.perf_counter()
+            index = ScaledKNNIndex.load(path, mmap_mode="r")
+            load_seconds = time.perf_counter() - start
+
+            reference_labels = current.predict(queries)
+            print(f"\nreference rows={size:,}  index build={build_seconds:.2f}s  mmap load={load_seconds * 1000:.1f}ms")
+            candidates = (("current", current), ("brute", brute), ("index", index))
+            for label, model in candidates:
+                repeats = args.repeats if label != "brute" or size <= 100_000 else max(20, args.repeats // 10)
+                latency = query_latency(model.predict_proba, queries, repeats)
+                start = time.perf_counter()
+                predicted = model.predict(queries)
+                batch_rate = len(queries) / (time.perf_counter() - start)
+                agreement = float(np.mean(predicted == reference_labels))
+                fraud_recall = recall_score(y_test, predicted, pos_label=FRAUD_LABEL)
+                print(f"  {label:<8} p50={latency['p50_ms']:.3f}ms p99={latency['p99_ms']:.3f}ms "
+                      f"batch={batch_rate:,.0f} rows/s agreement={agreement:.4f} fraud_recall={fraud_recall:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Per-call cost of the scoring-path instrumentation in ``metrics.py``.
+
+Times each recording primitive in a tight loop, then the end-to-end cost
+the instrumentation adds to scoring one JSON transaction as the HTTP service
+does (``encode_records``, ``get_model``, ``scoring.score``) by comparing
+against the same steps with the metrics bypassed.
+
+Usage:
+    python -m benchmarks.metrics_benchmark [--model "Random Forest"] [--repeats 200000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import features
+import metrics
+import model_registry
+from model_registry import MODEL_NAMES, get_model
+from scoring import fraud_column, score
+
+
+def per_call_ns(func, repeats):
+    """Median over 5 runs of the mean cost of ``func()`` in nanoseconds."""
+    runs = []
+    for _ in range(5):
+        start = time.perf_counter_ns()
+        for _ in range(repeats):
+            func()
+        runs.append((time.perf_counter_ns() - start) / repeats)
+    return float(np.median(runs))
+
+
+def primitives(repeats):
+    counter = metrics.Counter("bench_total", "benchmark", ("model",))
+    histogram = metrics.Histogram("bench_seconds", "benchmark", ("model",))
+    child = histogram.labels("Random Forest")
+    timed_noop = child.timed(lambda: None)
+    baseline = per_call_ns(lambda: None, repeats)
+    return {
+        "counter.labels().inc()": per_call_ns(lambda: counter.labels("Random Forest").inc(), repeats) - baseline,
+        "histogram child.observe()": per_call_ns(lambda: child.observe(0.0003), repeats) - baseline,
+        "histogram.labels().observe()": per_call_ns(lambda: histogram.labels("Random Forest").observe(0.0003),
+                                                    repeats) - baseline,
+        "@timed wrapper": per_call_ns(timed_noop, repeats) - baseline,
+        "record_predictions (1 row)": per_call_ns(lambda: metrics.record_predictions("bench", ["Fraud"]),
+                                                 repeats) - baseline,
+    }
+
+
+def scoring_path(model_name, repeats):
+    """``(instrumented_us, bare_us)`` for encode + get_model + score of one record."""
+    records = [{"type": "TRANSFER", "amount": 181.0, "oldbalanceOrg": 181.0, "newbalanceOrig": 0.0}]
+    # The undecorated functions, as they were before instrumentation
+    encode = features.encode_records.__wrapped__
+    select = model_registry.get_model.__wrapped__
+
+    def instrumented():
+        score(get_model(model_name), features.encode_records(records), model_name)
+
+    def bare():
+        model = select(model_name)
+        proba = model.predict_proba(encode(records))
+        labels = np.asarray(model.classes_)[proba.argmax(axis=1)]
+        return labels, proba[:, fraud_column(model)]
+
+    instrumented()
+    # Alternate the two so drift in machine load affects both alike
+    samples = {instrumented: [], bare: []}
+    for _ in range(10):
+        for func in samples:
+            samples[func].append(per_call_ns(func, repeats // 10 or 1) / 1000)
+    return float(np.median(samples[instrumented])), float(np.median(samples[bare]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the overhead of the scoring metrics.")
+    parser.add_argument("--model", choices=MODEL_NAMES, default="Logistic Regression")
+    parser.add_argument("--repeats", type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    print("Recording primitives (ns per call, loop overhead subtracted):")
+    for name, ns in primitives(args.repeats).items():
+        print(f"  {name:<30} {ns:7.0f}")
+
+    repeats = max(args.repeats // 200, 100)
+    instrumented, bare = scoring_path(args.model, repeats)
+    print(f"\nSingle-row score, {args.model} (µs per call):")
+    print(f"  instrumented {instrumented:8.2f}  bare {bare:8.2f}  overhead {instrumented - bare:6.2f}")
+
+
+if __name__ == "__main__":
+    main()
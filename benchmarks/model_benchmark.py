@@ -0,0 +1,190 @@
+"""Reproducible quality/latency/memory benchmark for the shipped models.
+
+Replays the notebooks' 30% holdout split against every model as it is
+served: loaded through ``model_registry.get_model`` (the NumPy artifact,
+compiled tree or KNN index when one is current, the pickle otherwise) and
+fed float64 rows through ``model_input``, as the ``FeatureEncoder`` callers
+do. For each model it measures:
+
+* quality: accuracy and weighted precision/recall/F1 (as in the notebooks)
+  of the served decisions, i.e. at each model's tuned threshold from
+  ``decision_thresholds.json`` (0.5 without one)
+* single-row ``predict_proba`` latency percentiles (p50/p95/p99)
+* batch throughput at several batch sizes
+* load time and peak traced memory while loading and scoring the holdout
+
+The backend each figure was measured on is recorded next to it.
+
+Results are written to ``benchmarks/model_benchmarks.json``, which the
+Streamlit sidebar reads.
+
+Usage:
+    python -m benchmarks.model_benchmark [--repeats 500] [--output PATH]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+
+from benchmarks.results import RESULTS_PATH
+from dataset import DATA_PATH, holdout_split, load_dataset
+import model_registry
+from features import FEATURE_COLUMNS, FRAUD_LABEL, model_input
+from model_registry import MODEL_NAMES, model_path
+from scoring import fraud_column
+from thresholds import DEFAULT_THRESHOLD, decide, load_table
+
+BATCH_SIZES = (1, 10, 100, 1000, 10000)
+
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "mean_ms": float(samples.mean()),
+    }
+
+
+def measure_load(name):
+    """``(model, load_stats, peak)`` for a cold ``get_model(name)``."""
+    model_registry.clear()
+    tracemalloc.start()
+    model = model_registry.get_model(name)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return model, model_registry.load_stats(name), peak
+
+
+def measure_quality(model, x_test, y_test, threshold=DEFAULT_THRESHOLD):
+    """Quality of the decisions the app serves: fraud when the probability
+    reaches the model's tuned threshold."""
+    y_pred = decide(model.predict_proba(model_input(model, x_test))[:, fraud_column(model)], threshold)
+    return {
+        "threshold": threshold,
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision_score(y_test, y_pred, average="weighted"),
+        "recall": recall_score(y_test, y_pred, average="weighted"),
+        "f1_score": f1_score(y_test, y_pred, average="weighted"),
+        "fraud_recall": recall_score(y_test, y_pred, pos_label=FRAUD_LABEL, average="binary"),
+    }
+
+
+def measure_single_row(model, x_test, repeats, rng):
+    rows = x_test[rng.integers(0, len(x_test), size=repeats)]
+    # Warm up once so lazy initialisation isn't counted
+    model.predict_proba(model_input(model, rows[:1]))
+    samples = []
+    for i in range(repeats):
+        row = rows[i:i + 1]
+        start = time.perf_counter()
+        model.predict_proba(model_input(model, row))
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def measure_throughput(model, x_test, rng, min_seconds=0.2):
+    results = {}
+    for size in BATCH_SIZES:
+        batch = x_test[rng.integers(0, len(x_test), size=size)]
+        model.predict_proba(model_input(model, batch))
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            model.predict_proba(model_input(model, batch))
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds and calls >= 3:
+                break
+        results[str(size)] = {
+            "rows_per_second": size * calls / elapsed,
+            "ms_per_batch": elapsed / calls * 1000,
+        }
+    return results
+
+
+def measure_batch_memory(model, x_test):
+    tracemalloc.start()
+    model.predict_proba(model_input(model, x_test))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def dataset_summary(data, x_test):
+    return {
+        "path": os.path.basename(DATA_PATH),
+        "rows": int(len(data)),
+        "fraud_rows": int((data["isFraud"] == FRAUD_LABEL).sum()),
+        "total_amount": float(data["amount"].astype("float64").sum()),
+        "holdout_rows": int(len(x_test)),
+    }
+
+
+def run(repeats=500, seed=42):
+    data = load_dataset()
+    _, x_test, _, y_test = holdout_split(data)
+    x_test = x_test[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    thresholds = load_table()
+
+    models = {}
+    for name in MODEL_NAMES:
+        path = model_path(name)
+        model, stats, load_peak = measure_load(name)
+        models[name] = {
+            "file": os.path.basename(path),
+            "file_bytes": os.path.getsize(path),
+            "backend": stats["backend"],
+            "load_seconds": stats["load_seconds"],
+            "quality": measure_quality(model, x_test, y_test, thresholds.get(name, DEFAULT_THRESHOLD)),
+            "single_row_latency": measure_single_row(model, x_test, repeats, rng),
+            "throughput": measure_throughput(model, x_test, rng),
+            "peak_memory_bytes": {
+                "load": load_peak,
+                "score_holdout": measure_batch_memory(model, x_test),
+            },
+        }
+        print(f"{name:<20} {stats['backend']:<9} acc={models[name]['quality']['accuracy']:.4f} "
+              f"p50={models[name]['single_row_latency']['p50_ms']:.3f}ms "
+              f"p99={models[name]['single_row_latency']['p99_ms']:.3f}ms")
+
+    return {
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "sklearn": sklearn.__version__,
+        },
+        "config": {"repeats": repeats, "seed": seed, "batch_sizes": list(BATCH_SIZES)},
+        "dataset": dataset_summary(data, x_test),
+        "models": models,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the shipped FraudGuard models.")
+    parser.add_argument("--repeats", type=int, default=500, help="Single-row latency samples per model")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=RESULTS_PATH)
+    args = parser.parse_args(argv)
+
+    results = run(args.repeats, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
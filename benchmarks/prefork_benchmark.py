@@ -0,0 +1,139 @@
+"""Host memory and first-request latency: pre-forked workers vs replicas.
+
+Starts the scoring service two ways with the same number of serving
+processes and the same models loaded in each:
+
+* replicas: ``--workers`` independent ``scoring_service.py`` processes,
+  each loading its own copy of every model at startup;
+* prefork: one ``prefork_server.py`` whose workers share the models the
+  parent loaded before forking.
+
+For each it reports the first ``/score`` latency per model (sent right
+after the service answers ``/health``) and the summed RSS / PSS / private
+memory of all serving processes (plus the prefork parent) after every model
+has been used. Run it once with the artifacts (default) and once with
+``--pickles`` to see the copy-on-write sharing of heap-loaded pickles.
+
+Usage:
+    python -m benchmarks.prefork_benchmark [--workers 4] [--pickles]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.artifact_benchmark import memory_status
+from model_registry import MODEL_NAMES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRANSACTION = {"type": "TRANSFER", "amount": 181.0, "oldbalanceOrg": 181.0, "newbalanceOrig": 0.0}
+
+
+def request(port, path, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    with urllib.request.urlopen(urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data), timeout=30) as r:
+        return json.loads(r.read())
+
+
+def wait_healthy(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return request(port, "/health")
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def first_requests(port):
+    timings = {}
+    for name in MODEL_NAMES:
+        start = time.perf_counter()
+        request(port, "/score", {"model": name, "transactions": [TRANSACTION]})
+        timings[name] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def use_all_models(port, rounds):
+    for _ in range(rounds):
+        for name in MODEL_NAMES:
+            request(port, "/score", {"model": name, "transactions": [TRANSACTION]})
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def total_memory(pids):
+    statuses = [memory_status(pid) for pid in pids]
+    return {key: sum(status[key] for status in statuses) for key in ("rss", "pss", "private")}
+
+
+def run_replicas(workers, base_port, env):
+    ports = [base_port + i for i in range(workers)]
+    code = ("import sys, uvicorn; from scoring_service import ScoringService, MODEL_NAMES; "
+            "uvicorn.run(ScoringService(preload=MODEL_NAMES), port=int(sys.argv[1]), log_level='warning')")
+    processes = [subprocess.Popen([sys.executable, "-W", "ignore", "-c", code, str(port)], cwd=ROOT, env=env)
+                 for port in ports]
+    try:
+        for port in ports:
+            wait_healthy(port)
+        latency = first_requests(ports[0])
+        for port in ports:
+            use_all_models(port, 5)
+        return latency, total_memory([p.pid for p in processes])
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def run_prefork(workers, port, env):
+    process = subprocess.Popen([sys.executable, "-W", "ignore", os.path.join(ROOT, "prefork_server.py"),
+                                "--workers", str(workers), "--port", str(port)],
+                               cwd=ROOT, env=env, stderr=subprocess.DEVNULL)
+    try:
+        # Every worker up, like every replica above
+        pids = set()
+        while len(pids) < workers:
+            pids.add(wait_healthy(port)["pid"])
+        latency = first_requests(port)
+        # Connections are spread over the workers by the kernel; enough
+        # rounds that every worker has served every model
+        use_all_models(port, 10 * workers)
+        return latency, total_memory([process.pid, *children(process.pid)])
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare pre-forked workers with independent replicas.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--pickles", action="store_true", help="Load the joblib pickles instead of the artifacts")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    if args.pickles:
+        env.update(FRAUDGUARD_ARTIFACTS="0", FRAUDGUARD_COMPILED_TREES="0")
+
+    results = {
+        "replicas": run_replicas(args.workers, args.port, env),
+        "prefork": run_prefork(args.workers, args.port + args.workers, env),
+    }
+    print(f"{args.workers} serving processes, {'pickles' if args.pickles else 'artifacts'}:")
+    for mode, (latency, memory) in results.items():
+        first = "  ".join(f"{name.split()[0]}={ms:.1f}" for name, ms in latency.items())
+        print(f"  {mode:<9} RSS {memory['rss'] / 2**20:7.1f} MiB  PSS {memory['pss'] / 2**20:7.1f} MiB  "
+              f"private {memory['private'] / 2**20:7.1f} MiB   first request ms: {first}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""Location and reader for the model benchmark results.
+
+Kept apart from ``model_benchmark.py`` so the app can read the results
+without importing the benchmark harness (sklearn.metrics, tracemalloc).
+"""
+import json
+import os
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_benchmarks.json")
+
+
+def load_results(path=RESULTS_PATH):
+    """Previously written benchmark results, or ``None`` if unavailable."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,122 @@
+"""Load generator for ``stream_scorer.py`` built on ``credit card.csv``.
+
+Replays the dataset's transactions (cycling when ``--count`` exceeds it) as
+JSON lines at a target rate, either to stdout / a socket for an external
+scorer, or straight into an in-process ``StreamScorer`` to measure
+throughput and end-to-end latency.
+
+Usage:
+    python -m benchmarks.stream_load --rate 5000 --count 100000 | python stream_scorer.py -
+    python -m benchmarks.stream_load --connect unix:/tmp/fraudguard.sock --rate 2000
+    python -m benchmarks.stream_load --inprocess --rates 1000 10000 0
+"""
+import argparse
+import asyncio
+import io
+import sys
+import time
+
+import pandas as pd
+
+from account_features import SOURCE_COLUMNS
+from dataset import DATA_PATH
+from features import FEATURE_COLUMNS
+from stream_scorer import DEFAULT_MODEL, MAX_BATCH_SIZE, MAX_BATCH_WAIT, StreamScorer
+
+# Rows sent per pacing step; keeps timer overhead low at high rates
+PACING_BLOCK = 50
+
+
+def transaction_lines(path=DATA_PATH):
+    """Every dataset row as a JSON line: an ``id`` plus the CSV columns the
+    scorer and the account features use."""
+    frame = pd.read_csv(path, usecols=list(dict.fromkeys([*FEATURE_COLUMNS, *SOURCE_COLUMNS])))
+    frame.insert(0, "id", range(len(frame)))
+    return [line + "\n" for line in frame.to_json(orient="records", lines=True).splitlines()]
+
+
+async def generate(lines, count, rate, emit):
+    """Call ``await emit(line)`` ``count`` times at ``rate`` lines/s (0 = as fast as possible)."""
+    start = time.perf_counter()
+    for i in range(count):
+        await emit(lines[i % len(lines)])
+        if rate and i % PACING_BLOCK == PACING_BLOCK - 1:
+            ahead = (i + 1) / rate - (time.perf_counter() - start)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+            else:
+                await asyncio.sleep(0)
+    return time.perf_counter() - start
+
+
+async def send(address, lines, count, rate):
+    kind, _, target = address.partition(":")
+    if kind == "unix":
+        reader, writer = await asyncio.open_unix_connection(target)
+    else:
+        host, _, port = target.rpartition(":")
+        reader, writer = await asyncio.open_connection(host or "127.0.0.1", int(port))
+
+    async def emit(line):
+        writer.write(line.encode())
+        # Waits while the scorer isn't reading: its backpressure reaches us here
+        await writer.drain()
+
+    elapsed = await generate(lines, count, rate, emit)
+    writer.close()
+    await writer.wait_closed()
+    return elapsed
+
+
+async def run_inprocess(lines, count, rate, model_name, max_batch_size, max_wait):
+    scorer = StreamScorer(model_name, max_batch_size, max_wait)
+    sink = io.StringIO()
+
+    async def produce():
+        try:
+            await generate(lines, count, rate, scorer.feed)
+        finally:
+            await scorer.close()
+
+    await asyncio.gather(produce(), scorer.run(sink.write))
+    return scorer.stats.snapshot()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay credit card.csv as a JSON-lines transaction stream.")
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--rate", type=float, default=0, help="Lines per second (0 = unthrottled)")
+    parser.add_argument("--connect", help="Send to unix:PATH or tcp:HOST:PORT instead of stdout")
+    parser.add_argument("--inprocess", action="store_true", help="Score in-process and report stream stats")
+    parser.add_argument("--rates", type=float, nargs="+", default=[1000, 10_000, 0],
+                        help="Rates to measure with --inprocess")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait", type=float, default=MAX_BATCH_WAIT)
+    args = parser.parse_args(argv)
+
+    lines = transaction_lines()
+    if args.inprocess:
+        for rate in args.rates:
+            count = args.count if not rate else min(args.count, int(rate * 5))
+            stats = asyncio.run(run_inprocess(lines, count, rate, args.model, args.max_batch_size, args.max_wait))
+            label = f"{rate:,.0f}/s" if rate else "max"
+            print(f"rate={label:<10} rows={stats['scored']:,} throughput={stats['rows_per_second']:,.0f} rows/s "
+                  f"batch={stats['mean_batch_size']:.1f} p50={stats['latency_p50_ms']:.2f}ms "
+                  f"p99={stats['latency_p99_ms']:.2f}ms max_queue={stats['max_queue_depth']:,}")
+    elif args.connect:
+        elapsed = asyncio.run(send(args.connect, lines, args.count, args.rate))
+        print(f"Sent {args.count:,} lines in {elapsed:.2f}s", file=sys.stderr)
+    else:
+        async def emit(line):
+            sys.stdout.write(line)
+
+        try:
+            asyncio.run(generate(lines, args.count, args.rate, emit))
+            sys.stdout.flush()
+        except BrokenPipeError:
+            pass
+
+
+if __name__ == "__main__":
+    main()
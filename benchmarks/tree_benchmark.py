@@ -0,0 +1,71 @@
+"""Compiled tree tables vs sklearn ``predict_proba`` for the tree models.
+
+Usage:
+    python -m benchmarks.tree_benchmark [--repeats 1000]
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+
+from benchmarks.model_benchmark import BATCH_SIZES, percentiles
+from dataset import holdout_split, load_dataset
+from features import FEATURE_COLUMNS
+from model_registry import model_path
+from tree_compiler import TREE_MODELS, CompiledTrees, file_sha256, verify
+
+
+def single_row_latency(predict_proba, rows, repeats):
+    predict_proba(rows.iloc[:1])
+    samples = []
+    for i in range(repeats):
+        row = rows.iloc[i:i + 1]
+        start = time.perf_counter()
+        predict_proba(row)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def batch_throughput(predict_proba, x_test, rng, min_seconds=0.2):
+    results = {}
+    for size in BATCH_SIZES:
+        batch = x_test.iloc[rng.integers(0, len(x_test), size=size)].reset_index(drop=True)
+        predict_proba(batch)
+        calls = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < min_seconds or calls < 3:
+            predict_proba(batch)
+            calls += 1
+        results[size] = size * calls / (time.perf_counter() - start)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark compiled tree inference against sklearn.")
+    parser.add_argument("--repeats", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    _, x_test, _, _ = holdout_split(load_dataset())
+    x_test = x_test[FEATURE_COLUMNS]
+    rng = np.random.default_rng(42)
+    rows = x_test.iloc[rng.integers(0, len(x_test), size=args.repeats)]
+
+    for name in TREE_MODELS:
+        estimator = joblib.load(model_path(name))
+        compiled = CompiledTrees.from_estimator(estimator, file_sha256(model_path(name)))
+        identical = verify(estimator, compiled, x_test)
+        print(f"\n{name} ({compiled.n_trees} trees, {len(compiled.feature):,} nodes) "
+              f"- probabilities bit-identical: {identical}")
+
+        for label, predict_proba in (("sklearn", estimator.predict_proba), ("compiled", compiled.predict_proba)):
+            latency = single_row_latency(predict_proba, rows, args.repeats)
+            throughput = batch_throughput(predict_proba, x_test, rng)
+            print(f"  {label:<9} single row p50={latency['p50_ms']:.3f}ms "
+                  f"p95={latency['p95_ms']:.3f}ms p99={latency['p99_ms']:.3f}ms")
+            print("  " + " " * 9 + " rows/s " + "  ".join(
+                f"[{size}] {rate:,.0f}" for size, rate in throughput.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Background scoring of uploaded transaction files for the Streamlit app.
+
+Streamlit reruns the whole script on every interaction, so a file with
+hundreds of thousands of rows can't be scored inline. ``submit`` starts a
+``ScoringJob`` on a worker thread and returns immediately; the page polls
+``job.progress`` (rows scored out of rows in the file, updated per chunk).
+
+Jobs are keyed by the SHA-256 of the file contents, the scoring settings
+and the file version of every model the job scores, and kept in a small
+process-wide LRU. Uploading the same file again, from any session, reuses
+the finished (or still running) job until one of those models changes.
+"""
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from audit_log import record as audit_decisions
+from batch_score import DEFAULT_CHUNKSIZE, INPUT_DTYPES, score_frames
+from ensemble import ENSEMBLE_CHOICE, score_all
+from features import FEATURE_COLUMNS, FRAUD_LABEL
+from model_registry import MODEL_NAMES, file_version, get_model, model_path
+from scoring import score
+from thresholds import DEFAULT_THRESHOLD, decide, served_threshold
+
+# Input columns carried into the results when present
+CONTEXT_COLUMNS = ("step", "nameOrig", "nameDest")
+MAX_JOBS = 8
+
+_jobs = OrderedDict()
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bulk-score")
+
+
+class ScoringJob:
+    """State of one uploaded file being scored."""
+
+    def __init__(self, key, filename, model_name, total_rows):
+        self.key = key
+        self.filename = filename
+        self.model_name = model_name
+        self.total_rows = total_rows
+        self.rows_done = 0
+        self.status = "running"
+        self.error = None
+        self.result = None
+        self.started = time.perf_counter()
+        self.seconds = None
+        self._csv = None
+
+    @property
+    def progress(self):
+        if self.done:
+            return 1.0
+        return min(self.rows_done / self.total_rows, 1.0) if self.total_rows else 0.0
+
+    @property
+    def done(self):
+        return self.status != "running"
+
+    @property
+    def flagged(self):
+        return int((self.result["prediction"] == FRAUD_LABEL).sum()) if self.result is not None else 0
+
+    def csv_bytes(self):
+        """Results as CSV, rendered once and reused for every download."""
+        if self._csv is None:
+            self._csv = self.result.to_csv(index=False).encode()
+        return self._csv
+
+
+def file_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _read_chunks(data, filename, chunksize):
+    """``(total_rows, context_columns, chunks)`` for uploaded CSV or Parquet bytes."""
+    if filename.lower().endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet uploads need pyarrow (pip install pyarrow)") from None
+        parquet = pq.ParquetFile(io.BytesIO(data))
+        names = parquet.schema_arrow.names
+        keep = [c for c in CONTEXT_COLUMNS if c in names]
+        columns = [*keep, *(c for c in FEATURE_COLUMNS if c in names)]
+        batches = parquet.iter_batches(batch_size=chunksize, columns=columns)
+        return parquet.metadata.num_rows, keep, (batch.to_pandas() for batch in batches)
+    header = pd.read_csv(io.BytesIO(data), nrows=0).columns
+    keep = [c for c in CONTEXT_COLUMNS if c in header]
+    columns = [*keep, *(c for c in FEATURE_COLUMNS if c in header)]
+    # Line count is only the progress denominator; the final count is exact
+    total = data.count(b"\n") + (0 if data.endswith(b"\n") else 1) - 1
+    reader = pd.read_csv(io.BytesIO(data), usecols=columns, dtype={c: INPUT_DTYPES[c] for c in columns if c in INPUT_DTYPES},
+                         chunksize=chunksize)
+    return max(total, 0), keep, reader
+
+
+def _scorer(model_name, ensemble_options, threshold=None):
+    if model_name == ENSEMBLE_CHOICE:
+        def ensemble_scorer(features):
+            result = score_all(features, cached=False, **ensemble_options)
+            return result["labels"], result["fraud_probability"]
+        return _audited(ensemble_scorer, model_name, DEFAULT_THRESHOLD)
+    model = get_model(model_name)
+    if threshold is None:
+        return _audited(lambda features: score(model, features, model_name), model_name,
+                        served_threshold(model_name))
+
+    def threshold_scorer(features):
+        _, fraud_probability = score(model, features, model_name)
+        return decide(fraud_probability, threshold), fraud_probability
+    return _audited(threshold_scorer, model_name, threshold)
+
+
+def _audited(scorer, model_name, threshold):
+    """``scorer`` that also records each chunk's decisions in the audit log."""
+    def audited_scorer(features):
+        start = time.perf_counter()
+        labels, fraud_probability = scorer(features)
+        audit_decisions("bulk", model_name, features, fraud_probability, threshold,
+                        (time.perf_counter() - start) * 1000)
+        return labels, fraud_probability
+    return audited_scorer
+
+
+def _run(job, data, ensemble_options, threshold, chunksize):
+    try:
+        total, keep, chunks = _read_chunks(data, job.filename, chunksize)
+        job.total_rows = total
+        results = []
+        for chunk in score_frames(chunks, _scorer(job.model_name, ensemble_options, threshold), keep):
+            results.append(chunk)
+            job.rows_done += len(chunk)
+        result = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+        job.total_rows = job.rows_done
+        job.result = result
+        job.status = "done"
+    except Exception as e:  # surfaced in the UI
+        job.error = str(e)
+        job.status = "failed"
+    finally:
+        job.seconds = time.perf_counter() - job.started
+
+
+def submit(data, filename, model_name, ensemble_options=None, threshold=None, chunksize=DEFAULT_CHUNKSIZE // 4):
+    """Job for ``data`` scored with ``model_name``, started if not cached.
+
+    ``threshold`` flags rows whose fraud probability reaches it instead of
+    the model's served threshold.
+    """
+    ensemble_options = ensemble_options or {}
+    scored = ensemble_options.get("models", MODEL_NAMES) if model_name == ENSEMBLE_CHOICE else [model_name]
+    # A reload or a published update is a different model: score the file again
+    versions = tuple((name, file_version(model_path(name))) for name in scored)
+    key = (file_key(data), model_name, repr(sorted(ensemble_options.items())), threshold, versions)
+    with _lock:
+        job = _jobs.get(key)
+        if job is not None and job.status != "failed":
+            _jobs.move_to_end(key)
+            return job
+        job = ScoringJob(key, filename, model_name, total_rows=0)
+        _jobs[key] = job
+        while len(_jobs) > MAX_JOBS:
+            oldest = next(iter(_jobs))
+            if not _jobs[oldest].done:
+                break
+            del _jobs[oldest]
+    _executor.submit(_run, job, data, ensemble_options, threshold, chunksize)
+    return job
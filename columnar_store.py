@@ -0,0 +1,216 @@
+"""Typed, memory-mapped columnar cache of transaction CSVs.
+
+A CSV in the ``credit card.csv`` schema is parsed once, in chunks, into one
+raw binary file per column plus a ``meta.json``:
+
+* ``type`` is stored as its int8 model code (``TYPE_MAPPING``), with the
+  category names kept in the metadata;
+* monetary columns are float32, ``step`` is int32 and the flags are int8;
+* the free-text ``nameOrig``/``nameDest`` columns are not stored.
+
+Readers map only the columns they ask for (``np.memmap``), so loading the
+four model features of a multi-GB export costs a page-cache read of those
+columns instead of a full text parse. ``iter_frames`` walks the store in
+fixed-size row windows for out-of-core work.
+
+The cache lives in ``data_cache/<csv name>-<path hash>/``, so CSVs with the
+same name in different directories get their own stores, and is rebuilt
+automatically when the CSV's size or modification time changes.
+
+Usage:
+    python columnar_store.py "credit card.csv"     # build (or refresh) the cache
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import TRANSACTION_TYPES, TYPE_MAPPING
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_cache")
+META_NAME = "meta.json"
+FORMAT_VERSION = 1
+
+# Stored columns and their on-disk dtypes, in CSV order
+COLUMN_DTYPES = {
+    "step": "int32",
+    "type": "int8",
+    "amount": "float32",
+    "oldbalanceOrg": "float32",
+    "newbalanceOrig": "float32",
+    "oldbalanceDest": "float32",
+    "newbalanceDest": "float32",
+    "isFraud": "int8",
+    "isFlaggedFraud": "int8",
+}
+# Code stored for a ``type`` missing from TYPE_MAPPING (or empty)
+UNKNOWN_TYPE = 0
+# Stored for empty integer fields; float columns keep NaN
+MISSING_INT = -1
+BUILD_CHUNKSIZE = 1_000_000
+
+
+def store_dir(csv_path, cache_dir=CACHE_DIR):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    path_hash = hashlib.sha256(os.path.realpath(csv_path).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{name}-{path_hash}")
+
+
+def _source_signature(csv_path):
+    st = os.stat(csv_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class ColumnStore:
+    """Read-only view over a built store directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, META_NAME)) as f:
+            self.meta = json.load(f)
+        self.n_rows = self.meta["rows"]
+        self.columns = list(self.meta["columns"])
+        self._mapped = {}
+
+    def __len__(self):
+        return self.n_rows
+
+    def column(self, name):
+        """Memory-mapped array for one column (read-only)."""
+        if name not in self._mapped:
+            if name not in self.meta["columns"]:
+                raise KeyError(f"Column {name!r} is not in the store (has: {', '.join(self.columns)})")
+            dtype = np.dtype(self.meta["columns"][name])
+            path = os.path.join(self.directory, name + ".bin")
+            if self.n_rows == 0:
+                self._mapped[name] = np.empty(0, dtype=dtype)
+            else:
+                self._mapped[name] = np.memmap(path, dtype=dtype, mode="r", shape=(self.n_rows,))
+        return self._mapped[name]
+
+    def frame(self, columns=None, start=0, stop=None, categorical_type=False):
+        """DataFrame of ``columns`` for rows ``[start, stop)``.
+
+        ``type`` holds the model codes, or a categorical of the type names
+        when ``categorical_type`` is set.
+        """
+        columns = self.columns if columns is None else list(columns)
+        data = {}
+        for name in columns:
+            values = self.column(name)[start:stop]
+            if name == "type" and categorical_type:
+                values = pd.Categorical.from_codes(np.asarray(values, dtype=np.int64) - 1,
+                                                   categories=self.meta["type_categories"])
+            else:
+                values = np.array(values)
+            data[name] = values
+        stop = self.n_rows if stop is None else min(stop, self.n_rows)
+        return pd.DataFrame(data, index=pd.RangeIndex(start, max(start, stop)))
+
+    def iter_frames(self, columns=None, chunksize=BUILD_CHUNKSIZE, categorical_type=False):
+        """Yield consecutive row windows of at most ``chunksize`` rows."""
+        for start in range(0, self.n_rows, chunksize):
+            yield self.frame(columns, start, start + chunksize, categorical_type)
+
+
+def build_store(csv_path, cache_dir=CACHE_DIR, chunksize=BUILD_CHUNKSIZE):
+    """Parse ``csv_path`` chunk by chunk into a fresh store and open it.
+
+    The store is written to a sibling temp directory and swapped in at the
+    end, so concurrent readers never see a half-written store.
+    """
+    target = store_dir(csv_path, cache_dir)
+    staging = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    start = time.perf_counter()
+    signature = _source_signature(csv_path)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    columns = [name for name in COLUMN_DTYPES if name in header]
+    outputs = {name: open(os.path.join(staging, name + ".bin"), "wb") for name in columns}
+    rows = unknown_types = 0
+    try:
+        reader = pd.read_csv(csv_path, usecols=columns, chunksize=chunksize,
+                             dtype={name: ("str" if name == "type" else "float64") for name in columns})
+        for chunk in reader:
+            for name in columns:
+                if name == "type":
+                    codes = chunk["type"].map(TYPE_MAPPING)
+                    unknown_types += int(codes.isna().sum())
+                    values = codes.fillna(UNKNOWN_TYPE).to_numpy(dtype=np.int8)
+                elif np.dtype(COLUMN_DTYPES[name]).kind == "i":
+                    values = chunk[name].fillna(MISSING_INT).to_numpy(dtype=COLUMN_DTYPES[name])
+                else:
+                    values = chunk[name].to_numpy(dtype=COLUMN_DTYPES[name])
+                outputs[name].write(np.ascontiguousarray(values).tobytes())
+            rows += len(chunk)
+    finally:
+        for f in outputs.values():
+            f.close()
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "source": os.path.basename(csv_path),
+        "source_signature": signature,
+        "rows": rows,
+        "columns": {name: COLUMN_DTYPES[name] for name in columns},
+        "type_categories": list(TRANSACTION_TYPES),
+        "unknown_type_rows": unknown_types,
+        "build_seconds": round(time.perf_counter() - start, 4),
+    }
+    with open(os.path.join(staging, META_NAME), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    retired = f"{target}.old-{os.getpid()}"
+    if os.path.exists(target):
+        os.replace(target, retired)
+    os.replace(staging, target)
+    shutil.rmtree(retired, ignore_errors=True)
+    return ColumnStore(target)
+
+
+def is_fresh(csv_path, cache_dir=CACHE_DIR):
+    meta_path = os.path.join(store_dir(csv_path, cache_dir), META_NAME)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return meta.get("format_version") == FORMAT_VERSION and meta.get("source_signature") == _source_signature(csv_path)
+
+
+def open_store(csv_path, cache_dir=CACHE_DIR):
+    """Store for ``csv_path``, building or refreshing it first if needed."""
+    if not is_fresh(csv_path, cache_dir):
+        return build_store(csv_path, cache_dir)
+    return ColumnStore(store_dir(csv_path, cache_dir))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a transaction CSV into the typed columnar cache.")
+    parser.add_argument("csv", help="CSV in the credit card.csv schema")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--chunksize", type=int, default=BUILD_CHUNKSIZE)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the cache is up to date")
+    args = parser.parse_args(argv)
+
+    if args.force or not is_fresh(args.csv, args.cache_dir):
+        store = build_store(args.csv, args.cache_dir, args.chunksize)
+        print(f"Built {store.directory} in {store.meta['build_seconds']:.2f}s")
+    else:
+        store = ColumnStore(store_dir(args.csv, args.cache_dir))
+        print(f"{store.directory} is up to date")
+    size = sum(os.path.getsize(os.path.join(store.directory, name + ".bin")) for name in store.columns)
+    print(f"{store.n_rows:,} rows, {len(store.columns)} columns, {size / 2**20:,.1f} MiB "
+          f"(CSV {os.path.getsize(args.csv) / 2**20:,.1f} MiB)")
+    if store.meta["unknown_type_rows"]:
+        print(f"warning: {store.meta['unknown_type_rows']:,} row(s) with an unknown transaction type")
+
+
+if __name__ == "__main__":
+    main()
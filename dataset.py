@@ -0,0 +1,42 @@
+"""Loading and splitting ``credit card.csv`` the same way the notebooks do.
+
+Data is read through the typed columnar cache (``columnar_store.py``), so
+only the requested columns are mapped and the CSV is parsed once per change.
+"""
+import os
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from columnar_store import UNKNOWN_TYPE, open_store
+from features import FEATURE_COLUMNS, FRAUD_LABEL, LEGIT_LABEL
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "credit card.csv")
+
+# Holdout split used by every training notebook
+TEST_SIZE = 0.30
+RANDOM_STATE = 42
+
+
+def load_dataset(path=DATA_PATH, columns=None):
+    """Model features plus ``isFraud`` with the notebooks' encoding.
+
+    ``type`` holds the model codes and ``isFraud`` the "Fraud"/"No Fraud"
+    labels. ``columns`` adds other stored columns (e.g. ``step``); rows with
+    missing values or an unknown type are dropped like the notebooks'
+    ``dropna``.
+    """
+    columns = list(dict.fromkeys([*FEATURE_COLUMNS, "isFraud", *(columns or ())]))
+    data = open_store(path).frame(columns)
+    valid = (data["type"] != UNKNOWN_TYPE) & (data["isFraud"] >= 0) & data.notna().all(axis=1)
+    if not valid.all():
+        data = data[valid]
+    data["isFraud"] = np.where(data["isFraud"] == 1, FRAUD_LABEL, LEGIT_LABEL)
+    return data
+
+
+def holdout_split(data):
+    """``x_train, x_test, y_train, y_test`` exactly as in the notebooks."""
+    x = data[FEATURE_COLUMNS]
+    y = data["isFraud"]
+    return train_test_split(x, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
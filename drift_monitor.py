@@ -0,0 +1,288 @@
+"""Streaming drift monitor for the model inputs and fraud scores.
+
+The baseline (``drift_baseline.json``, built by ``python drift_monitor.py``
+from ``credit card.csv``) fixes the bins for each of the four model features
+and each model's fraud probability, and records the share of baseline rows
+in each bin:
+
+* features with at most ``MAX_CATEGORIES`` distinct values (``type``) get
+  one bin per value; the others get baseline decile bins;
+* fraud probabilities get ten equal-width bins over [0, 1].
+
+Live rows are binned with one ``searchsorted``/``bincount`` per column and
+block; single rows and small blocks are pooled into blocks of
+``FLUSH_ROWS`` first. Each block ages the counts (``exp(-rows / window)``),
+so the histograms describe roughly the last ``window`` rows and memory
+never grows. ``report`` compares each histogram with its baseline:
+
+* PSI, ``sum((live - base) * ln(live / base))``; below 0.1 is stable,
+  0.1-0.25 a moderate shift, above 0.25 drift;
+* KS, the largest gap between the binned cumulative distributions, checked
+  against the two-sample critical value at ``KS_ALPHA``.
+
+The process-wide ``monitor`` is fed by ``scoring.score``, the cached scoring
+path, the ensemble and the app. It is ``None`` without a baseline or with
+``FRAUDGUARD_DRIFT=0``.
+
+Usage:
+    python drift_monitor.py            # build drift_baseline.json
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+from metrics import gauge
+from model_registry import MODEL_DIR, MODEL_NAMES
+
+BASELINE_PATH = os.path.join(MODEL_DIR, "drift_baseline.json")
+ENABLED = os.environ.get("FRAUDGUARD_DRIFT", "1") != "0"
+MAX_CATEGORIES = 10
+FEATURE_BINS = 10
+SCORE_EDGES = tuple(np.round(np.linspace(0.1, 0.9, 9), 2).tolist())
+# Blocks this large are binned at once; smaller ones are pooled up to
+# FLUSH_ROWS rows first. DEFAULT_WINDOW is the histograms' effective length.
+DIRECT_ROWS = 64
+FLUSH_ROWS = 1024
+DEFAULT_WINDOW = 10000
+# No alert before this many (decayed) rows have been seen
+MIN_ROWS = 200
+PSI_WARN = 0.1
+PSI_DRIFT = 0.25
+KS_ALPHA = 0.01
+# Keeps empty bins from making PSI infinite
+_EPSILON = 1e-4
+
+
+def bin_edges(values, bins=FEATURE_BINS):
+    """Interior bin edges for one baseline column (see module docstring)."""
+    values = np.asarray(values, dtype=np.float64)
+    distinct = np.unique(values)
+    if len(distinct) <= MAX_CATEGORIES:
+        return ((distinct[1:] + distinct[:-1]) / 2).tolist()
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+    return edges.tolist()
+
+
+def proportions(values, edges):
+    counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+    return np.round(counts / max(counts.sum(), 1), 6).tolist()
+
+
+def psi(expected, actual):
+    expected = np.maximum(np.asarray(expected, dtype=np.float64), _EPSILON)
+    actual = np.maximum(np.asarray(actual, dtype=np.float64), _EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks(expected, actual):
+    return float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual))))
+
+
+def ks_critical(n_expected, n_actual, alpha=KS_ALPHA):
+    """Two-sample KS critical value for samples of these sizes."""
+    c = math.sqrt(-math.log(alpha / 2) / 2)
+    return c * math.sqrt((n_expected + n_actual) / (n_expected * n_actual))
+
+
+class Histogram:
+    """Aged bin counts for one monitored column."""
+
+    def __init__(self, edges, expected, baseline_rows):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.expected = np.asarray(expected, dtype=np.float64)
+        self.baseline_rows = baseline_rows
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.float64)
+
+    def add(self, values, decay):
+        self.counts *= decay
+        self.counts += np.bincount(np.searchsorted(self.edges, values, side="right"), minlength=len(self.counts))
+
+    def compare(self):
+        rows = float(self.counts.sum())
+        if rows <= 0:
+            return {"rows": 0.0, "psi": None, "ks": None, "status": "waiting"}
+        actual = self.counts / rows
+        value_psi, value_ks = psi(self.expected, actual), ks(self.expected, actual)
+        if rows < MIN_ROWS:
+            status = "waiting"
+        elif value_psi >= PSI_DRIFT:
+            status = "drift"
+        elif value_psi >= PSI_WARN or value_ks > ks_critical(self.baseline_rows, rows):
+            status = "warn"
+        else:
+            status = "ok"
+        return {"rows": rows, "psi": value_psi, "ks": value_ks, "status": status}
+
+
+class DriftMonitor:
+    """Feature and per-model score histograms compared against a baseline."""
+
+    def __init__(self, baseline, window=DEFAULT_WINDOW, flush_rows=FLUSH_ROWS):
+        self.window = window
+        self.flush_rows = flush_rows
+        self.baseline_rows = baseline["rows"]
+        self.features = {column: Histogram(entry["edges"], entry["expected"], self.baseline_rows)
+                         for column, entry in baseline["features"].items()}
+        self.scores = {name: Histogram(entry["edges"], entry["expected"], self.baseline_rows)
+                       for name, entry in baseline["scores"].items()}
+        self._columns = [self.features[column] for column in FEATURE_COLUMNS]
+        # Small blocks wait in fixed buffers: feature rows, and each model's scores
+        self._pending_features = np.empty((flush_rows, len(FEATURE_COLUMNS)), dtype=np.float64)
+        self._n_features = 0
+        self._pending_scores = {name: np.empty(flush_rows, dtype=np.float64) for name in self.scores}
+        self._n_scores = dict.fromkeys(self.scores, 0)
+        self._lock = threading.Lock()
+
+    def observe(self, model_name, features, fraud_probability):
+        """Record scored rows: ``(n, 4)`` features and their fraud probabilities.
+
+        Either may be ``None``: the ensemble records the features once and
+        each model's scores separately. Blocks of ``DIRECT_ROWS`` or more are
+        binned straight away, smaller ones once ``flush_rows`` have gathered.
+        """
+        if features is not None and type(features) is not np.ndarray:
+            features = features[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        self._lock.acquire()
+        try:
+            if features is not None:
+                n, size = len(features), self._n_features
+                if n >= DIRECT_ROWS:
+                    self._add_features(features)
+                else:
+                    if size + n > self.flush_rows:
+                        self._flush_features()
+                        size = 0
+                    self._pending_features[size:size + n] = features
+                    self._n_features = size + n
+            if fraud_probability is not None and model_name in self._n_scores:
+                n, size = len(fraud_probability), self._n_scores[model_name]
+                if n >= DIRECT_ROWS:
+                    self._add_scores(model_name, fraud_probability)
+                else:
+                    if size + n > self.flush_rows:
+                        self._flush_scores(model_name)
+                        size = 0
+                    self._pending_scores[model_name][size:size + n] = fraud_probability
+                    self._n_scores[model_name] = size + n
+        finally:
+            self._lock.release()
+
+    def _flush_features(self):
+        if self._n_features:
+            self._add_features(self._pending_features[:self._n_features])
+            self._n_features = 0
+
+    def _flush_scores(self, model_name):
+        if self._n_scores[model_name]:
+            self._add_scores(model_name, self._pending_scores[model_name][:self._n_scores[model_name]])
+            self._n_scores[model_name] = 0
+
+    def _add_features(self, rows):
+        decay = math.exp(-len(rows) / self.window)
+        for i, histogram in enumerate(self._columns):
+            histogram.add(rows[:, i], decay)
+
+    def _add_scores(self, model_name, scores):
+        # Aged by the model's own rows: a rarely used model keeps its window
+        self.scores[model_name].add(scores, math.exp(-len(scores) / self.window))
+
+    def report(self):
+        """``{"features": {column: stats}, "scores": {model: stats}}``, flushing first."""
+        with self._lock:
+            self._flush_features()
+            for name in self._pending_scores:
+                self._flush_scores(name)
+            return {
+                "features": {column: histogram.compare() for column, histogram in self.features.items()},
+                "scores": {name: histogram.compare() for name, histogram in self.scores.items()},
+            }
+
+    def alerts(self, report=None):
+        """``(kind, name, stats)`` for every histogram in ``warn`` or ``drift``."""
+        report = report or self.report()
+        return [(kind, name, stats) for kind in ("features", "scores")
+                for name, stats in report[kind].items() if stats["status"] in ("warn", "drift")]
+
+
+def build_baseline(path=None, names=MODEL_NAMES):
+    """Baseline bins and proportions from the full dataset (and each model's scores on it)."""
+    from dataset import DATA_PATH, load_dataset
+    from features import FRAUD_LABEL, model_input
+    from model_registry import get_model
+    from tree_compiler import file_sha256
+
+    path = path or DATA_PATH
+    data = load_dataset(path)
+    features = data[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    baseline = {
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "data_sha256": file_sha256(path),
+        "rows": int(len(data)),
+        "features": {},
+        "scores": {},
+    }
+    for i, column in enumerate(FEATURE_COLUMNS):
+        edges = bin_edges(features[:, i])
+        baseline["features"][column] = {"edges": edges, "expected": proportions(features[:, i], edges)}
+    for name in names:
+        model = get_model(name)
+        # Not scoring.fraud_column: importing scoring would import this module twice when run as a script
+        scores = model.predict_proba(model_input(model, features))[:, list(model.classes_).index(FRAUD_LABEL)]
+        baseline["scores"][name] = {"edges": list(SCORE_EDGES), "expected": proportions(scores, SCORE_EDGES)}
+    return baseline
+
+
+def load_monitor(path=BASELINE_PATH, window=DEFAULT_WINDOW):
+    try:
+        with open(path) as f:
+            return DriftMonitor(json.load(f), window)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+monitor = load_monitor() if ENABLED else None
+
+
+def observe(model_name, features, fraud_probability):
+    """Feed the process-wide monitor, if there is one (see ``DriftMonitor.observe``)."""
+    if monitor is not None:
+        monitor.observe(model_name, features, fraud_probability)
+
+
+def _psi_values():
+    if monitor is None:
+        return {}
+    report = monitor.report()
+    return {(kind, name): stats["psi"] for kind in ("features", "scores")
+            for name, stats in report[kind].items() if stats["status"] != "waiting"}
+
+
+gauge("fraudguard_drift_psi", "Population stability index of recent traffic vs the baseline",
+      ("kind", "name"), callback=_psi_values)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the drift monitor's baseline from the training data.")
+    parser.add_argument("--data", default=None, help="Baseline CSV (default: credit card.csv)")
+    parser.add_argument("--output", default=BASELINE_PATH)
+    args = parser.parse_args(argv)
+
+    baseline = build_baseline(args.data)
+    with open(args.output, "w") as f:
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+    print(f"Baseline of {baseline['rows']:,} rows:")
+    for column, entry in baseline["features"].items():
+        print(f"  {column:<16} {len(entry['expected']):2d} bins")
+    print(f"  fraud scores     {len(SCORE_EDGES) + 1:2d} bins x {len(baseline['scores'])} models")
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Score a transaction (or batch) with every model in one concurrent pass.
+
+The models run on a shared thread pool; sklearn/NumPy release the GIL in
+their heavy kernels, so the pass costs roughly the slowest model rather than
+the sum of all five.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from drift_monitor import observe as observe_drift
+from features import FRAUD_LABEL, LEGIT_LABEL
+from model_registry import MODEL_NAMES, get_model
+from prediction_cache import score as cached_score
+from scoring import score
+
+ENSEMBLE_CHOICE = "All Models (Ensemble)"
+# "soft": weighted mean of fraud probabilities
+# "vote": weighted share of models whose label is "Fraud"
+METHODS = ("soft", "vote")
+
+_executor = ThreadPoolExecutor(max_workers=len(MODEL_NAMES), thread_name_prefix="ensemble")
+
+
+def _timed_score(model_name, features, cached):
+    start = time.perf_counter()
+    if cached:
+        labels, fraud_probability = cached_score(model_name, features, drift_features=False)
+    else:
+        labels, fraud_probability = score(get_model(model_name), features, model_name, drift_features=False)
+    return labels, fraud_probability, (time.perf_counter() - start) * 1000
+
+
+def score_all(features, models=MODEL_NAMES, weights=None, method="soft", threshold=0.5, cached=True):
+    """Score ``features`` with every model in ``models`` concurrently.
+
+    Returns a dict with per-model ``labels``/``fraud_probability``/
+    ``latency_ms`` under ``"models"`` plus the combined ``fraud_probability``
+    and ``labels`` arrays. Missing ``weights`` default to 1.0. Bulk callers
+    pass ``cached=False`` to keep one-off rows out of the prediction cache.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown ensemble method: {method!r}")
+    weights = weights or {}
+    # Resolve models on the calling thread: concurrent first loads would race
+    # on importing sklearn, and load time shouldn't count as scoring latency
+    for name in models:
+        get_model(name)
+    start = time.perf_counter()
+    futures = {name: _executor.submit(_timed_score, name, features, cached) for name in models}
+    # Each model records its own scores; the shared rows count once
+    observe_drift(None, features, None)
+
+    per_model = {}
+    for name, future in futures.items():
+        labels, fraud_probability, latency_ms = future.result()
+        per_model[name] = {
+            "labels": labels,
+            "fraud_probability": fraud_probability,
+            "latency_ms": latency_ms,
+            "weight": float(weights.get(name, 1.0)),
+        }
+
+    total_weight = sum(result["weight"] for result in per_model.values())
+    if total_weight <= 0:
+        raise ValueError("Ensemble weights must sum to a positive value")
+    combined = np.zeros(len(next(iter(per_model.values()))["labels"]), dtype=np.float64)
+    for result in per_model.values():
+        if method == "soft":
+            combined += result["weight"] * result["fraud_probability"]
+        else:
+            combined += result["weight"] * (result["labels"] == FRAUD_LABEL)
+    combined /= total_weight
+
+    return {
+        "method": method,
+        "models": per_model,
+        "fraud_probability": combined,
+        "labels": np.where(combined >= threshold, FRAUD_LABEL, LEGIT_LABEL),
+        "latency_ms": (time.perf_counter() - start) * 1000,
+    }
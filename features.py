@@ -0,0 +1,156 @@
+"""Feature encoding shared by the app, batch scoring and the services.
+
+Mirrors the preprocessing in the training notebooks: ``type`` is mapped to
+the integer codes below and the models are fitted on ``FEATURE_COLUMNS`` in
+exactly this order.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from metrics import STAGE_SECONDS
+
+TYPE_MAPPING = {'CASH_OUT': 1, 'PAYMENT': 2, 'CASH_IN': 3, 'TRANSFER': 4, 'DEBIT': 5}
+TRANSACTION_TYPES = tuple(TYPE_MAPPING)
+# Name -> code as the float the models see, so encoding needs no conversion
+TYPE_CODES = {name: float(code) for name, code in TYPE_MAPPING.items()}
+# Codes accepted when ``type`` arrives already encoded; anything else is
+# a type the models were never trained on
+VALID_CODES = {float(code): float(code) for code in TYPE_MAPPING.values()}
+FEATURE_COLUMNS = ["type", "amount", "oldbalanceOrg", "newbalanceOrig"]
+
+# Label encoding used by the notebooks (isFraud 1 -> "Fraud", 0 -> "No Fraud")
+FRAUD_LABEL = "Fraud"
+LEGIT_LABEL = "No Fraud"
+
+
+def encode_type(values):
+    """Map transaction type names to model codes, rejecting unknown types."""
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        unknown = values[~values.isin(list(VALID_CODES))]
+        if len(unknown):
+            raise ValueError(f"Unknown transaction type code(s): {', '.join(map(str, sorted(set(unknown))))}")
+        return values
+    codes = values.map(TYPE_MAPPING)
+    if codes.isna().any():
+        unknown = sorted(set(values[codes.isna()].astype(str)))
+        raise ValueError(f"Unknown transaction type(s): {', '.join(unknown)}")
+    return codes
+
+
+@STAGE_SECONDS.labels("features").timed
+def encode_frame(df):
+    """Model-ready features from a frame in the ``credit card.csv`` schema."""
+    missing = [column for column in FEATURE_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+    features = df[FEATURE_COLUMNS].copy()
+    features["type"] = encode_type(features["type"]).to_numpy()
+    return features
+
+
+@STAGE_SECONDS.labels("features").timed
+def encode_transaction(type_transaction, amount, oldbalanceOrg, newbalanceOrig):
+    """Single-row feature frame for one hand-entered transaction."""
+    return pd.DataFrame({
+        'type': [TYPE_MAPPING[type_transaction]],
+        'amount': [amount],
+        'oldbalanceOrg': [oldbalanceOrg],
+        'newbalanceOrig': [newbalanceOrig]
+    })
+
+
+@STAGE_SECONDS.labels("features").timed
+def encode_records(records):
+    """Encode JSON-style transaction dicts into an ``(n, 4)`` float array.
+
+    Columns follow ``FEATURE_COLUMNS``; ``type`` may be a name or one of the
+    ``TYPE_MAPPING`` codes.
+    """
+    rows = []
+    for record in records:
+        try:
+            kind = record["type"]
+            code = TYPE_CODES[kind] if isinstance(kind, str) else VALID_CODES[float(kind)]
+            rows.append((code, float(record["amount"]),
+                         float(record["oldbalanceOrg"]), float(record["newbalanceOrig"])))
+        except KeyError as e:
+            raise ValueError(f"Invalid transaction, missing or unknown value: {e}") from None
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid transaction: {record!r}") from None
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(FEATURE_COLUMNS))
+
+
+class FeatureEncoder:
+    """Encode transactions straight into a reusable float64 buffer.
+
+    Rows are written in ``FEATURE_COLUMNS`` order with ``type`` looked up in
+    ``TYPE_CODES``, so a request costs no dict-of-lists, DataFrame or
+    column-reordering copy. The buffer grows to the largest batch seen and is
+    then reused: a returned array is a view that the encoder's next call
+    overwrites. Keep one encoder per thread (``thread_encoder``) and copy
+    anything that must outlive the next call. ``model_input`` adds the
+    feature names for estimators that need them.
+    """
+
+    def __init__(self, capacity=1):
+        self._buffer = np.empty((capacity, len(FEATURE_COLUMNS)), dtype=np.float64)
+
+    def _rows(self, n):
+        if n > len(self._buffer):
+            self._buffer = np.empty((max(n, 2 * len(self._buffer)), len(FEATURE_COLUMNS)), dtype=np.float64)
+        return self._buffer[:n]
+
+    @STAGE_SECONDS.labels("features").timed
+    def transaction(self, type_transaction, amount, oldbalanceOrg, newbalanceOrig):
+        """``(1, 4)`` features for one hand-entered transaction."""
+        row = self._rows(1)
+        row[0] = (TYPE_CODES[type_transaction], amount, oldbalanceOrg, newbalanceOrig)
+        return row
+
+    @STAGE_SECONDS.labels("features").timed
+    def records(self, records):
+        """``(n, 4)`` features for JSON-style transaction dicts (as ``encode_records``)."""
+        rows = self._rows(len(records))
+        if not len(records):
+            return rows
+        try:
+            rows[:] = [(TYPE_CODES[record["type"]] if isinstance(record["type"], str) else VALID_CODES[float(record["type"])],
+                        float(record["amount"]), float(record["oldbalanceOrg"]), float(record["newbalanceOrig"]))
+                       for record in records]
+        except (KeyError, TypeError, ValueError):
+            # Re-encode the slow way for encode_records' error message
+            encode_records.__wrapped__(records)
+            raise
+        return rows
+
+
+_local = threading.local()
+
+
+def thread_encoder():
+    """The calling thread's ``FeatureEncoder``."""
+    encoder = getattr(_local, "encoder", None)
+    if encoder is None:
+        encoder = _local.encoder = FeatureEncoder()
+    return encoder
+
+
+def _wants_frame(model):
+    # sklearn estimators fitted on a DataFrame warn when given a bare array;
+    # the NumPy evaluators (compiled trees, artifacts, KNN index) don't care
+    return hasattr(model, "get_params") and hasattr(model, "feature_names_in_")
+
+
+def model_input(model, features):
+    """``features`` in the form ``model.predict_proba`` expects.
+
+    Arrays in ``FEATURE_COLUMNS`` order go to the NumPy evaluators unchanged;
+    sklearn estimators get a DataFrame over the same memory (no copy) carrying
+    the feature names they were fitted with.
+    """
+    if hasattr(features, "columns") or not _wants_frame(model):
+        return features
+    return pd.DataFrame(features, columns=FEATURE_COLUMNS, copy=False)
@@ -0,0 +1,368 @@
+"""Incremental updates of the Naive Bayes and logistic regression models.
+
+Instead of refitting on the whole history, each run folds new labeled rows
+into the current models chunk by chunk:
+
+* Naive Bayes (``BernoulliNB``) keeps per-class counts, so ``partial_fit``
+  on the new rows gives exactly the model a full refit would;
+* the shipped ``LogisticRegression`` (lbfgs) has no ``partial_fit``, so it is
+  carried by ``OnlineLogistic``, which folds each chunk into a Gaussian
+  (Laplace) approximation of the regularized fit. Its state is saved next
+  to the pickles as ``incremental_state.npz``.
+
+A chain of updates starts from both models fitted on the notebooks'
+training split (the same models ``train_pipeline.py`` produces), then every
+run writes a new versioned directory, like ``train_pipeline.py``::
+
+    artifacts/<version>/
+        logistic_regression_model.pkl   plain sklearn estimators
+        NaiveBayes_model.pkl
+        incremental_state.npz           logistic state for the next update
+        manifest.json                   parent version, rows added, holdout
+                                        accuracy, update time
+
+``--publish`` exports the new pickle-free artifacts and then replaces the
+app's pickles atomically; running processes swap models through the
+registry's reload check. Decision thresholds are keyed by pickle hash, so
+published models use 0.5 until ``thresholds.py`` is rerun.
+
+Usage:
+    python incremental_training.py new_rows.csv [--models "Naive Bayes" ...] [--chunksize 50000] [--publish]
+"""
+import argparse
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from scipy.special import expit
+from sklearn.metrics import accuracy_score
+
+from dataset import DATA_PATH, RANDOM_STATE, holdout_split, load_dataset
+from features import FEATURE_COLUMNS, FRAUD_LABEL, LEGIT_LABEL, TYPE_MAPPING, encode_frame
+from model_registry import MODEL_FILES
+from train_pipeline import ARTIFACTS_DIR, MANIFEST_NAME, build_estimator, publish
+from tree_compiler import file_sha256
+
+INCREMENTAL_MODELS = ("Logistic Regression", "Naive Bayes")
+STATE_NAME = "incremental_state.npz"
+CLASSES = np.array([FRAUD_LABEL, LEGIT_LABEL], dtype=object)
+DEFAULT_CHUNKSIZE = 50000
+
+
+class OnlineLogistic:
+    """Binary logistic regression fitted one chunk at a time.
+
+    Works on standardized features ``z = (x - mean) / scale`` (fixed by the
+    first chunk) with the intercept first. The state is the current weights
+    and their precision matrix: a chunk is fitted by Newton's method on its
+    log-loss plus ``0.5 * (w - w_prev) @ precision @ (w - w_prev)``, and then
+    adds its Hessian to the precision. The initial precision is
+    ``LogisticRegression(C)``'s L2 penalty, so a single chunk holding all the
+    rows gives the same model as ``LogisticRegression.fit``.
+    """
+
+    def __init__(self, mean, scale, weights, precision, rows=0, C=1.0):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.precision = np.asarray(precision, dtype=np.float64)
+        self.rows = int(rows)
+        self.C = float(C)
+        self.n_iter = 0
+
+    @classmethod
+    def start(cls, X, C=1.0):
+        """Untrained state standardized on ``X``."""
+        X = np.asarray(X, dtype=np.float64)
+        mean, scale = X.mean(axis=0), X.std(axis=0)
+        scale[scale == 0] = 1.0
+        precision = np.diag(np.concatenate([[0.0], 1.0 / (C * scale ** 2)]))
+        return cls(mean, scale, np.zeros(len(mean) + 1), precision, 0, C)
+
+    def _design(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        Z = np.empty((len(X), len(self.mean) + 1))
+        Z[:, 0] = 1.0
+        Z[:, 1:] = (X - self.mean) / self.scale
+        return Z
+
+    def partial_fit(self, X, positive, max_iter=100, tol=1e-10):
+        """Fold in rows ``X`` whose label is the second class where ``positive``."""
+        Z = self._design(X)
+        y = np.asarray(positive, dtype=np.float64)
+        prior, precision = self.weights, self.precision
+
+        def objective(w):
+            margin = Z @ w
+            delta = w - prior
+            return np.sum(np.logaddexp(0, margin) - y * margin) + 0.5 * delta @ precision @ delta
+
+        w, value = prior.copy(), objective(prior)
+        for self.n_iter in range(1, max_iter + 1):
+            p = expit(Z @ w)
+            gradient = Z.T @ (p - y) + precision @ (w - prior)
+            step = np.linalg.solve((Z.T * (p * (1 - p))) @ Z + precision, gradient)
+            # Backtracking keeps large, nearly separable steps from overshooting
+            t = 1.0
+            while True:
+                candidate = w - t * step
+                candidate_value = objective(candidate)
+                if candidate_value <= value or t < 1e-10:
+                    break
+                t /= 2
+            improvement = value - candidate_value
+            w, value = candidate, candidate_value
+            if improvement <= tol * max(1.0, abs(value)):
+                break
+        p = expit(Z @ w)
+        self.precision = (Z.T * (p * (1 - p))) @ Z + precision
+        self.weights = w
+        self.rows += len(Z)
+        return self
+
+    def to_estimator(self):
+        """Equivalent fitted ``LogisticRegression`` on the raw features."""
+        estimator = build_estimator("Logistic Regression")
+        estimator.set_params(C=self.C)
+        coef = self.weights[1:] / self.scale
+        estimator.coef_ = coef.reshape(1, -1)
+        estimator.intercept_ = np.array([self.weights[0] - coef @ self.mean])
+        estimator.classes_ = CLASSES.copy()
+        estimator.n_features_in_ = len(FEATURE_COLUMNS)
+        estimator.feature_names_in_ = np.asarray(FEATURE_COLUMNS, dtype=object)
+        estimator.n_iter_ = np.array([self.n_iter], dtype=np.int32)
+        return estimator
+
+    def save(self, path):
+        np.savez(path, mean=self.mean, scale=self.scale, weights=self.weights, precision=self.precision,
+                 rows=np.int64(self.rows), C=np.float64(self.C))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as state:
+            return cls(state["mean"], state["scale"], state["weights"], state["precision"],
+                       int(state["rows"]), float(state["C"]))
+
+
+class IncrementalModels:
+    """The incrementally updated models of one version, plus their row count."""
+
+    def __init__(self, naive_bayes=None, logistic=None, rows=0):
+        self.naive_bayes = naive_bayes
+        self.logistic = logistic
+        self.rows = rows
+
+    @classmethod
+    def from_history(cls, x_train, y_train, names=INCREMENTAL_MODELS):
+        """Both models fitted on the full history in one chunk."""
+        models = cls(rows=len(x_train))
+        if "Naive Bayes" in names:
+            models.naive_bayes = build_estimator("Naive Bayes").fit(x_train, y_train)
+        if "Logistic Regression" in names:
+            models.logistic = OnlineLogistic.start(x_train).partial_fit(x_train, np.asarray(y_train) == CLASSES[1])
+        return models
+
+    def partial_fit(self, X, y):
+        """Fold one labeled chunk (``y`` in "Fraud"/"No Fraud") into every model."""
+        seconds = {}
+        if self.naive_bayes is not None:
+            start = time.perf_counter()
+            self.naive_bayes.partial_fit(X, y, classes=CLASSES)
+            seconds["Naive Bayes"] = time.perf_counter() - start
+        if self.logistic is not None:
+            start = time.perf_counter()
+            self.logistic.partial_fit(X, np.asarray(y) == CLASSES[1])
+            seconds["Logistic Regression"] = time.perf_counter() - start
+        self.rows += len(X)
+        return seconds
+
+    def estimators(self):
+        models = {}
+        if self.logistic is not None:
+            models["Logistic Regression"] = self.logistic.to_estimator()
+        if self.naive_bayes is not None:
+            models["Naive Bayes"] = self.naive_bayes
+        return models
+
+
+def read_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """``(features, labels)`` per chunk of a labeled CSV in the credit card.csv schema."""
+    for frame in pd.read_csv(path, usecols=[*FEATURE_COLUMNS, "isFraud"], chunksize=chunksize):
+        frame = frame.dropna()
+        if len(frame):
+            yield encode_frame(frame), np.where(frame["isFraud"].to_numpy() == 1, FRAUD_LABEL, LEGIT_LABEL)
+
+
+def read_manifest(version, output_root=ARTIFACTS_DIR):
+    with open(os.path.join(output_root, version, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def latest_version(output_root=ARTIFACTS_DIR):
+    """Manifest of the newest incremental version under ``output_root``, or ``None``."""
+    latest = None
+    for version in sorted(os.listdir(output_root)) if os.path.isdir(output_root) else ():
+        try:
+            manifest = read_manifest(version, output_root)
+        except (OSError, ValueError):
+            continue
+        if "incremental" in manifest and (latest is None or manifest["created_at"] >= latest["created_at"]):
+            latest = manifest
+    return latest
+
+
+def load_models(manifest, output_root=ARTIFACTS_DIR):
+    """The models (and state) saved by an incremental version."""
+    directory = os.path.join(output_root, manifest["version"])
+    models = IncrementalModels(rows=manifest["incremental"]["total_rows"])
+    if "Naive Bayes" in manifest["models"]:
+        models.naive_bayes = joblib.load(os.path.join(directory, MODEL_FILES["Naive Bayes"]))
+    if "Logistic Regression" in manifest["models"]:
+        models.logistic = OnlineLogistic.load(os.path.join(directory, STATE_NAME))
+    return models
+
+
+def update(data_path, names=INCREMENTAL_MODELS, chunksize=DEFAULT_CHUNKSIZE, output_root=ARTIFACTS_DIR,
+           history_path=DATA_PATH, restart=False):
+    """Fold ``data_path`` into the latest incremental version and write a new one.
+
+    Without a previous version (or with ``restart``) the chain starts from
+    the models fitted on ``history_path``'s training split. Returns the new
+    manifest.
+    """
+    started = time.perf_counter()
+    x_train, x_test, y_train, y_test = holdout_split(load_dataset(history_path))
+    parent = None if restart else latest_version(output_root)
+    if parent is not None and set(names) - set(parent["models"]):
+        raise ValueError(f"{parent['version']} has no incremental state for {', '.join(sorted(set(names) - set(parent['models'])))}; use --restart")
+    if parent is None:
+        models = IncrementalModels.from_history(x_train, y_train, names)
+    else:
+        models = load_models(parent, output_root)
+        if "Naive Bayes" not in names:
+            models.naive_bayes = None
+        if "Logistic Regression" not in names:
+            models.logistic = None
+    rows_before = models.rows
+
+    update_seconds = dict.fromkeys(names, 0.0)
+    chunks = 0
+    for X, y in read_chunks(data_path, chunksize):
+        for name, seconds in models.partial_fit(X, y).items():
+            update_seconds[name] += seconds
+        chunks += 1
+
+    data_sha256 = file_sha256(data_path)
+    created_at = datetime.now(timezone.utc)
+    generation = parent["incremental"]["generation"] + 1 if parent else 1
+    version = f"{created_at:%Y%m%dT%H%M%SZ}-{data_sha256[:8]}-inc{generation}"
+    output_dir = os.path.join(output_root, version)
+    os.makedirs(output_dir, exist_ok=True)
+    if models.logistic is not None:
+        models.logistic.save(os.path.join(output_dir, STATE_NAME))
+
+    entries = {}
+    for name, estimator in models.estimators().items():
+        path = os.path.join(output_dir, MODEL_FILES[name])
+        joblib.dump(estimator, path)
+        entries[name] = {
+            "file": MODEL_FILES[name],
+            "sha256": file_sha256(path),
+            "bytes": os.path.getsize(path),
+            "estimator": type(estimator).__name__,
+            "params": {key: repr(value) for key, value in estimator.get_params().items()},
+            "update_seconds": round(update_seconds[name], 4),
+            "holdout_accuracy": round(float(accuracy_score(y_test, estimator.predict(x_test))), 4),
+            "classes": [str(c) for c in estimator.classes_],
+        }
+
+    manifest = {
+        "version": version,
+        "created_at": created_at.isoformat(timespec="seconds"),
+        "data": {
+            "path": os.path.basename(data_path),
+            "sha256": data_sha256,
+            "rows": models.rows - rows_before,
+            "history_path": os.path.basename(history_path),
+            "test_rows": len(x_test),
+        },
+        "incremental": {
+            "parent": parent["version"] if parent else None,
+            "generation": generation,
+            "chunks": chunks,
+            "chunksize": chunksize,
+            "rows_added": models.rows - rows_before,
+            "total_rows": models.rows,
+            "state": STATE_NAME if models.logistic is not None else None,
+        },
+        "feature_columns": list(FEATURE_COLUMNS),
+        "type_mapping": TYPE_MAPPING,
+        "label_encoding": {"isFraud": {"0": LEGIT_LABEL, "1": FRAUD_LABEL}},
+        "seed": RANDOM_STATE,
+        "environment": {
+            "python": platform.python_version(),
+            "sklearn": sklearn.__version__,
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "joblib": joblib.__version__,
+        },
+        "wall_seconds": round(time.perf_counter() - started, 4),
+        "models": entries,
+    }
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def publish_update(manifest, output_root=ARTIFACTS_DIR):
+    """Export a version's artifacts, then swap its pickles in next to the app.
+
+    The artifacts are written first and keyed by the new pickles' hashes, so
+    a process that reloads after the swap finds them up to date.
+    """
+    from model_artifacts import artifact_dir, from_estimator, save_artifact, verify_model
+    from tree_compiler import verification_inputs
+
+    directory = os.path.join(output_root, manifest["version"])
+    X = verification_inputs()
+    for name, entry in manifest["models"].items():
+        estimator = joblib.load(os.path.join(directory, entry["file"]))
+        model = from_estimator(estimator)
+        error = verify_model(estimator, model, X)
+        if error > 1e-12:
+            raise RuntimeError(f"{name} artifact does not reproduce the estimator (max error {error:.3g})")
+        save_artifact(model, name, artifact_dir(name), entry["sha256"], manifest["data"]["sha256"])
+    publish(manifest, output_root)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update the Naive Bayes and logistic models with new labeled rows.")
+    parser.add_argument("data", help="Labeled CSV in the credit card.csv schema")
+    parser.add_argument("--models", nargs="+", choices=INCREMENTAL_MODELS, default=list(INCREMENTAL_MODELS))
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--history", default=DATA_PATH, help="Data the first version is fitted on (and its holdout)")
+    parser.add_argument("--output", default=ARTIFACTS_DIR, help="Root directory for versioned artifacts")
+    parser.add_argument("--restart", action="store_true", help="Start a new chain from the history instead of the latest version")
+    parser.add_argument("--publish", action="store_true", help="Replace the app's model files with the updated ones")
+    args = parser.parse_args(argv)
+
+    manifest = update(args.data, args.models, args.chunksize, args.output, args.history, args.restart)
+    incremental = manifest["incremental"]
+    print(f"Added {incremental['rows_added']:,} rows in {incremental['chunks']} chunk(s) to "
+          f"{incremental['parent'] or 'the history fit'} ({incremental['total_rows']:,} rows in total)")
+    for name, entry in manifest["models"].items():
+        print(f"  {name:<20} update={entry['update_seconds']:.3f}s accuracy={entry['holdout_accuracy']:.4f}")
+    print(f"Wrote {os.path.join(args.output, manifest['version'])} in {manifest['wall_seconds']:.1f}s")
+    if args.publish:
+        publish_update(manifest, args.output)
+        print("Published; running processes reload within the registry's check interval")
+
+
+if __name__ == "__main__":
+    main()
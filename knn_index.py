@@ -0,0 +1,166 @@
+"""Scaled, persisted neighbor index for K-Nearest Neighbors serving.
+
+The shipped ``KNeighbors_model.pkl`` is fitted on raw features, so distances
+are dominated by the balance columns, and its reference set and KD-tree are
+deserialized into private memory by every process. ``ScaledKNNIndex``
+instead:
+
+* log-compresses the heavy-tailed monetary columns and standardizes all four
+  features, so each contributes comparably to the distance;
+* builds a ``KDTree`` once at export time and persists it uncompressed, so it
+  is loaded memory-mapped (``mmap_mode="r"``) and shared through the page
+  cache by every process on the host;
+* predicts with uniform voting over ``n_neighbors`` like the original model.
+
+Scaling changes which neighbors are found, so predictions can differ from the
+pickle; the registry only serves this index when ``FRAUDGUARD_KNN_INDEX=1``.
+
+Usage:
+    python knn_index.py     # export to compiled_models/knn_index.joblib
+"""
+import argparse
+import os
+
+import joblib
+import numpy as np
+from sklearn.neighbors import KDTree
+
+from features import FEATURE_COLUMNS
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "compiled_models", "knn_index.joblib")
+MONETARY_COLUMNS = [1, 2, 3]  # amount, oldbalanceOrg, newbalanceOrig
+
+
+class FeatureScaler:
+    """``log1p`` on monetary columns followed by a z-score."""
+
+    def __init__(self, mean, scale):
+        self.mean = mean
+        self.scale = scale
+
+    @staticmethod
+    def _compress(X):
+        X = np.array(X, dtype=np.float64)
+        X[:, MONETARY_COLUMNS] = np.log1p(np.maximum(X[:, MONETARY_COLUMNS], 0.0))
+        return X
+
+    @classmethod
+    def fit(cls, X):
+        compressed = cls._compress(X)
+        scale = compressed.std(axis=0)
+        scale[scale == 0.0] = 1.0
+        return cls(compressed.mean(axis=0), scale)
+
+    def transform(self, X):
+        return (self._compress(X) - self.mean) / self.scale
+
+
+class ScaledKNNIndex:
+    """Drop-in ``predict_proba``/``predict`` over a persisted KD-tree."""
+
+    def __init__(self, scaler, tree, labels, classes, n_neighbors=5, feature_names=FEATURE_COLUMNS, source_sha256=""):
+        self.scaler = scaler
+        self.tree = tree
+        self.labels = labels
+        self.classes_ = np.asarray(classes, dtype=object)
+        self.n_neighbors = n_neighbors
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = len(self.feature_names_in_)
+        self.source_sha256 = source_sha256
+
+    @classmethod
+    def fit(cls, X, y, classes, n_neighbors=5, leaf_size=40, source_sha256=""):
+        """Build from raw features ``X`` and encoded labels ``y``."""
+        X = np.asarray(X, dtype=np.float64)
+        scaler = FeatureScaler.fit(X)
+        tree = KDTree(scaler.transform(X), leaf_size=leaf_size)
+        return cls(scaler, tree, np.asarray(y, dtype=np.intp), classes, n_neighbors, source_sha256=source_sha256)
+
+    @classmethod
+    def from_estimator(cls, estimator, source_sha256=""):
+        """Re-index the reference set of a fitted ``KNeighborsClassifier``."""
+        return cls.fit(estimator._fit_X, estimator._y, estimator.classes_,
+                       estimator.n_neighbors, source_sha256=source_sha256)
+
+    @property
+    def n_reference(self):
+        return self.labels.shape[0]
+
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        state = {
+            "mean": self.scaler.mean,
+            "scale": self.scaler.scale,
+            "tree": self.tree,
+            "labels": self.labels,
+            "classes": [str(c) for c in self.classes_],
+            "n_neighbors": self.n_neighbors,
+            "feature_names": [str(c) for c in self.feature_names_in_],
+            "source_sha256": self.source_sha256,
+        }
+        # Plain state (no custom classes) and uncompressed, so every array can
+        # be memory-mapped on load
+        joblib.dump(state, path, compress=0)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH, mmap_mode="r"):
+        state = joblib.load(path, mmap_mode=mmap_mode)
+        return cls(FeatureScaler(state["mean"], state["scale"]), state["tree"], state["labels"],
+                   state["classes"], state["n_neighbors"], state["feature_names"], state["source_sha256"])
+
+    def _as_array(self, X):
+        if hasattr(X, "columns"):
+            X = X[list(self.feature_names_in_)].to_numpy(dtype=np.float64)
+        X = np.asarray(X, dtype=np.float64)
+        return X.reshape(1, -1) if X.ndim == 1 else X
+
+    def kneighbors(self, X, n_neighbors=None):
+        return self.tree.query(self.scaler.transform(self._as_array(X)), k=n_neighbors or self.n_neighbors)
+
+    def predict_proba(self, X):
+        _, indices = self.kneighbors(X)
+        votes = self.labels[indices]
+        proba = np.zeros((votes.shape[0], len(self.classes_)), dtype=np.float64)
+        for column in range(len(self.classes_)):
+            proba[:, column] = (votes == column).sum(axis=1)
+        proba /= votes.shape[1]
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def load_index(source_path, path=INDEX_PATH):
+    """Memory-mapped index if it exists and was built from ``source_path``."""
+    from tree_compiler import file_sha256
+
+    if not os.path.exists(path):
+        return None
+    index = ScaledKNNIndex.load(path)
+    if index.source_sha256 != file_sha256(source_path):
+        return None
+    return index
+
+
+def export(path=INDEX_PATH):
+    from model_registry import model_path
+    from tree_compiler import file_sha256
+
+    source = model_path("K-Nearest Neighbors")
+    index = ScaledKNNIndex.from_estimator(joblib.load(source), file_sha256(source))
+    index.save(path)
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the scaled, memory-mappable KNN index.")
+    parser.add_argument("--output", default=INDEX_PATH)
+    args = parser.parse_args(argv)
+
+    index = export(args.output)
+    print(f"Wrote {args.output} ({os.path.getsize(args.output) / 1024:,.0f} KB, "
+          f"{index.n_reference:,} reference rows, k={index.n_neighbors})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""In-process counters, gauges and latency histograms for the scoring path.
+
+A dependency-free subset of the Prometheus client model: metrics have a name,
+help text and optional label names, and ``render`` produces the text
+exposition format (version 0.0.4) that Prometheus scrapes. The scoring
+service serves it on ``GET /metrics``; other processes (the Streamlit app)
+can expose it with ``serve`` when ``FRAUDGUARD_METRICS_PORT`` is set.
+
+Recording is meant for the hot path: a labelled child is looked up once
+(``HISTOGRAM.labels("x")``), and ``inc``/``observe`` take one uncontended
+lock, a few hundred nanoseconds. Values are per process; every worker of
+``prefork_server.py`` keeps its own.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Latency buckets in seconds, 50 µs to 10 s
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_PORT = os.environ.get("FRAUDGUARD_METRICS_PORT")
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lookup = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def labels(self, *values):
+        """Child metric for one combination of label values (created on first use)."""
+        child = self._lookup.get(values)
+        if child is None:
+            key = tuple(str(value) for value in values)
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+                # Also found by the caller's own (e.g. numpy str) values next time
+                self._lookup[values] = child
+        return child
+
+    def children(self):
+        return dict(self._children)
+
+    def collect(self):
+        """Exposition lines for this metric, header included."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self.children().items()):
+            lines.extend(self._sample_lines(values, child))
+        return lines
+
+    def _sample_lines(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        # acquire/release is measurably cheaper than ``with`` on this path
+        self._lock.acquire()
+        self.value += amount
+        self._lock.release()
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonic count (``*_total``)."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    @property
+    def value(self):
+        return self._default.value
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, set directly or computed at collection.
+
+    With ``callback`` the samples come from ``callback()``, which returns a
+    number, or a dict of label-value tuples to numbers for labelled gauges.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.callback = callback
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._default.set(value)
+
+    @property
+    def value(self):
+        return self.callback() if self.callback and not self.labelnames else self._default.value
+
+    def children(self):
+        if self.callback is None:
+            return super().children()
+        values = self.callback()
+        if not self.labelnames:
+            values = {(): values}
+        children = {}
+        for key, value in values.items():
+            children[tuple(str(v) for v in key)] = child = _Value()
+            child.value = value
+        return children
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        # Bucket i counts value <= buckets[i]; the last slot is +Inf
+        i = bisect_left(self.buckets, value)
+        self._lock.acquire()
+        self.counts[i] += 1
+        self.sum += value
+        self._lock.release()
+
+    def timed(self, func):
+        """Decorator observing ``func``'s wall-clock duration on every call."""
+        observe = self.observe
+        clock = time.perf_counter
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(clock() - start)
+        return wrapper
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        """Estimate of the ``q`` quantile, interpolated within its bucket
+        (as Prometheus' ``histogram_quantile``); ``None`` with no samples."""
+        with self._lock:
+            counts = list(self.counts)
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (latencies, in seconds) over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def _sample_lines(self, values, child):
+        with child._lock:
+            counts, total = list(child.counts), child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Ordered collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics[name]
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=(), callback=None):
+    return REGISTRY.register(Gauge(name, documentation, labelnames, callback))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def render():
+    return REGISTRY.render()
+
+
+# -- scoring path metrics ------------------------------------------------
+
+REQUESTS = counter("fraudguard_requests_total", "Scoring requests handled", ("source", "model"))
+ERRORS = counter("fraudguard_errors_total", "Scoring requests that failed", ("source", "stage"))
+STAGE_SECONDS = histogram("fraudguard_stage_seconds", "Latency of the scoring stages before the model call", ("stage",))
+PREDICT_SECONDS = histogram("fraudguard_predict_proba_seconds", "Latency of one predict_proba call", ("model",))
+ANALYSIS_SECONDS = histogram("fraudguard_analysis_seconds", "Latency of one app analysis, all stages", ("model",))
+PREDICTIONS = counter("fraudguard_predictions_total", "Rows scored, by predicted label", ("model", "label"))
+
+
+def _fraud_rates():
+    flagged, scored = {}, {}
+    for (model, label), child in PREDICTIONS.children().items():
+        scored[model] = scored.get(model, 0) + child.value
+        if label == "Fraud":
+            flagged[model] = child.value
+    return {(model,): flagged.get(model, 0) / total for model, total in scored.items() if total}
+
+
+FRAUD_RATE = gauge("fraudguard_fraud_rate", "Share of scored rows predicted as fraud", ("model",), callback=_fraud_rates)
+
+
+def record_predictions(model_name, labels):
+    """Count predicted ``labels`` (an array of class names) for ``model_name``."""
+    if len(labels) == 1:
+        PREDICTIONS.labels(model_name, labels[0]).inc()
+        return
+    for label, count in zip(*np.unique(labels, return_counts=True)):
+        PREDICTIONS.labels(model_name, label).inc(int(count))
+
+
+def error_ratio(source=None):
+    """Failed share of the requests seen by this process (optionally for one source)."""
+    requests = sum(child.value for (src, _), child in REQUESTS.children().items() if source in (None, src))
+    errors = sum(child.value for (src, _), child in ERRORS.children().items() if source in (None, src))
+    return errors / requests if requests else 0.0
+
+
+# -- exposition over HTTP ------------------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host="127.0.0.1"):
+    """Serve ``GET /metrics`` from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, int(port)), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,398 @@
+"""Pickle-free, memory-mappable model artifacts.
+
+A joblib pickle is slow to deserialize, executes code from whatever file it
+is handed, only loads under the sklearn version that wrote it, and copies
+every array into each process's private heap. Each model is exported
+instead to a directory of plain data::
+
+    compiled_models/<model>/
+        manifest.json     format version, model kind, feature order, label
+                          classes, training-data and source-pickle hashes,
+                          library versions, and per-array dtype/shape/sha256
+        <array>.npy       one uncompressed array per file
+
+``load_artifact`` reads the manifest, checks every array against its
+checksum and maps it read-only with ``np.load(mmap_mode="r",
+allow_pickle=False)``: nothing is unpickled, and all worker processes on a
+host share one page-cache copy of the forest's node tables and the KNN
+reference set. Inference is plain NumPy (``CompiledTrees`` for the tree
+models, small evaluators below for the others), so it does not depend on
+the installed sklearn version. Every export is checked against the source
+estimator's ``predict_proba`` before it is written.
+
+Usage:
+    python model_artifacts.py                       # export all models + verify
+    python model_artifacts.py --verify              # only check existing exports
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import time
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+from tree_compiler import COMPILED_DIR, CompiledTrees, file_sha256
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+class TreeModel(CompiledTrees):
+    """``CompiledTrees`` with its derived child tables stored too, so nothing
+    is rebuilt (or copied) at load time."""
+
+    kind = "trees"
+
+    def arrays(self):
+        return {
+            "feature": self.feature, "threshold": self.threshold, "left": self.left, "right": self.right,
+            "value": self.value, "roots": self.roots, "children": self._children, "is_leaf": self._is_leaf,
+        }
+
+    def params(self):
+        return {"max_depth": self.max_depth}
+
+
+class ArrayModel:
+    """Shared ``predict``/input handling for the NumPy evaluators."""
+
+    kind = None
+
+    def __init__(self, classes, feature_names=FEATURE_COLUMNS):
+        self.classes_ = np.asarray(classes, dtype=object)
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = len(self.feature_names_in_)
+
+    def _as_array(self, X):
+        if hasattr(X, "columns"):
+            X = X[list(self.feature_names_in_)].to_numpy(dtype=np.float64)
+        X = np.asarray(X, dtype=np.float64)
+        return X.reshape(1, -1) if X.ndim == 1 else X
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+class LogisticModel(ArrayModel):
+    """Binary logistic regression: ``expit(X @ coef.T + intercept)``."""
+
+    kind = "logistic"
+
+    def __init__(self, coef, intercept, classes, feature_names=FEATURE_COLUMNS):
+        super().__init__(classes, feature_names)
+        self.coef = coef
+        self.intercept = intercept
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        if len(estimator.classes_) != 2:
+            raise ValueError("Only binary logistic regression is supported")
+        return cls(estimator.coef_, estimator.intercept_, estimator.classes_,
+                   getattr(estimator, "feature_names_in_", FEATURE_COLUMNS))
+
+    def arrays(self):
+        return {"coef": self.coef, "intercept": self.intercept}
+
+    def params(self):
+        return {}
+
+    def predict_proba(self, X):
+        from scipy.special import expit
+
+        scores = self._as_array(X) @ self.coef.T + self.intercept
+        prob = expit(scores.reshape(-1))
+        return np.stack([1 - prob, prob], axis=1)
+
+
+class BernoulliModel(ArrayModel):
+    """Bernoulli naive Bayes on binarized features.
+
+    ``weights`` and ``bias`` fold the per-class feature log-probabilities so
+    a prediction is one matrix product, as in sklearn's implementation.
+    """
+
+    kind = "bernoulli_nb"
+
+    def __init__(self, weights, bias, binarize, classes, feature_names=FEATURE_COLUMNS):
+        super().__init__(classes, feature_names)
+        self.weights = weights
+        self.bias = bias
+        self.binarize = binarize
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        neg_prob = np.log(1 - np.exp(estimator.feature_log_prob_))
+        weights = (estimator.feature_log_prob_ - neg_prob).T
+        bias = estimator.class_log_prior_ + neg_prob.sum(axis=1)
+        return cls(np.ascontiguousarray(weights), bias, estimator.binarize, estimator.classes_,
+                   getattr(estimator, "feature_names_in_", FEATURE_COLUMNS))
+
+    def arrays(self):
+        return {"weights": self.weights, "bias": self.bias}
+
+    def params(self):
+        return {"binarize": self.binarize}
+
+    def predict_proba(self, X):
+        X = self._as_array(X)
+        if self.binarize is not None:
+            X = (X > self.binarize).astype(np.float64)
+        jll = X @ self.weights
+        jll += self.bias
+        # log-sum-exp normalisation, same steps as sklearn's
+        jll_max = jll.max(axis=1, keepdims=True)
+        is_max = jll == jll_max
+        rest = np.where(is_max, -np.inf, jll)
+        n_max = is_max.sum(axis=1, keepdims=True, dtype=np.float64)
+        shift = np.where(np.isfinite(jll_max), jll_max, 0)
+        total = np.exp(rest - shift).sum(axis=1, keepdims=True)
+        total = np.where(total == 0, total, total / n_max)
+        log_prob_x = np.log1p(total) + np.log(n_max) + jll_max
+        return np.exp(jll - log_prob_x)
+
+
+class NeighborsModel(ArrayModel):
+    """Uniform-vote k-nearest neighbors by exact brute-force search.
+
+    The reference set is small enough that a blocked distance scan costs
+    about as much as a KD-tree query, and it needs no tree object: the
+    reference rows and labels are the whole model.
+    """
+
+    kind = "knn"
+    block_rows = 256
+
+    def __init__(self, reference, labels, n_neighbors, classes, feature_names=FEATURE_COLUMNS):
+        super().__init__(classes, feature_names)
+        self.reference = reference
+        self.labels = labels
+        self.n_neighbors = n_neighbors
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        if estimator.weights != "uniform" or estimator.effective_metric_ != "euclidean":
+            raise ValueError("Only uniform-weight euclidean KNN is supported")
+        return cls(np.ascontiguousarray(estimator._fit_X, dtype=np.float64), estimator._y.astype(np.int64),
+                   estimator.n_neighbors, estimator.classes_,
+                   getattr(estimator, "feature_names_in_", FEATURE_COLUMNS))
+
+    def arrays(self):
+        return {"reference": self.reference, "labels": self.labels}
+
+    def params(self):
+        return {"n_neighbors": self.n_neighbors}
+
+    def kneighbors(self, X):
+        X = self._as_array(X)
+        indices = np.empty((X.shape[0], self.n_neighbors), dtype=np.int64)
+        for start in range(0, X.shape[0], self.block_rows):
+            block = X[start:start + self.block_rows]
+            # Squared distances summed feature by feature, in column order
+            distances = (block[:, :1] - self.reference[:, 0]) ** 2
+            for column in range(1, self.reference.shape[1]):
+                distances += (block[:, column:column + 1] - self.reference[:, column]) ** 2
+            # Stable sort: equidistant neighbors are taken in reference order
+            indices[start:start + len(block)] = np.argsort(distances, axis=1, kind="stable")[:, :self.n_neighbors]
+        return indices
+
+    def predict_proba(self, X):
+        votes = self.labels[self.kneighbors(X)]
+        proba = np.zeros((votes.shape[0], len(self.classes_)), dtype=np.float64)
+        for column in range(len(self.classes_)):
+            proba[:, column] = (votes == column).sum(axis=1)
+        proba /= votes.shape[1]
+        return proba
+
+
+def from_estimator(estimator):
+    """NumPy evaluator equivalent to a fitted FraudGuard estimator."""
+    kind = type(estimator).__name__
+    if kind in ("DecisionTreeClassifier", "RandomForestClassifier"):
+        return TreeModel.from_estimator(estimator)
+    if kind == "LogisticRegression":
+        return LogisticModel.from_estimator(estimator)
+    if kind == "BernoulliNB":
+        return BernoulliModel.from_estimator(estimator)
+    if kind == "KNeighborsClassifier":
+        return NeighborsModel.from_estimator(estimator)
+    raise ValueError(f"No artifact format for {kind}")
+
+
+def _build(kind, arrays, params, classes, feature_names):
+    if kind == "trees":
+        return TreeModel(arrays["feature"], arrays["threshold"], arrays["left"], arrays["right"],
+                         arrays["value"], arrays["roots"], classes, feature_names, params["max_depth"],
+                         children=arrays["children"], is_leaf=arrays["is_leaf"])
+    if kind == "logistic":
+        return LogisticModel(arrays["coef"], arrays["intercept"], classes, feature_names)
+    if kind == "bernoulli_nb":
+        return BernoulliModel(arrays["weights"], arrays["bias"], params["binarize"], classes, feature_names)
+    if kind == "knn":
+        return NeighborsModel(arrays["reference"], arrays["labels"], params["n_neighbors"], classes, feature_names)
+    raise ValueError(f"Unknown artifact kind {kind!r}")
+
+
+def artifact_dir(name, root=COMPILED_DIR):
+    return os.path.join(root, name.lower().replace(" ", "_"))
+
+
+def _checksum(manifest):
+    """Digest over everything in the manifest except the digest itself."""
+    body = {key: value for key, value in manifest.items() if key != "checksum"}
+    return hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+
+
+def save_artifact(model, name, directory, source_sha256="", data_sha256=""):
+    """Write ``model`` (a NumPy evaluator) as an artifact directory.
+
+    Written to a staging directory and swapped in, so a concurrent loader
+    sees either the old artifact or the new one.
+    """
+    import sklearn
+
+    staging = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    arrays = {}
+    for key, array in model.arrays().items():
+        path = os.path.join(staging, key + ".npy")
+        np.save(path, np.ascontiguousarray(array), allow_pickle=False)
+        arrays[key] = {"file": key + ".npy", "dtype": np.dtype(array.dtype).str, "shape": list(array.shape),
+                       "sha256": file_sha256(path)}
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "name": name,
+        "kind": model.kind,
+        "feature_columns": [str(c) for c in model.feature_names_in_],
+        "classes": [str(c) for c in model.classes_],
+        "params": model.params(),
+        "source_sha256": source_sha256,
+        "training_data_sha256": data_sha256,
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "sklearn": sklearn.__version__},
+        "arrays": arrays,
+    }
+    manifest["checksum"] = _checksum(manifest)
+    with open(os.path.join(staging, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    retired = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.replace(directory, retired)
+    os.replace(staging, directory)
+    shutil.rmtree(retired, ignore_errors=True)
+    return manifest
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{directory}: unsupported artifact format {manifest.get('format_version')!r}")
+    if manifest.get("checksum") != _checksum(manifest):
+        raise ValueError(f"{directory}: manifest checksum mismatch")
+    return manifest
+
+
+def load_artifact(directory, verify=True):
+    """Evaluator for an artifact directory, every array memory-mapped.
+
+    With ``verify`` each array file is hashed and compared to the manifest
+    first; a mismatch raises ``ValueError``.
+    """
+    manifest = read_manifest(directory)
+    arrays = {}
+    for key, entry in manifest["arrays"].items():
+        path = os.path.join(directory, entry["file"])
+        if verify and file_sha256(path) != entry["sha256"]:
+            raise ValueError(f"{path}: checksum mismatch")
+        array = np.load(path, mmap_mode="r", allow_pickle=False)
+        if array.dtype.str != entry["dtype"] or list(array.shape) != entry["shape"]:
+            raise ValueError(f"{path}: expected {entry['dtype']} {entry['shape']}, found {array.dtype.str} {list(array.shape)}")
+        arrays[key] = array
+    model = _build(manifest["kind"], arrays, manifest["params"], manifest["classes"], manifest["feature_columns"])
+    model.source_sha256 = manifest["source_sha256"]
+    return model
+
+
+def load_model_artifact(name, source_path, root=COMPILED_DIR, verify=True):
+    """Artifact for ``name`` if one exists and was exported from ``source_path``."""
+    directory = artifact_dir(name, root)
+    if not os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+        return None
+    if read_manifest(directory)["source_sha256"] != file_sha256(source_path):
+        return None
+    return load_artifact(directory, verify)
+
+
+def verify_model(estimator, model, X):
+    """Largest absolute probability difference from the estimator (``inf`` on
+    a shape or label mismatch)."""
+    expected = estimator.predict_proba(X)
+    actual = model.predict_proba(X)
+    if expected.shape != actual.shape or not np.array_equal(estimator.predict(X), model.predict(X)):
+        return float("inf")
+    return float(np.abs(expected - actual).max())
+
+
+def export(names=None, root=COMPILED_DIR, data_path=None, tolerance=1e-12):
+    """Convert, verify and save models from their pickles. Returns manifests."""
+    import joblib
+
+    from dataset import DATA_PATH
+    from model_registry import MODEL_NAMES, model_path
+    from tree_compiler import verification_inputs
+
+    X = verification_inputs()
+    data_sha256 = file_sha256(data_path or DATA_PATH)
+    manifests = {}
+    for name in names or MODEL_NAMES:
+        source = model_path(name)
+        estimator = joblib.load(source)
+        model = from_estimator(estimator)
+        error = verify_model(estimator, model, X)
+        if error > tolerance:
+            raise RuntimeError(f"{name} artifact does not reproduce the estimator (max error {error:.3g})")
+        manifests[name] = save_artifact(model, name, artifact_dir(name, root), file_sha256(source), data_sha256)
+    return manifests
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the models as pickle-free, memory-mappable artifacts.")
+    parser.add_argument("--models", nargs="+", default=None)
+    parser.add_argument("--data", default=None, help="Training CSV to record in the manifest (default: credit card.csv)")
+    parser.add_argument("--output", default=COMPILED_DIR)
+    parser.add_argument("--verify", action="store_true", help="Only verify existing exports")
+    args = parser.parse_args(argv)
+
+    import joblib
+
+    from model_registry import MODEL_NAMES, model_path
+    from tree_compiler import verification_inputs
+
+    names = args.models or list(MODEL_NAMES)
+    if not args.verify:
+        for name, manifest in export(names, args.output, args.data).items():
+            size = sum(os.path.getsize(os.path.join(artifact_dir(name, args.output), entry["file"]))
+                       for entry in manifest["arrays"].values())
+            print(f"Wrote {artifact_dir(name, args.output)} ({manifest['kind']}, {size / 1024:,.0f} KB)")
+
+    X = verification_inputs(seed=7)
+    for name in names:
+        start = time.perf_counter()
+        model = load_model_artifact(name, model_path(name), args.output)
+        if model is None:
+            raise SystemExit(f"{name}: no up-to-date artifact")
+        load_ms = (time.perf_counter() - start) * 1000
+        error = verify_model(joblib.load(model_path(name)), model, X)
+        print(f"{name:<20} verified load {load_ms:6.2f} ms, max |Δp| = {error:.3g} on {len(X):,} rows")
+        if error > 1e-12:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Lazy, process-wide registry for the pickled FraudGuard models.
+
+Models are deserialized the first time they are requested and then kept in a
+module-level cache. Streamlit re-executes ``main_app.py`` on every interaction
+but imported modules stay in ``sys.modules``, so the cache is shared by every
+rerun and every session served by the same process.
+"""
+import os
+import sys
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from metrics import STAGE_SECONDS, gauge
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Display name -> pickle file, in the order shown in the sidebar
+MODEL_FILES = {
+    "Decision Tree": "decision_tree_model.pkl",
+    "K-Nearest Neighbors": "KNeighbors_model.pkl",
+    "Logistic Regression": "logistic_regression_model.pkl",
+    "Naive Bayes": "NaiveBayes_model.pkl",
+    "Random Forest": "random_forest_model.pkl",
+}
+MODEL_NAMES = tuple(MODEL_FILES)
+
+# Default for joblib's ``mmap_mode`` ("r" maps numpy arrays read-only instead
+# of copying them into the heap). Can be set per process via the environment.
+DEFAULT_MMAP_MODE = os.environ.get("FRAUDGUARD_MMAP_MODE") or None
+
+# Serve models from their pickle-free, memory-mapped artifacts (see
+# model_artifacts.py) when an up-to-date export exists; each load verifies
+# the artifact's checksums. Set FRAUDGUARD_ARTIFACTS=0 to opt out.
+USE_ARTIFACTS = os.environ.get("FRAUDGUARD_ARTIFACTS", "1") != "0"
+# Serve tree models from their compiled node tables (see tree_compiler.py)
+# when an up-to-date export exists; set FRAUDGUARD_COMPILED_TREES=0 to opt out.
+USE_COMPILED_TREES = os.environ.get("FRAUDGUARD_COMPILED_TREES", "1") != "0"
+# Serve K-Nearest Neighbors from the scaled, memory-mapped index built by
+# knn_index.py. Opt-in because scaling changes which neighbors are found.
+USE_KNN_INDEX = os.environ.get("FRAUDGUARD_KNN_INDEX", "0") == "1"
+
+# Loaded models re-check their file at most this often and reload when it
+# changed on disk (new mtime or size)
+RELOAD_CHECK_SECONDS = float(os.environ.get("FRAUDGUARD_RELOAD_CHECK_SECONDS", "1.0"))
+
+# name -> (model, version), replaced as one value so readers never pair a
+# model with another file's version
+_models = {}
+_load_stats = {}
+_versions = {}
+_checked_at = {}
+_reload_listeners = []
+_locks = {name: threading.Lock() for name in MODEL_NAMES}
+
+
+def model_path(name):
+    try:
+        return os.path.join(MODEL_DIR, MODEL_FILES[name])
+    except KeyError:
+        raise KeyError(f"Unknown model: {name!r}") from None
+
+
+def file_version(path):
+    """Cheap change token for a model file."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+@STAGE_SECONDS.labels("model_select").timed
+def get_model(name, mmap_mode=DEFAULT_MMAP_MODE):
+    """Return the fitted estimator for ``name``, loading it on first use.
+
+    A loaded model is reloaded transparently when its file changes on disk.
+    """
+    return get_versioned_model(name, mmap_mode)[0]
+
+
+def get_versioned_model(name, mmap_mode=DEFAULT_MMAP_MODE):
+    """``(model, version)`` for ``name``, as ``get_model``; the version is the
+    file version that model was loaded from, even across a concurrent reload."""
+    entry = _models.get(name)
+    path = model_path(name)
+    if entry is not None:
+        now = time.monotonic()
+        if now - _checked_at.get(name, 0.0) < RELOAD_CHECK_SECONDS:
+            return entry
+        _checked_at[name] = now
+        try:
+            if file_version(path) == entry[1]:
+                return entry
+        except OSError:
+            # File is being replaced; keep serving the loaded copy
+            return entry
+
+    reloaded = False
+    # One lock per model so a slow Random Forest load does not block the others
+    with _locks[name]:
+        current = _models.get(name)
+        version = file_version(path)
+        if current is not None and version == current[1]:
+            entry = current
+        else:
+            reloaded = current is not None
+            start = time.perf_counter()
+            model, backend = _load_compiled(name, path)
+            if model is None:
+                model, backend = joblib.load(path, mmap_mode=mmap_mode), "pickle"
+            elapsed = time.perf_counter() - start
+            resident, mapped = estimate_nbytes(model)
+            _load_stats[name] = {
+                "load_seconds": elapsed,
+                "resident_bytes": resident,
+                "mapped_bytes": mapped,
+                "file_bytes": os.path.getsize(path),
+                "mmap_mode": mmap_mode,
+                "backend": backend,
+                "version": version,
+            }
+            _versions[name] = version
+            _checked_at[name] = time.monotonic()
+            entry = _models[name] = (model, version)
+    if reloaded:
+        for listener in list(_reload_listeners):
+            listener(name)
+    return entry
+
+
+def model_version(name):
+    """Version token of the loaded model, or ``None`` if not loaded."""
+    return _versions.get(name)
+
+
+def add_reload_listener(callback):
+    """Call ``callback(name)`` whenever a loaded model is reloaded from disk."""
+    _reload_listeners.append(callback)
+
+
+def _load_compiled(name, path):
+    """``(model, backend)`` from an up-to-date export, or ``(None, None)``."""
+    if name == "K-Nearest Neighbors" and USE_KNN_INDEX:
+        from knn_index import load_index
+
+        model = load_index(path)
+        if model is not None:
+            return model, "knn_index"
+    if USE_ARTIFACTS:
+        from model_artifacts import load_model_artifact
+
+        model = load_model_artifact(name, path)
+        if model is not None:
+            return model, "artifact"
+    if USE_COMPILED_TREES:
+        from tree_compiler import TREE_MODELS, load_compiled
+
+        model = load_compiled(name, path) if name in TREE_MODELS else None
+        if model is not None:
+            return model, "compiled"
+    return None, None
+
+
+def is_loaded(name):
+    return name in _models
+
+
+def loaded_models():
+    return [name for name in MODEL_NAMES if name in _models]
+
+
+def load_stats(name=None):
+    """Load time and size information for models loaded so far."""
+    if name is not None:
+        return _load_stats.get(name)
+    return dict(_load_stats)
+
+
+gauge("fraudguard_models_loaded", "Models loaded in this process", callback=lambda: len(_models))
+gauge("fraudguard_model_load_seconds", "Duration of the last load of each model", ("model",),
+      callback=lambda: {(name, ): stats["load_seconds"] for name, stats in list(_load_stats.items())})
+
+
+def clear():
+    """Drop every cached model (mainly useful for benchmarks)."""
+    for name in MODEL_NAMES:
+        with _locks[name]:
+            _models.pop(name, None)
+            _load_stats.pop(name, None)
+            _versions.pop(name, None)
+            _checked_at.pop(name, None)
+
+
+def snapshot():
+    """The cached models and their bookkeeping, for ``restore``."""
+    return {"models": dict(_models), "load_stats": dict(_load_stats),
+            "versions": dict(_versions), "checked_at": dict(_checked_at)}
+
+
+def restore(state):
+    """Put the registry back to a ``snapshot``, dropping anything loaded since."""
+    tables = {"models": _models, "load_stats": _load_stats, "versions": _versions, "checked_at": _checked_at}
+    for name in MODEL_NAMES:
+        with _locks[name]:
+            for key, table in tables.items():
+                if name in state[key]:
+                    table[name] = state[key][name]
+                else:
+                    table.pop(name, None)
+
+
+def estimate_nbytes(obj):
+    """Approximate memory held by ``obj``.
+
+    Returns ``(resident, mapped)`` where ``mapped`` counts numpy memmaps, which
+    are backed by the page cache rather than the process heap.
+    """
+    resident = 0
+    mapped = 0
+    # Keep visited objects alive so temporary __getstate__ dicts can't recycle ids
+    seen = {}
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen[id(item)] = item
+
+        if isinstance(item, np.ndarray):
+            # Account for the owning array once, however many views point at it
+            root = item
+            while isinstance(root.base, np.ndarray):
+                root = root.base
+            if ("root", id(root)) not in seen:
+                seen[("root", id(root))] = root
+                if isinstance(root, np.memmap):
+                    mapped += root.nbytes
+                else:
+                    resident += root.nbytes
+            if item.dtype == object:
+                stack.extend(item.ravel().tolist())
+            continue
+
+        resident += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, int, float, bool, type(None))):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        else:
+            # sklearn's Cython ``Tree`` only exposes its arrays via __getstate__
+            try:
+                state = item.__getstate__()
+            except Exception:
+                state = getattr(item, "__dict__", None)
+            if state is not None and state is not item:
+                stack.append(state)
+    return resident, mapped
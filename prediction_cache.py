@@ -0,0 +1,142 @@
+"""Bounded LRU/TTL cache in front of ``predict_proba``.
+
+Keys are ``(model name, model file version, canonical feature values)``, so
+an entry can never be served for a different model file. When the registry
+reloads a model because its file changed, that model's entries are dropped
+eagerly as well. One process-wide cache is shared by every Streamlit session
+and by the scoring service.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from drift_monitor import observe as observe_drift
+from features import FEATURE_COLUMNS, model_input
+from metrics import PREDICT_SECONDS, gauge, record_predictions
+from model_registry import add_reload_listener, get_model, get_versioned_model
+from scoring import fraud_column
+from thresholds import decide, served_threshold
+
+DEFAULT_MAXSIZE = int(os.environ.get("FRAUDGUARD_CACHE_SIZE", "100000"))
+DEFAULT_TTL = float(os.environ.get("FRAUDGUARD_CACHE_TTL", "300"))
+
+
+class PredictionCache:
+    """Thread-safe LRU mapping with per-entry expiry and counters."""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_model(self, model_name):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == model_name]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+cache = PredictionCache()
+add_reload_listener(cache.invalidate_model)
+
+gauge("fraudguard_prediction_cache_hit_ratio", "Share of prediction cache lookups that hit",
+      callback=lambda: cache.stats()["hit_rate"])
+gauge("fraudguard_prediction_cache_entries", "Entries in the prediction cache", callback=lambda: cache.stats()["size"])
+gauge("fraudguard_prediction_cache_events", "Prediction cache lookups and removals so far", ("event",),
+      callback=lambda: {(event,): value for event, value in cache.stats().items()
+                        if event in ("hits", "misses", "evictions", "expirations", "invalidations")})
+
+
+def canonical_rows(features):
+    """Feature rows as tuples of plain floats in ``FEATURE_COLUMNS`` order."""
+    if hasattr(features, "columns"):
+        features = features[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    values = np.asarray(features, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+    # Adding 0.0 folds -0.0 into 0.0 so both spellings share an entry
+    return [tuple(row) for row in (values + 0.0).tolist()]
+
+
+def predict_proba(model_name, features, cache=cache):
+    """``predict_proba`` for ``features`` served from the cache where possible.
+
+    Misses are scored together in one vectorized call.
+    """
+    model, version = get_versioned_model(model_name)
+    keys = [(model_name, version, row) for row in canonical_rows(features)]
+    rows = [cache.get(key) for key in keys]
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        block = np.array([keys[i][2] for i in missing], dtype=np.float64)
+        start = time.perf_counter()
+        proba = model.predict_proba(model_input(model, block))
+        PREDICT_SECONDS.labels(model_name).observe(time.perf_counter() - start)
+        for i, row in zip(missing, proba):
+            # A copy, so the entry does not keep the whole block alive
+            rows[i] = row = row.copy()
+            cache.put(keys[i], row)
+    return np.vstack(rows) if rows else np.empty((0, len(model.classes_)))
+
+
+def score(model_name, features, cache=cache, drift_features=True):
+    """Cached counterpart of ``scoring.score``: ``(labels, fraud_probability)``
+    with labels at the model's served threshold."""
+    model = get_model(model_name)
+    proba = predict_proba(model_name, features, cache)
+    fraud_probability = proba[:, fraud_column(model)]
+    labels = decide(fraud_probability, served_threshold(model_name))
+    record_predictions(model_name, labels)
+    observe_drift(model_name, features if drift_features else None, fraud_probability)
+    return labels, fraud_probability
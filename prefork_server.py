@@ -0,0 +1,350 @@
+"""Pre-fork, supervised multi-process runner for the HTTP scoring service.
+
+The parent process loads every model once, warms each with a
+``predict_proba`` call (``scoring_service.warm_up``), freezes the garbage
+collector so it never writes to those objects, binds the listening socket
+and then forks the workers. Each worker runs ``scoring_service.app`` under
+uvicorn on the inherited socket. The workers share the parent's model pages
+copy-on-write (and the page cache, for memory-mapped artifacts), and the
+first request a worker serves needs no load or warm-up.
+
+The parent then supervises:
+
+* a worker that exits unexpectedly is replaced, with a growing delay if
+  workers keep crashing right after they start;
+* ``SIGHUP``, or a changed model file with ``--watch``, hot-reloads: the
+  parent reloads and warms the models, forks a complete new generation of
+  workers, waits until each one is accepting, and only then asks the old
+  generation to finish its in-flight requests and exit. The listening
+  socket stays open in the parent throughout, so no connection is refused;
+  if loading or the new generation's startup fails, the parent goes back
+  to the old models (so replaced workers match the old generation), the
+  old generation keeps serving, and ``--watch`` retries with a growing
+  delay;
+* ``SIGTERM``/``SIGINT`` shut every worker down gracefully.
+
+Workers never reload models themselves; that would give each its own
+private copy. Supervisor events are logged as JSON lines via ``telemetry``.
+
+Usage:
+    python prefork_server.py --workers 4 --port 8000 [--watch]
+    kill -HUP <parent pid>       # reload models without downtime
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import select
+import signal
+import socket
+import time
+
+# Imported before forking so workers start with the server and app loaded
+import uvicorn
+
+import model_registry
+from model_registry import MODEL_NAMES, file_version, model_path
+from scoring_service import app, warm_up
+from telemetry import configure as configure_telemetry, logger
+
+# Seconds a new generation has to start accepting before a reload is abandoned
+READY_TIMEOUT = 60.0
+# Grace period for in-flight requests when a worker is retired
+GRACEFUL_TIMEOUT = 30.0
+# A retired worker stops accepting, then keeps its already-accepted
+# connections open this long so their requests arrive before it shuts down
+DRAIN_SECONDS = 1.0
+# A worker that exits sooner than this after starting counts as a crash loop
+MIN_UPTIME = 2.0
+MAX_RESTART_DELAY = 30.0
+POLL_SECONDS = 0.2
+
+
+def log_event(event, **fields):
+    logger.info(json.dumps({"event": event, "ts": time.time(), "supervisor": os.getpid(), **fields}))
+
+
+def preload(names):
+    """Load and warm ``names`` in this process; returns per-model load seconds."""
+    timings = {}
+    for name in names:
+        start = time.perf_counter()
+        warm_up(name)
+        timings[name] = round(time.perf_counter() - start, 4)
+    return timings
+
+
+def bind(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve(sock, ready_fd):
+    """Worker body: run the ASGI app on the inherited socket until told to stop."""
+    # Workers keep the models they inherited; the supervisor handles reloads
+    model_registry.RELOAD_CHECK_SECONDS = float("inf")
+    # uvicorn installs its own SIGINT/SIGTERM handlers; SIGHUP is for the parent
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, signal.SIG_DFL)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    class Server(uvicorn.Server):
+        async def startup(self, sockets=None):
+            await super().startup(sockets)
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, self.drain)
+            if not self.should_exit:
+                os.write(ready_fd, b"1")
+            os.close(ready_fd)
+
+        def drain(self):
+            # Stop accepting without closing the asyncio servers yet: a close
+            # now would orphan connections accepted in this loop iteration
+            # whose transports aren't attached, and they'd be reset at exit.
+            # The parent keeps the socket listening for the next generation.
+            loop = asyncio.get_running_loop()
+            for server in self.servers:
+                for listener in server.sockets:
+                    loop.remove_reader(listener.fileno())
+            loop.call_later(DRAIN_SECONDS, setattr, self, "should_exit", True)
+
+    config = uvicorn.Config(app, lifespan="on", log_level="warning", timeout_graceful_shutdown=GRACEFUL_TIMEOUT)
+    Server(config).run(sockets=[sock])
+
+
+class Worker:
+    def __init__(self, pid, generation, ready_fd):
+        self.pid = pid
+        self.generation = generation
+        self.ready_fd = ready_fd
+        self.ready = False
+        self.started = time.monotonic()
+
+
+class Supervisor:
+    """Forks, watches and replaces the worker processes (see module docstring)."""
+
+    def __init__(self, sock, workers, models=MODEL_NAMES, watch=False):
+        self.sock = sock
+        self.n_workers = workers
+        self.models = list(models)
+        self.watch = watch
+        self.generation = 0
+        self.workers = {}
+        self.restart_delay = 0.0
+        self._pending_restarts = []
+        self._reload_requested = False
+        self._stopping = False
+        self._versions = {}
+        # Backoff for --watch retries after a failed reload
+        self.reload_delay = 0.0
+        self._next_watch_reload = 0.0
+
+    # -- signals -----------------------------------------------------------
+
+    def _on_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def load_models(self):
+        # Objects frozen by an earlier generation must be collectable again
+        gc.unfreeze()
+        model_registry.clear()
+        gc.collect()
+        timings = preload(self.models)
+        self._versions = self._model_versions()
+        # Keep the collector from touching (and so copying) inherited objects
+        gc.freeze()
+        log_event("models_loaded", load_seconds=timings, generation=self.generation + 1)
+
+    def _restore_models(self, state, versions):
+        """Go back to the models (and versions) of a ``snapshot`` after a failed reload."""
+        gc.unfreeze()
+        model_registry.restore(state)
+        self._versions = versions
+        gc.collect()
+        gc.freeze()
+
+    def _model_versions(self):
+        versions = {}
+        for name in self.models:
+            try:
+                versions[name] = file_version(model_path(name))
+            except OSError:
+                versions[name] = None
+        return versions
+
+    def spawn(self):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            for worker in self.workers.values():
+                if worker.ready_fd is not None:
+                    os.close(worker.ready_fd)
+            status = 0
+            try:
+                _serve(self.sock, write_fd)
+            except BaseException:
+                status = 1
+                import traceback
+
+                traceback.print_exc()
+            finally:
+                os._exit(status)
+        os.close(write_fd)
+        self.workers[pid] = Worker(pid, self.generation, read_fd)
+        log_event("worker_started", pid=pid, generation=self.generation)
+        return self.workers[pid]
+
+    def wait_ready(self, workers, timeout=READY_TIMEOUT):
+        """True once every worker in ``workers`` reported it is accepting."""
+        deadline = time.monotonic() + timeout
+        pending = {w.ready_fd: w for w in workers if not w.ready}
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select(list(pending), [], [], min(remaining, POLL_SECONDS))
+            for fd in readable:
+                worker = pending.pop(fd)
+                worker.ready = os.read(fd, 1) == b"1"
+                os.close(fd)
+                worker.ready_fd = None
+                if not worker.ready:
+                    return False
+        return True
+
+    def retire(self, workers, sig=signal.SIGUSR1):
+        """Ask ``workers`` to drain and exit (``SIGTERM``: exit now, gracefully)."""
+        for worker in workers:
+            try:
+                os.kill(worker.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def start(self):
+        self.load_models()
+        self.generation += 1
+        for _ in range(self.n_workers):
+            self.spawn()
+
+    def reload(self):
+        """Switch to freshly loaded models; on any failure the parent goes
+        back to the old models, so restarted workers match the old generation."""
+        self._reload_requested = False
+        old = [w for w in self.workers.values() if w.generation == self.generation]
+        previous = model_registry.snapshot(), dict(self._versions)
+        try:
+            self.load_models()
+        except Exception as e:
+            self._restore_models(*previous)
+            self._reload_failed(stage="load", error=str(e))
+            return False
+        self.generation += 1
+        new = [self.spawn() for _ in range(self.n_workers)]
+        if not self.wait_ready(new):
+            self.retire(new, signal.SIGTERM)
+            self.generation -= 1
+            self._restore_models(*previous)
+            self._reload_failed(stage="startup", generation=self.generation + 1)
+            return False
+        self.retire(old)
+        self.reload_delay = 0.0
+        log_event("reloaded", generation=self.generation, versions=self._versions)
+        return True
+
+    def _reload_failed(self, **fields):
+        # The files still differ from the restored versions, so --watch retries
+        self.reload_delay = min(max(self.reload_delay * 2, 1.0), MAX_RESTART_DELAY)
+        self._next_watch_reload = time.monotonic() + self.reload_delay
+        log_event("reload_failed", retry_in_seconds=self.reload_delay, **fields)
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            if worker.ready_fd is not None:
+                os.close(worker.ready_fd)
+            code = os.waitstatus_to_exitcode(status)
+            if worker.generation != self.generation or self._stopping:
+                log_event("worker_exited", pid=pid, generation=worker.generation, exit_code=code)
+                continue
+            uptime = time.monotonic() - worker.started
+            if uptime < MIN_UPTIME:
+                self.restart_delay = min(max(self.restart_delay * 2, 0.5), MAX_RESTART_DELAY)
+            else:
+                self.restart_delay = 0.0
+            log_event("worker_died", pid=pid, exit_code=code, uptime_seconds=round(uptime, 3),
+                      restart_in_seconds=self.restart_delay)
+            self._pending_restarts.append(time.monotonic() + self.restart_delay)
+
+    def run(self):
+        signal.signal(signal.SIGHUP, self._on_reload)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        self.start()
+        last_watch = time.monotonic()
+        while not self._stopping:
+            time.sleep(POLL_SECONDS)
+            self.reap()
+            now = time.monotonic()
+            due = [at for at in self._pending_restarts if at <= now]
+            if due:
+                self._pending_restarts = [at for at in self._pending_restarts if at > now]
+                for _ in due:
+                    self.spawn()
+            if (self.watch and now - last_watch >= model_registry.RELOAD_CHECK_SECONDS
+                    and now >= self._next_watch_reload):
+                last_watch = now
+                if self._model_versions() != self._versions:
+                    self._reload_requested = True
+            if self._reload_requested:
+                self.reload()
+        self.shutdown()
+
+    def shutdown(self, timeout=GRACEFUL_TIMEOUT):
+        log_event("shutting_down", workers=len(self.workers))
+        self.retire(list(self.workers.values()), signal.SIGTERM)
+        deadline = time.monotonic() + timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            time.sleep(POLL_SECONDS)
+            self.reap()
+        for worker in list(self.workers.values()):
+            os.kill(worker.pid, signal.SIGKILL)
+        self.sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve FraudGuard models from pre-forked worker processes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--models", nargs="+", choices=MODEL_NAMES, default=list(MODEL_NAMES),
+                        help="Models loaded before forking (default: all)")
+    parser.add_argument("--watch", action="store_true", help="Hot-reload when a model file changes")
+    args = parser.parse_args(argv)
+
+    configure_telemetry()
+    sock = bind(args.host, args.port)
+    log_event("listening", host=args.host, port=sock.getsockname()[1], workers=args.workers)
+    Supervisor(sock, args.workers, args.models, args.watch).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Low-latency HTTP scoring service (plain ASGI, no web framework).
+
+Endpoints:
+    POST /score   one transaction object, or {"model": ..., "transactions": [...]}
+    GET  /health  liveness, the models that are loaded and prediction cache stats
+    GET  /metrics request/error counters and latency histograms (Prometheus text format)
+
+Concurrent requests for the same model are coalesced on the server side into
+a single ``predict_proba`` call by ``MicroBatcher``; rows that were scored
+recently are answered from the shared prediction cache.
+
+Run with any ASGI server, e.g.:
+    uvicorn scoring_service:app --port 8000
+or ``python scoring_service.py --port 8000``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audit_log import close as close_audit_log, record as audit_decisions
+from features import TRANSACTION_TYPES, encode_records, model_input, thread_encoder
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, ERRORS, REQUESTS, render as render_metrics
+from model_registry import MODEL_NAMES, get_model, loaded_models
+from prediction_cache import cache, score
+from thresholds import served_threshold
+
+DEFAULT_MODEL = os.environ.get("FRAUDGUARD_DEFAULT_MODEL", "Random Forest")
+MAX_BATCH_SIZE = int(os.environ.get("FRAUDGUARD_MAX_BATCH_SIZE", "256"))
+# How long the first request in a batch may wait for company, in seconds
+MAX_BATCH_WAIT = float(os.environ.get("FRAUDGUARD_MAX_BATCH_WAIT", "0.002"))
+
+
+class MicroBatcher:
+    """Coalesce concurrent scoring requests for one model into one call.
+
+    Requests queue up as ``(features, future)`` pairs. A single drain task
+    takes the first waiting request, keeps collecting until ``max_batch_size``
+    rows or ``max_wait`` seconds, then scores the concatenated block once on a
+    worker thread so the event loop stays free to accept more requests.
+    """
+
+    def __init__(self, model_name, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_BATCH_WAIT):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"score-{model_name}")
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, features):
+        """Score an ``(n, 4)`` feature array; returns ``(labels, fraud_probability)``."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((features, future))
+        return await future
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            rows = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while rows < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                rows += len(item[0])
+
+            blocks = [features for features, _ in pending]
+            try:
+                labels, proba = await loop.run_in_executor(self._executor, self._score, blocks)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            start = 0
+            for features, future in pending:
+                stop = start + len(features)
+                if not future.done():
+                    future.set_result((labels[start:stop], proba[start:stop]))
+                start = stop
+
+    def _score(self, blocks):
+        features = blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+        return score(self.model_name, features)
+
+
+class ScoringService:
+    """ASGI application object; ``app`` below is the default instance."""
+
+    def __init__(self, default_model=DEFAULT_MODEL, preload=None):
+        self.default_model = default_model
+        self.preload = [default_model] if preload is None else list(preload)
+        self._batchers = {}
+
+    def batcher(self, model_name):
+        batcher = self._batchers.get(model_name)
+        if batcher is None:
+            batcher = self._batchers[model_name] = MicroBatcher(model_name)
+        return batcher
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                for name in self.preload:
+                    warm_up(name)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for batcher in self._batchers.values():
+                    await batcher.stop()
+                # Pre-fork workers leave through os._exit, skipping atexit
+                close_audit_log()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        method, path = scope["method"], scope["path"]
+        if path == "/health" and method == "GET":
+            await _send_json(send, 200, {"status": "ok", "pid": os.getpid(), "models_loaded": loaded_models(),
+                                           "prediction_cache": cache.stats()})
+        elif path == "/metrics" and method == "GET":
+            await _send(send, 200, render_metrics().encode(), METRICS_CONTENT_TYPE.encode())
+        elif path == "/score" and method == "POST":
+            body = await _read_body(receive)
+            try:
+                status, payload = 200, await self.handle_score(json.loads(body or b"null"))
+            except (ValueError, KeyError, TypeError) as e:
+                if isinstance(e, json.JSONDecodeError):
+                    REQUESTS.labels("http", "unknown").inc()
+                ERRORS.labels("http", "validation").inc()
+                status, payload = 400, {"error": str(e)}
+            except Exception:
+                ERRORS.labels("http", "predict").inc()
+                raise
+            await _send_json(send, status, payload)
+        else:
+            await _send_json(send, 404, {"error": f"No route for {method} {path}"})
+
+    async def handle_score(self, payload):
+        model_name = payload.get("model", self.default_model) if isinstance(payload, dict) else None
+        REQUESTS.labels("http", model_name if model_name in MODEL_NAMES else "unknown").inc()
+        if not isinstance(payload, dict):
+            raise ValueError("Request body must be a JSON object")
+        if model_name not in MODEL_NAMES:
+            raise ValueError(f"Unknown model: {model_name!r}")
+
+        single = "transactions" not in payload
+        records = [payload] if single else payload["transactions"]
+        if not isinstance(records, list) or not records:
+            raise ValueError("'transactions' must be a non-empty list")
+
+        start = time.perf_counter()
+        features = encode_records(records)
+        labels, proba = await self.batcher(model_name).submit(features)
+        audit_decisions("http", model_name, features, proba, served_threshold(model_name),
+                        (time.perf_counter() - start) * 1000)
+        results = [
+            {"label": str(label), "fraud_probability": float(p), "model": model_name}
+            for label, p in zip(labels, proba)
+        ]
+        return results[0] if single else {"model": model_name, "results": results}
+
+
+def warm_up(model_name):
+    """Load a model and run one ``predict_proba`` so the first request is not cold.
+
+    The row is built exactly like the app's ``input_data`` so the same
+    input paths are exercised. It bypasses the prediction cache.
+    """
+    model = get_model(model_name)
+    model.predict_proba(model_input(model, thread_encoder().transaction(TRANSACTION_TYPES[0], 0.0, 0.0, 0.0)))
+
+
+async def _read_body(receive):
+    chunks = []
+    more = True
+    while more:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        more = message.get("more_body", False)
+    return b"".join(chunks)
+
+
+async def _send_json(send, status, payload):
+    await _send(send, status, json.dumps(payload).encode(), b"application/json")
+
+
+async def _send(send, status, body, content_type):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+app = ScoringService()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve FraudGuard models over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
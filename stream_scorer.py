@@ -0,0 +1,367 @@
+"""Score a continuous stream of JSON-lines transactions with micro-batching.
+
+Input is one JSON transaction per line (the same objects ``POST /score``
+accepts) from one of:
+
+* ``-``                 stdin
+* ``PATH --follow``     a file, tailed like ``tail -f``
+* ``unix:PATH``         a local Unix socket server (one or more producers)
+* ``tcp:HOST:PORT``     a local TCP server
+
+The pipeline is three tasks joined by bounded queues::
+
+    reader -> [max_in_flight rows] -> batcher -> [2 batches] -> writer
+
+The batcher collects up to ``max_batch_size`` rows or ``max_wait`` seconds,
+then scores the batch with one vectorized ``predict_proba`` call on a worker
+thread. Results are written as JSON lines in arrival order; if scoring a
+batch fails, each of its rows gets an ``error`` result. When the queues
+are full the reader stops reading, so memory stays bounded and socket
+producers are slowed down by TCP/Unix-socket flow control.
+
+Throughput and end-to-end latency counters are reported to stderr as JSON
+lines every ``--stats-interval`` seconds and once at the end.
+
+With ``--account-features`` every result also carries the per-account
+behavioral features of ``account_features.py``. They are computed in
+arrival order, so they match an offline ``transform`` of the same stream.
+
+Usage:
+    python -m benchmarks.stream_load --rate 5000 | python stream_scorer.py - > scores.jsonl
+    python stream_scorer.py unix:/tmp/fraudguard.sock --model "Naive Bayes"
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from account_features import DEFAULT_CAPACITY, AccountFeatureStore
+from audit_log import record as audit_decisions
+from features import encode_records, thread_encoder
+from model_registry import MODEL_NAMES, get_model
+from scoring import score
+from thresholds import served_threshold
+
+DEFAULT_MODEL = os.environ.get("FRAUDGUARD_DEFAULT_MODEL", "Random Forest")
+MAX_BATCH_SIZE = 1024
+MAX_BATCH_WAIT = 0.005
+MAX_IN_FLIGHT = 8192
+# Latency percentiles are computed over the most recent rows
+LATENCY_WINDOW = 10_000
+
+
+class StreamStats:
+    """Running counters for one stream."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.started = time.perf_counter()
+        self.received = 0
+        self.scored = 0
+        self.errors = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self._latencies = collections.deque(maxlen=window)
+
+    def record_batch(self, latencies_ms, errors):
+        self.batches += 1
+        self.scored += len(latencies_ms) - errors
+        self.errors += errors
+        self._latencies.extend(latencies_ms)
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        latencies = np.asarray(self._latencies) if self._latencies else np.zeros(1)
+        done = self.scored + self.errors
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "received": self.received,
+            "scored": self.scored,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch_size": round(done / self.batches, 2) if self.batches else 0.0,
+            "rows_per_second": round(done / elapsed, 1) if elapsed else 0.0,
+            "latency_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "latency_p99_ms": round(float(np.percentile(latencies, 99)), 3),
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+class StreamScorer:
+    """Micro-batching scorer between an async line source and a line sink."""
+
+    def __init__(self, model_name=DEFAULT_MODEL, max_batch_size=MAX_BATCH_SIZE,
+                 max_wait=MAX_BATCH_WAIT, max_in_flight=MAX_IN_FLIGHT, account_store=None):
+        self.model_name = model_name
+        self.account_store = account_store
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = StreamStats()
+        self._rows = asyncio.Queue(maxsize=max_in_flight)
+        self._batches = asyncio.Queue(maxsize=2)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream-score")
+
+    async def feed(self, line):
+        """Queue one raw input line; waits while the pipeline is full."""
+        line = line.strip()
+        if not line:
+            return
+        seq = self.stats.received
+        self.stats.received += 1
+        await self._rows.put((seq, line, time.perf_counter()))
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, self._rows.qsize())
+
+    async def close(self):
+        await self._rows.put(None)
+
+    async def run(self, write):
+        """Batch, score and ``write`` result lines until ``close()``."""
+        get_model(self.model_name)
+        loop = asyncio.get_running_loop()
+        writer = loop.create_task(self._write(write))
+        try:
+            await self._batch()
+        finally:
+            await self._batches.put(None)
+            await writer
+            self._executor.shutdown(wait=False)
+
+    async def _batch(self):
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            first = await self._rows.get()
+            if first is None:
+                return
+            pending = [first]
+            deadline = loop.time() + self.max_wait
+            while len(pending) < self.max_batch_size:
+                if self._rows.empty():
+                    # Only pay for a timed wait when nothing is queued
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._rows.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._rows.get_nowait()
+                if item is None:
+                    done = True
+                    break
+                pending.append(item)
+            future = loop.run_in_executor(self._executor, self._score, pending)
+            await self._batches.put((pending, future))
+
+    def _score(self, pending):
+        """Worker thread: parse, encode and score one batch in a single call."""
+        records, results = [], [None] * len(pending)
+        for i, (seq, line, _) in enumerate(pending):
+            try:
+                records.append((i, json.loads(line)))
+            except ValueError as e:
+                results[i] = {"seq": seq, "error": f"Invalid JSON: {e}"}
+        encoder = thread_encoder()
+        try:
+            features = encoder.records([record for _, record in records])
+        except ValueError:
+            # Rare: find the bad rows one by one and score the rest
+            valid = []
+            for i, record in records:
+                try:
+                    encode_records([record])
+                    valid.append((i, record))
+                except ValueError as e:
+                    results[i] = {"seq": pending[i][0], "error": str(e)}
+            records = valid
+            features = encoder.records([record for _, record in records])
+        if records:
+            start = time.perf_counter()
+            labels, fraud_probability = score(get_model(self.model_name), features, self.model_name)
+            audit_decisions("stream", self.model_name, features, fraud_probability,
+                            served_threshold(self.model_name), (time.perf_counter() - start) * 1000)
+            for (i, record), label, p in zip(records, labels, fraud_probability):
+                result = {"seq": pending[i][0], "label": str(label), "fraud_probability": float(p)}
+                if "id" in record:
+                    result["id"] = record["id"]
+                if self.account_store is not None:
+                    try:
+                        values = self.account_store.observe_record(record)
+                        result["account_features"] = dict(zip(self.account_store.feature_names, values.tolist()))
+                    except (KeyError, TypeError, ValueError):
+                        # No account columns in this record: model score only
+                        pass
+                results[i] = result
+        return results
+
+    async def _write(self, write):
+        while True:
+            item = await self._batches.get()
+            if item is None:
+                return
+            pending, future = item
+            try:
+                results = await future
+            except Exception as e:
+                # One failed batch must not stop the writer (nothing else drains the queue)
+                results = [{"seq": seq, "error": f"Scoring failed: {e}"} for seq, _, _ in pending]
+            now = time.perf_counter()
+            latencies = []
+            errors = 0
+            for (_, _, received_at), result in zip(pending, results):
+                latencies.append((now - received_at) * 1000)
+                errors += "error" in result
+            write("".join(json.dumps(result) + "\n" for result in results))
+            self.stats.record_batch(latencies, errors)
+
+
+async def read_stream(reader, scorer, stop=None):
+    """Feed every line of an ``asyncio.StreamReader`` into ``scorer`` until
+    EOF or until ``stop`` is set."""
+    if stop is None:
+        stop = asyncio.Event()
+    stopped = asyncio.ensure_future(stop.wait())
+    try:
+        while True:
+            reading = asyncio.ensure_future(reader.readline())
+            await asyncio.wait((reading, stopped), return_when=asyncio.FIRST_COMPLETED)
+            if not reading.done():
+                reading.cancel()
+                return
+            line = reading.result()
+            if not line:
+                return
+            await scorer.feed(line.decode())
+    finally:
+        stopped.cancel()
+
+
+async def read_stdin(scorer, stop=None):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=1 << 20)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    await read_stream(reader, scorer, stop)
+
+
+async def read_file(path, scorer, follow=False, stop=None, poll_interval=0.05):
+    """Read ``path`` line by line; with ``follow`` keep waiting for appends
+    until ``stop`` is set."""
+    with open(path) as f:
+        partial = ""
+        while True:
+            line = f.readline()
+            if line.endswith("\n"):
+                await scorer.feed(partial + line)
+                partial = ""
+            elif line:
+                partial += line
+            elif follow and not (stop and stop.is_set()):
+                await asyncio.sleep(poll_interval)
+            else:
+                if partial:
+                    await scorer.feed(partial)
+                return
+
+
+async def serve_socket(address, scorer, stop):
+    """Accept producers on ``unix:PATH`` or ``tcp:HOST:PORT`` until ``stop`` is set."""
+    async def handle(reader, writer):
+        try:
+            await read_stream(reader, scorer, stop)
+        finally:
+            writer.close()
+
+    kind, _, target = address.partition(":")
+    if kind == "unix":
+        if os.path.exists(target):
+            os.unlink(target)
+        server = await asyncio.start_unix_server(handle, path=target, limit=1 << 20)
+    elif kind == "tcp":
+        host, _, port = target.rpartition(":")
+        server = await asyncio.start_server(handle, host or "127.0.0.1", int(port), limit=1 << 20)
+    else:
+        raise ValueError(f"Unknown socket address {address!r} (use unix:PATH or tcp:HOST:PORT)")
+    async with server:
+        await stop.wait()
+
+
+async def run(source, output, model_name=DEFAULT_MODEL, follow=False, max_batch_size=MAX_BATCH_SIZE,
+              max_wait=MAX_BATCH_WAIT, max_in_flight=MAX_IN_FLIGHT, stats_interval=5.0, stop=None,
+              account_store=None):
+    """Score ``source`` into the text stream ``output``; returns final stats.
+
+    SIGINT/SIGTERM (or setting ``stop``) stop accepting input; rows already
+    queued are still scored and written.
+    """
+    scorer = StreamScorer(model_name, max_batch_size, max_wait, max_in_flight, account_store)
+    stop = stop or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    def write(text):
+        output.write(text)
+        output.flush()
+
+    async def report():
+        while True:
+            await asyncio.sleep(stats_interval)
+            print(json.dumps({"event": "stream_stats", **scorer.stats.snapshot()}), file=sys.stderr)
+
+    async def produce():
+        try:
+            if source == "-":
+                await read_stdin(scorer, stop)
+            elif source.startswith(("unix:", "tcp:")):
+                await serve_socket(source, scorer, stop)
+            else:
+                await read_file(source, scorer, follow, stop)
+        finally:
+            await scorer.close()
+
+    reporter = loop.create_task(report()) if stats_interval > 0 else None
+    try:
+        await asyncio.gather(produce(), scorer.run(write))
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+    return scorer.stats.snapshot()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a JSON-lines transaction stream with micro-batching.")
+    parser.add_argument("source", help="'-' (stdin), a file path, unix:PATH or tcp:HOST:PORT")
+    parser.add_argument("--output", default="-", help="Results file ('-' for stdout)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, choices=MODEL_NAMES)
+    parser.add_argument("--follow", action="store_true", help="Keep tailing a file source")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait", type=float, default=MAX_BATCH_WAIT, help="Seconds to fill a batch")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT,
+                        help="Rows buffered before reading pauses")
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="Seconds between stats lines (0 = off)")
+    parser.add_argument("--account-features", action="store_true",
+                        help="Attach per-account behavioral features to every result")
+    parser.add_argument("--account-capacity", type=int, default=DEFAULT_CAPACITY,
+                        help="Account state slots (power of two)")
+    args = parser.parse_args(argv)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        account_store = AccountFeatureStore(args.account_capacity) if args.account_features else None
+        stats = asyncio.run(run(args.source, output, args.model, args.follow, args.max_batch_size,
+                                args.max_wait, args.max_in_flight, args.stats_interval, account_store=account_store))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(json.dumps({"event": "stream_summary", **stats}), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
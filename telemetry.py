@@ -0,0 +1,55 @@
+"""Stage timing and structured (JSON lines) latency logging."""
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("fraudguard.telemetry")
+
+
+def configure(path=None):
+    """Attach a JSON-lines handler once per process.
+
+    Records go to ``path`` (or ``$FRAUDGUARD_TELEMETRY_LOG``) when set and to
+    stderr otherwise.
+    """
+    if logger.handlers:
+        return logger
+    path = path or os.environ.get("FRAUDGUARD_TELEMETRY_LOG")
+    handler = logging.FileHandler(path) if path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+class StageTimer:
+    """Collect wall-clock durations (in milliseconds) of named stages."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = (time.perf_counter() - start) * 1000
+
+    @property
+    def total_ms(self):
+        return sum(self.stages.values())
+
+    def log(self, event, **fields):
+        record = {
+            "event": event,
+            "ts": time.time(),
+            **fields,
+            "stages_ms": {name: round(ms, 4) for name, ms in self.stages.items()},
+            "total_ms": round(self.total_ms, 4),
+        }
+        logger.info(json.dumps(record))
+        return record
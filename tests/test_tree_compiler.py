@@ -0,0 +1,40 @@
+"""The compiled trees must reproduce sklearn's probabilities bit for bit."""
+import joblib
+import numpy as np
+import pytest
+
+from model_registry import model_path
+from tree_compiler import TREE_MODELS, CompiledTrees, file_sha256, load_compiled, verification_inputs
+
+
+@pytest.fixture(scope="module")
+def inputs():
+    return verification_inputs(n_random=2000)
+
+
+@pytest.fixture(scope="module", params=TREE_MODELS)
+def estimator(request):
+    return joblib.load(model_path(request.param))
+
+
+def test_batch_matches_sklearn(estimator, inputs):
+    compiled = CompiledTrees.from_estimator(estimator)
+    assert np.array_equal(compiled.predict_proba(inputs), estimator.predict_proba(inputs))
+
+
+def test_single_rows_match_sklearn(estimator, inputs):
+    compiled = CompiledTrees.from_estimator(estimator)
+    for i in np.random.default_rng(0).integers(0, len(inputs), 200):
+        row = inputs.iloc[i:i + 1]
+        assert np.array_equal(compiled.predict_proba(row), estimator.predict_proba(row))
+        assert np.array_equal(compiled.predict_proba(row.to_numpy()), estimator.predict_proba(row))
+
+
+@pytest.mark.parametrize("name", TREE_MODELS)
+def test_exported_tables_match_sklearn(name, inputs):
+    source = model_path(name)
+    compiled = load_compiled(name, source)
+    if compiled is None:
+        pytest.skip(f"no up-to-date export for {name} (run python tree_compiler.py)")
+    assert compiled.source_sha256 == file_sha256(source)
+    assert np.array_equal(compiled.predict_proba(inputs), joblib.load(source).predict_proba(inputs))
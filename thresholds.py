@@ -0,0 +1,244 @@
+"""Cost-tuned decision thresholds, swept offline and served as a lookup.
+
+``python thresholds.py`` tunes each model's fraud-probability threshold
+on out-of-fold scores from the notebooks' training split: the model's
+estimator (notebook hyperparameters) is cross-validated over
+``CV_FOLDS`` stratified folds, so every training row is scored by a model
+that did not see it. The sweep covers every distinct score and, for each
+threshold, counts true/false positives and negatives and the expected
+cost ``false_positive_cost * FP + false_negative_cost * FN``. The cheapest
+threshold is written to ``decision_thresholds.json``.
+
+The shipped model is then scored on the untouched 30% holdout, which
+played no part in the choice. The table reports that holdout's
+precision/recall/cost at the tuned threshold and at the default 0.5, plus
+the precision/recall/cost curve sampled on a 0.05 grid.
+
+A transaction is flagged when ``fraud_probability >= threshold``. At 0.5
+this matches ``predict`` (arg-max over ``["Fraud", "No Fraud"]``), which is
+the fallback for models missing from the table or whose pickle changed
+since it was tuned (each entry records the pickle's SHA-256). Every entry
+point labels through ``served_threshold``, so the app, the HTTP service,
+the stream and batch scorers and the audit log agree on each verdict; a
+decision costs one ``predict_proba`` call plus a dict lookup.
+
+Usage:
+    python thresholds.py --fp-cost 1 --fn-cost 10
+"""
+import argparse
+import datetime
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from features import FRAUD_LABEL, LEGIT_LABEL, model_input
+from model_registry import MODEL_DIR, MODEL_NAMES, RELOAD_CHECK_SECONDS, file_version, get_model, model_path
+from tree_compiler import file_sha256
+
+THRESHOLDS_PATH = os.path.join(MODEL_DIR, "decision_thresholds.json")
+DEFAULT_THRESHOLD = 0.5
+# Cost of reviewing a legitimate transaction vs missing a fraudulent one
+FALSE_POSITIVE_COST = 1.0
+FALSE_NEGATIVE_COST = 10.0
+CURVE_GRID = np.round(np.linspace(0.0, 1.0, 21), 2)
+CV_FOLDS = 5
+
+# The served table, re-read when the table or a pickle changes (checked at
+# most every RELOAD_CHECK_SECONDS, like the models themselves)
+_served = {"key": None, "table": {}, "checked_at": 0.0}
+_served_lock = threading.Lock()
+
+
+def confusion(is_fraud, fraud_probability, threshold):
+    """``(tp, fp, fn, tn)`` when flagging ``fraud_probability >= threshold``."""
+    flagged = fraud_probability >= threshold
+    tp = int(np.count_nonzero(flagged & is_fraud))
+    fp = int(np.count_nonzero(flagged & ~is_fraud))
+    fn = int(np.count_nonzero(~flagged & is_fraud))
+    return tp, fp, fn, len(is_fraud) - tp - fp - fn
+
+
+def operating_point(tp, fp, fn, tn, fp_cost, fn_cost):
+    n = tp + fp + fn + tn
+    cost = fp_cost * fp + fn_cost * fn
+    return {
+        "precision": tp / (tp + fp) if tp + fp else 1.0,
+        "recall": tp / (tp + fn) if tp + fn else 1.0,
+        "flagged_rate": (tp + fp) / n if n else 0.0,
+        "false_positives": fp,
+        "false_negatives": fn,
+        "cost": cost,
+        "cost_per_transaction": cost / n if n else 0.0,
+    }
+
+
+def sweep(is_fraud, fraud_probability, fp_cost=FALSE_POSITIVE_COST, fn_cost=FALSE_NEGATIVE_COST):
+    """Thresholds and their ``(tp, fp, fn, cost)`` over every distinct score.
+
+    Rows are sorted once by descending score and counted with cumulative
+    sums, so the whole curve is O(n log n). Each threshold sits midway
+    between two adjacent distinct scores; the first flags nothing and the
+    last flags everything.
+    """
+    is_fraud = np.asarray(is_fraud, dtype=bool)
+    order = np.argsort(-fraud_probability, kind="stable")
+    scores, labels = fraud_probability[order], is_fraud[order]
+    # Last row of each run of equal scores: flag everything up to it
+    ends = np.append(np.flatnonzero(np.diff(scores) != 0), len(scores) - 1)
+    tp = np.concatenate([[0], np.cumsum(labels)[ends]])
+    fp = np.concatenate([[0], np.cumsum(~labels)[ends]])
+    lower = np.append(scores[ends[1:]], 0.0)
+    thresholds = np.concatenate([[np.nextafter(max(scores[0], 1.0), np.inf)], (scores[ends] + lower) / 2])
+    thresholds[-1] = 0.0
+    fn = labels.sum() - tp
+    return {"thresholds": thresholds, "tp": tp, "fp": fp, "fn": fn, "cost": fp_cost * fp + fn_cost * fn}
+
+
+def best_threshold(is_fraud, fraud_probability, fp_cost=FALSE_POSITIVE_COST, fn_cost=FALSE_NEGATIVE_COST):
+    """The cheapest threshold over every distinct score."""
+    curve = sweep(np.asarray(is_fraud, dtype=bool), fraud_probability, fp_cost, fn_cost)
+    # argmin takes the first, i.e. highest, of equally cheap thresholds
+    return float(curve["thresholds"][int(np.argmin(curve["cost"]))])
+
+
+def tune(tuning_is_fraud, tuning_probability, is_fraud, fraud_probability,
+         fp_cost=FALSE_POSITIVE_COST, fn_cost=FALSE_NEGATIVE_COST):
+    """Table entry for one model: a threshold chosen on the tuning scores,
+    evaluated (against the default) on separate evaluation scores."""
+    is_fraud = np.asarray(is_fraud, dtype=bool)
+    tuning_is_fraud = np.asarray(tuning_is_fraud, dtype=bool)
+    best = best_threshold(tuning_is_fraud, tuning_probability, fp_cost, fn_cost)
+    return {
+        "threshold": best,
+        "validation": operating_point(*confusion(tuning_is_fraud, tuning_probability, best), fp_cost, fn_cost),
+        "tuned": operating_point(*confusion(is_fraud, fraud_probability, best), fp_cost, fn_cost),
+        "default": operating_point(*confusion(is_fraud, fraud_probability, DEFAULT_THRESHOLD), fp_cost, fn_cost),
+        "curve": _curve(is_fraud, fraud_probability, fp_cost, fn_cost),
+    }
+
+
+def out_of_fold_probability(name, x_train, y_train, folds=CV_FOLDS):
+    """Fraud probability of every training row from a model fitted on the other folds."""
+    from sklearn.model_selection import StratifiedKFold, cross_val_predict
+
+    from dataset import RANDOM_STATE
+    from train_pipeline import build_estimator
+
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=RANDOM_STATE)
+    probability = cross_val_predict(build_estimator(name), x_train, y_train, cv=cv, method="predict_proba")
+    # Columns follow the sorted labels, as the fitted estimators' classes_
+    return probability[:, list(np.unique(y_train)).index(FRAUD_LABEL)]
+
+
+def _curve(is_fraud, fraud_probability, fp_cost, fn_cost):
+    """Precision/recall/cost on ``CURVE_GRID``, one list per column."""
+    points = [operating_point(*confusion(is_fraud, fraud_probability, t), fp_cost, fn_cost) for t in CURVE_GRID]
+    return {"threshold": CURVE_GRID.tolist(),
+            **{key: [round(point[key], 4) for point in points] for key in ("precision", "recall", "cost")}}
+
+
+def build_table(names=MODEL_NAMES, fp_cost=FALSE_POSITIVE_COST, fn_cost=FALSE_NEGATIVE_COST):
+    # sklearn's split; only needed offline. scoring imports this module
+    from dataset import holdout_split, load_dataset
+    from scoring import fraud_column
+
+    x_train, x_test, y_train, y_test = holdout_split(load_dataset())
+    train_is_fraud = (y_train == FRAUD_LABEL).to_numpy()
+    is_fraud = (y_test == FRAUD_LABEL).to_numpy()
+    models = {}
+    for name in names:
+        tuning_probability = out_of_fold_probability(name, x_train, y_train)
+        model = get_model(name)
+        fraud_probability = model.predict_proba(model_input(model, x_test))[:, fraud_column(model)]
+        models[name] = {"source_sha256": file_sha256(model_path(name)),
+                        **tune(train_is_fraud, tuning_probability, is_fraud, fraud_probability, fp_cost, fn_cost)}
+    return {
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "costs": {"false_positive": fp_cost, "false_negative": fn_cost},
+        "validation": {"method": f"{CV_FOLDS}-fold stratified out-of-fold scores on the training split",
+                       "rows": int(len(train_is_fraud)), "fraud_rows": int(train_is_fraud.sum())},
+        "holdout": {"rows": int(len(is_fraud)), "fraud_rows": int(is_fraud.sum())},
+        "models": models,
+    }
+
+
+def load_table(path=THRESHOLDS_PATH):
+    """``{model name: threshold}`` for entries that match the current pickles."""
+    try:
+        with open(path) as f:
+            table = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    thresholds = {}
+    for name, entry in table.get("models", {}).items():
+        try:
+            current = file_sha256(model_path(name))
+        except (KeyError, OSError):
+            continue
+        if entry.get("source_sha256") == current:
+            thresholds[name] = float(entry["threshold"])
+    return thresholds
+
+
+def _table_key(path=THRESHOLDS_PATH):
+    key = []
+    for source in (path, *(model_path(name) for name in MODEL_NAMES)):
+        try:
+            key.append(file_version(source))
+        except OSError:
+            key.append(None)
+    return tuple(key)
+
+
+def served_thresholds():
+    """``load_table()``, cached until the table or a model file changes."""
+    now = time.monotonic()
+    if now - _served["checked_at"] >= RELOAD_CHECK_SECONDS:
+        with _served_lock:
+            key = _table_key()
+            if key != _served["key"]:
+                _served["table"] = load_table()
+                _served["key"] = key
+            _served["checked_at"] = now
+    return _served["table"]
+
+
+def served_threshold(model_name):
+    """Threshold ``model_name`` is served at: its tuned one, else the default."""
+    return served_thresholds().get(model_name, DEFAULT_THRESHOLD)
+
+
+def decide(fraud_probability, threshold=DEFAULT_THRESHOLD):
+    """Labels for fraud probabilities (a scalar or an array) at ``threshold``."""
+    return np.where(np.asarray(fraud_probability) >= threshold, FRAUD_LABEL, LEGIT_LABEL)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune per-model decision thresholds by cross-validation.")
+    parser.add_argument("--models", nargs="+", choices=MODEL_NAMES, default=list(MODEL_NAMES))
+    parser.add_argument("--fp-cost", type=float, default=FALSE_POSITIVE_COST,
+                        help="Cost of flagging a legitimate transaction")
+    parser.add_argument("--fn-cost", type=float, default=FALSE_NEGATIVE_COST,
+                        help="Cost of missing a fraudulent transaction")
+    parser.add_argument("--output", default=THRESHOLDS_PATH)
+    args = parser.parse_args(argv)
+
+    table = build_table(args.models, args.fp_cost, args.fn_cost)
+    with open(args.output, "w") as f:
+        json.dump(table, f, indent=2)
+        f.write("\n")
+    print(f"Costs: false positive {args.fp_cost:g}, false negative {args.fn_cost:g}; tuned on "
+          f"{table['validation']['rows']:,} out-of-fold training rows, reported on "
+          f"{table['holdout']['rows']:,} holdout rows ({table['holdout']['fraud_rows']:,} fraud)")
+    for name, entry in table["models"].items():
+        tuned, default = entry["tuned"], entry["default"]
+        print(f"  {name:<20} threshold {entry['threshold']:.4f}  precision {tuned['precision']:.3f}  "
+              f"recall {tuned['recall']:.3f}  cost {tuned['cost']:8,.0f}  (at 0.5: {default['cost']:8,.0f})")
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Train every FraudGuard model in one reproducible, parallel pass.
+
+Replaces re-running the five training notebooks one by one. The CSV is read,
+encoded and split once (same encoding and holdout split as the notebooks) and
+the training rows are written to ``.npy`` files that every worker process
+memory-maps instead of re-reading the data. Models are fitted concurrently on
+a process pool; each worker records its wall-clock fit time and peak traced
+memory.
+
+Every run writes a versioned directory::
+
+    artifacts/<version>/
+        decision_tree_model.pkl ...   same file names the app loads
+        manifest.json                 feature order, label encoding, library
+                                      versions, data hash, per-model stats
+
+``--publish`` additionally copies the new pickles over the ones next to the
+app; running processes pick them up through the registry's reload check.
+
+Usage:
+    python train_pipeline.py [--data "credit card.csv"] [--models "Random Forest" ...] [--workers 4] [--publish]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.metrics import accuracy_score
+
+from dataset import DATA_PATH, RANDOM_STATE, TEST_SIZE, holdout_split, load_dataset
+from features import FEATURE_COLUMNS, FRAUD_LABEL, LEGIT_LABEL, TYPE_MAPPING
+from model_registry import MODEL_DIR, MODEL_FILES, MODEL_NAMES
+from tree_compiler import file_sha256
+
+ARTIFACTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts")
+MANIFEST_NAME = "manifest.json"
+
+
+def build_estimator(name, seed=RANDOM_STATE):
+    """Unfitted estimator with the notebooks' hyperparameters.
+
+    The notebooks left ``random_state`` unset; it is pinned here so that a
+    rerun on the same data reproduces the same models.
+    """
+    if name == "Decision Tree":
+        from sklearn.tree import DecisionTreeClassifier
+        return DecisionTreeClassifier(random_state=seed)
+    if name == "K-Nearest Neighbors":
+        from sklearn.neighbors import KNeighborsClassifier
+        return KNeighborsClassifier()
+    if name == "Logistic Regression":
+        from sklearn.linear_model import LogisticRegression
+        return LogisticRegression(random_state=seed)
+    if name == "Naive Bayes":
+        from sklearn.naive_bayes import BernoulliNB
+        return BernoulliNB()
+    if name == "Random Forest":
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(random_state=seed)
+    raise KeyError(f"Unknown model: {name!r}")
+
+
+def _fit_one(name, train_dir, output_dir, seed):
+    """Worker: fit one model on the memory-mapped training rows and save it."""
+    x_train = pd.DataFrame(np.load(os.path.join(train_dir, "x.npy"), mmap_mode="r"), columns=FEATURE_COLUMNS)
+    y_train = np.where(np.load(os.path.join(train_dir, "y.npy"), mmap_mode="r"), FRAUD_LABEL, LEGIT_LABEL)
+
+    estimator = build_estimator(name, seed)
+    tracemalloc.start()
+    start = time.perf_counter()
+    estimator.fit(x_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    path = os.path.join(output_dir, MODEL_FILES[name])
+    joblib.dump(estimator, path)
+    return {
+        "file": MODEL_FILES[name],
+        "sha256": file_sha256(path),
+        "bytes": os.path.getsize(path),
+        "estimator": type(estimator).__name__,
+        "params": {key: repr(value) for key, value in estimator.get_params().items()},
+        "fit_seconds": round(fit_seconds, 4),
+        "peak_memory_bytes": peak,
+    }
+
+
+def _save_training_rows(x_train, y_train, directory):
+    np.save(os.path.join(directory, "x.npy"), x_train.to_numpy(dtype=np.float64))
+    np.save(os.path.join(directory, "y.npy"), (y_train == FRAUD_LABEL).to_numpy())
+
+
+def train_all(data_path=DATA_PATH, names=MODEL_NAMES, workers=None, seed=RANDOM_STATE, output_root=ARTIFACTS_DIR):
+    """Train ``names`` in parallel and write a versioned artifact directory.
+
+    Returns the manifest dict (also written to ``<version>/manifest.json``).
+    """
+    started = time.perf_counter()
+    data_sha256 = file_sha256(data_path)
+    data = load_dataset(data_path)
+    x_train, x_test, y_train, y_test = holdout_split(data)
+    prepare_seconds = time.perf_counter() - started
+
+    created_at = datetime.now(timezone.utc)
+    version = f"{created_at:%Y%m%dT%H%M%SZ}-{data_sha256[:8]}"
+    output_dir = os.path.join(output_root, version)
+    os.makedirs(output_dir, exist_ok=True)
+
+    models = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        _save_training_rows(x_train, y_train, tmp)
+        with ProcessPoolExecutor(max_workers=workers or min(len(names), os.cpu_count() or 1)) as pool:
+            futures = {pool.submit(_fit_one, name, tmp, output_dir, seed): name for name in names}
+            for future in as_completed(futures):
+                name = futures[future]
+                models[name] = future.result()
+                print(f"  {name:<20} fit={models[name]['fit_seconds']:.2f}s "
+                      f"peak={models[name]['peak_memory_bytes'] / 2**20:,.1f} MiB", flush=True)
+
+    for name in names:
+        model = joblib.load(os.path.join(output_dir, MODEL_FILES[name]))
+        models[name]["holdout_accuracy"] = round(float(accuracy_score(y_test, model.predict(x_test))), 4)
+        models[name]["classes"] = [str(c) for c in model.classes_]
+
+    manifest = {
+        "version": version,
+        "created_at": created_at.isoformat(timespec="seconds"),
+        "data": {
+            "path": os.path.basename(data_path),
+            "sha256": data_sha256,
+            "rows": len(data),
+            "train_rows": len(x_train),
+            "test_rows": len(x_test),
+            "test_size": TEST_SIZE,
+            "split_random_state": RANDOM_STATE,
+        },
+        "feature_columns": list(FEATURE_COLUMNS),
+        "type_mapping": TYPE_MAPPING,
+        "label_encoding": {"isFraud": {"0": LEGIT_LABEL, "1": FRAUD_LABEL}},
+        "seed": seed,
+        "environment": {
+            "python": platform.python_version(),
+            "sklearn": sklearn.__version__,
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "joblib": joblib.__version__,
+        },
+        "prepare_seconds": round(prepare_seconds, 4),
+        "wall_seconds": round(time.perf_counter() - started, 4),
+        "models": {name: models[name] for name in names},
+    }
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def publish(manifest, output_root=ARTIFACTS_DIR, model_dir=MODEL_DIR):
+    """Copy a run's pickles next to the app, replacing each file atomically."""
+    source_dir = os.path.join(output_root, manifest["version"])
+    for entry in manifest["models"].values():
+        target = os.path.join(model_dir, entry["file"])
+        staging = target + ".tmp"
+        shutil.copyfile(os.path.join(source_dir, entry["file"]), staging)
+        os.replace(staging, target)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train all FraudGuard models in parallel.")
+    parser.add_argument("--data", default=DATA_PATH, help="CSV in the credit card.csv schema")
+    parser.add_argument("--models", nargs="+", choices=MODEL_NAMES, default=list(MODEL_NAMES))
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per model, up to CPU count)")
+    parser.add_argument("--seed", type=int, default=RANDOM_STATE)
+    parser.add_argument("--output", default=ARTIFACTS_DIR, help="Root directory for versioned artifacts")
+    parser.add_argument("--publish", action="store_true", help="Replace the app's model files with the new ones")
+    args = parser.parse_args(argv)
+
+    print(f"Training {len(args.models)} model(s) on {args.data}")
+    manifest = train_all(args.data, args.models, args.workers, args.seed, args.output)
+    for name, entry in manifest["models"].items():
+        print(f"  {name:<20} accuracy={entry['holdout_accuracy']:.4f}")
+    print(f"Wrote {os.path.join(args.output, manifest['version'])} in {manifest['wall_seconds']:.1f}s")
+    if args.publish:
+        publish(manifest, args.output)
+        print(f"Published to {MODEL_DIR}")
+
+
+if __name__ == "__main__":
+    main()
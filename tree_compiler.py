@@ -0,0 +1,270 @@
+"""Compile fitted tree models into flat, array-backed node tables.
+
+sklearn's ``predict_proba`` spends most of a single-row call on input
+validation, DataFrame handling and per-tree dispatch. ``CompiledTrees``
+flattens every tree of a ``DecisionTreeClassifier`` or
+``RandomForestClassifier`` into one set of node arrays and walks all trees
+for all rows at once with NumPy, reproducing sklearn's arithmetic exactly:
+inputs are cast to float32 like sklearn's tree code, leaf values are taken as
+stored, and forest probabilities are accumulated tree by tree in estimator
+order before dividing by the number of trees.
+
+Usage:
+    python tree_compiler.py            # export + verify both tree models
+    python tree_compiler.py --verify   # only check existing exports
+"""
+import argparse
+import hashlib
+import os
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+
+COMPILED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "compiled_models")
+TREE_MODELS = ("Decision Tree", "Random Forest")
+
+
+class CompiledTrees:
+    """Vectorized evaluator over concatenated tree node tables.
+
+    Leaves point to themselves, so a ``(tree, row)`` pair that reaches a leaf
+    early simply stays there; the frontier of pairs still descending is
+    compacted every step so finished pairs cost nothing.
+    """
+
+    # Rows per traversal block, keeps the (trees x rows) working set in cache
+    block_rows = 2048
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes,
+                 feature_names=FEATURE_COLUMNS, max_depth=None, source_sha256="", children=None, is_leaf=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = np.asarray(classes, dtype=object)
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = len(self.feature_names_in_)
+        self.max_depth = int(max_depth) if max_depth is not None else len(feature)
+        self.source_sha256 = source_sha256
+        # Interleaved (left, right) child table: one gather per step instead of two.
+        # Both derived tables can be passed in (e.g. memory-mapped) to skip the copy.
+        self._children = np.stack([left, right], axis=1).ravel() if children is None else children
+        self._is_leaf = left == np.arange(len(left)) if is_leaf is None else is_leaf
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_estimator(cls, estimator, source_sha256=""):
+        trees = [e.tree_ for e in getattr(estimator, "estimators_", [estimator])]
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            n = tree.node_count
+            ids = np.arange(offset, offset + n, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold).astype(np.float64))
+            lefts.append(np.where(is_leaf, ids, tree.children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, ids, tree.children_right + offset).astype(np.int32))
+            values.append(_leaf_probabilities(tree.value[:, 0, :]))
+            roots.append(offset)
+            offset += n
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int32),
+            classes=estimator.classes_,
+            feature_names=getattr(estimator, "feature_names_in_", FEATURE_COLUMNS),
+            max_depth=max(tree.max_depth for tree in trees),
+            source_sha256=source_sha256,
+        )
+
+    def save(self, path):
+        np.savez(
+            path,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            value=self.value,
+            roots=self.roots,
+            classes=self.classes_.astype(str),
+            feature_names=self.feature_names_in_.astype(str),
+            max_depth=np.int64(self.max_depth),
+            source_sha256=np.str_(self.source_sha256),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                feature=data["feature"],
+                threshold=data["threshold"],
+                left=data["left"],
+                right=data["right"],
+                value=data["value"],
+                roots=data["roots"],
+                classes=data["classes"].tolist(),
+                feature_names=data["feature_names"].tolist(),
+                max_depth=int(data["max_depth"]),
+                source_sha256=str(data["source_sha256"]),
+            )
+
+    def _as_array(self, X):
+        if hasattr(X, "columns"):
+            names = list(self.feature_names_in_)
+            if list(X.columns) != names:
+                X = X[names]
+            X = X.to_numpy(dtype=np.float32)
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X
+
+    def apply(self, X):
+        """Leaf index (into the flat tables) per ``(tree, row)``."""
+        X = self._as_array(X)
+        return np.concatenate(
+            [self._apply_block(X[start:start + self.block_rows])
+             for start in range(0, X.shape[0], self.block_rows)] or [self._apply_block(X)],
+            axis=1,
+        )
+
+    def _apply_block(self, X):
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = np.tile(np.arange(n_rows) * n_features, self.n_trees)
+        nodes = np.repeat(self.roots, n_rows)
+        active = np.flatnonzero(~self._is_leaf.take(nodes))
+        while active.size:
+            current = nodes.take(active)
+            values = flat_X.take(row_offsets.take(active) + self.feature.take(current))
+            # Mirrors sklearn's ``X[i, feature] <= threshold`` test (NaN goes right)
+            go_right = ~(values <= self.threshold.take(current))
+            current = self._children.take(2 * current + go_right)
+            nodes[active] = current
+            active = active[~self._is_leaf.take(current)]
+        return nodes.reshape(self.n_trees, n_rows)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[1], self.value.shape[1]), dtype=np.float64)
+        # Same summation order as sklearn's forest accumulation
+        for tree_leaves in leaves:
+            proba += self.value.take(tree_leaves, axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def _leaf_probabilities(value):
+    # sklearn >= 1.4 stores per-node class fractions and returns them as-is;
+    # older versions store counts and normalise at predict time.
+    value = np.array(value, dtype=np.float64)
+    sums = value.sum(axis=1, keepdims=True)
+    if np.allclose(sums, 1.0):
+        return value
+    sums[sums == 0.0] = 1.0
+    return value / sums
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compiled_path(name):
+    return os.path.join(COMPILED_DIR, name.lower().replace(" ", "_") + ".npz")
+
+
+def load_compiled(name, source_path):
+    """Compiled tables for ``name`` if they exist and match ``source_path``."""
+    path = compiled_path(name)
+    if not os.path.exists(path):
+        return None
+    compiled = CompiledTrees.load(path)
+    if compiled.source_sha256 != file_sha256(source_path):
+        return None
+    return compiled
+
+
+def verify(estimator, compiled, X):
+    """True when compiled probabilities are bit-identical to sklearn's."""
+    expected = estimator.predict_proba(X)
+    actual = compiled.predict_proba(X)
+    return expected.shape == actual.shape and np.array_equal(expected, actual)
+
+
+def verification_inputs(seed=42, n_random=20000):
+    """Holdout rows plus random rows spanning (and exceeding) the data range."""
+    import pandas as pd
+
+    from dataset import holdout_split, load_dataset
+
+    _, x_test, _, _ = holdout_split(load_dataset())
+    rng = np.random.default_rng(seed)
+    high = x_test.max().to_numpy() * 1.5
+    random = rng.uniform(0, high, size=(n_random, len(FEATURE_COLUMNS)))
+    random[:, 0] = rng.integers(1, 6, size=n_random)
+    return pd.concat([x_test, pd.DataFrame(random, columns=FEATURE_COLUMNS)], ignore_index=True)
+
+
+def export(names=TREE_MODELS):
+    """Compile, verify and save the tree models. Returns written paths."""
+    import joblib
+
+    from model_registry import model_path
+
+    X = verification_inputs()
+    os.makedirs(COMPILED_DIR, exist_ok=True)
+    written = []
+    for name in names:
+        source = model_path(name)
+        estimator = joblib.load(source)
+        compiled = CompiledTrees.from_estimator(estimator, file_sha256(source))
+        if not verify(estimator, compiled, X):
+            raise RuntimeError(f"Compiled {name} does not reproduce sklearn's probabilities")
+        compiled.save(compiled_path(name))
+        written.append(compiled_path(name))
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the tree models into flat node tables.")
+    parser.add_argument("--verify", action="store_true", help="Only verify existing exports")
+    args = parser.parse_args(argv)
+
+    if not args.verify:
+        for path in export():
+            print(f"Wrote {path} ({os.path.getsize(path) / 1024:,.0f} KB)")
+
+    import joblib
+
+    from model_registry import model_path
+
+    X = verification_inputs(seed=7)
+    for name in TREE_MODELS:
+        compiled = load_compiled(name, model_path(name))
+        if compiled is None:
+            raise SystemExit(f"{name}: no up-to-date compiled export")
+        ok = verify(joblib.load(model_path(name)), compiled, X)
+        print(f"{name}: {'bit-identical' if ok else 'MISMATCH'} on {len(X):,} rows")
+        if not ok:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()